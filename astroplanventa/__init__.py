@@ -25,8 +25,13 @@ if not _ASTROPY_SETUP_:
     from .target import *
     from .exceptions import *
     from .moon import *
+    from .cache import *
     from .constraints import *
+    from .ephemeris import *
+    from .trace import *
+    from .profiling import *
     from .scheduling import *
+    from .ensemble import *
     from .periodic import *
 
     get_IERS_A_or_workaround()
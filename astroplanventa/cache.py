@@ -0,0 +1,197 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Bounded least-recently-used cache for the expensive coordinate
+transformations that constraints store on an `~astroplan.Observer`.
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+# Standard library
+import sys
+from collections import OrderedDict
+
+# Third-party
+import numpy as np
+
+__all__ = ["ObserverCache", "get_observer_cache"]
+
+
+def _nbytes(value):
+    """
+    Rough number of bytes held by a cached value.
+
+    Arrays, quantities, `~astropy.time.Time` and coordinate objects are
+    counted by the size of their numeric data; anything else by
+    `sys.getsizeof`.
+    """
+    if isinstance(value, dict):
+        return sum(_nbytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(_nbytes(v) for v in value)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if hasattr(value, 'jd1') and hasattr(value, 'jd2'):
+        return np.asanyarray(value.jd1).nbytes + np.asanyarray(value.jd2).nbytes
+    data = getattr(value, 'data', None)
+    if hasattr(data, 'components'):
+        # a coordinate frame or SkyCoord, count the representation arrays
+        size = sum(np.asanyarray(getattr(data, c)).nbytes for c in data.components)
+        obstime = getattr(value, 'obstime', None)
+        if obstime is not None:
+            size += _nbytes(obstime)
+        return size
+    return sys.getsizeof(value)
+
+
+class ObserverCache(object):
+    """
+    Least-recently-used cache with a byte budget, split into namespaces.
+
+    Every namespace (e.g. ``'altaz'``, ``'sun'``, ``'moon'``,
+    ``'transit'``) has its own keys and hit/miss/eviction counters, but
+    all of them share one budget: when it is exceeded the least recently
+    used entries are evicted, whatever namespace they are in.
+    """
+    #: Default budget, in bytes
+    default_max_bytes = 256 * 1024**2
+
+    def __init__(self, max_bytes=None):
+        """
+        Parameters
+        ----------
+        max_bytes : int or None
+            Maximum estimated size of all cached values together. Defaults
+            to `ObserverCache.default_max_bytes`.
+        """
+        self.max_bytes = self.default_max_bytes if max_bytes is None else int(max_bytes)
+        self._entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = {}
+        self.misses = {}
+        self.evictions = {}
+
+    def __repr__(self):
+        return ('<ObserverCache: {0} entries, {1:.1f} of {2:.1f} MB>'
+                .format(len(self._entries), self.nbytes / 1024**2,
+                        self.max_bytes / 1024**2))
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, namespace_key):
+        return namespace_key in self._entries
+
+    def _count(self, counter, namespace):
+        counter[namespace] = counter.get(namespace, 0) + 1
+
+    def _touch(self, namespace_key):
+        # mark as most recently used (no OrderedDict.move_to_end on Python 2)
+        self._entries[namespace_key] = self._entries.pop(namespace_key)
+
+    def get(self, namespace, key, default=None):
+        """
+        Cached value for ``key`` in ``namespace``, or ``default`` if absent.
+
+        A successful lookup counts as a hit and marks the entry as the most
+        recently used, an unsuccessful one counts as a miss.
+        """
+        entry = self._entries.get((namespace, key))
+        if entry is None:
+            self._count(self.misses, namespace)
+            return default
+        self._count(self.hits, namespace)
+        self._touch((namespace, key))
+        return entry[0]
+
+    def set(self, namespace, key, value):
+        """
+        Store ``value`` for ``key`` in ``namespace``, evicting the least
+        recently used entries as needed to stay within ``max_bytes``.
+
+        Values bigger than the whole budget aren't stored.
+        """
+        size = _nbytes(value)
+        old = self._entries.pop((namespace, key), None)
+        if old is not None:
+            self.nbytes -= old[1]
+        if size > self.max_bytes:
+            return value
+        self._entries[(namespace, key)] = (value, size)
+        self.nbytes += size
+        while self.nbytes > self.max_bytes:
+            (evicted_namespace, _), (_, evicted_size) = self._entries.popitem(last=False)
+            self.nbytes -= evicted_size
+            self._count(self.evictions, evicted_namespace)
+        return value
+
+    def get_or_compute(self, namespace, key, compute):
+        """
+        Cached value for ``key`` in ``namespace``, calling ``compute()`` and
+        storing its result on a miss.
+        """
+        entry = self._entries.get((namespace, key))
+        if entry is not None:
+            self._count(self.hits, namespace)
+            self._touch((namespace, key))
+            return entry[0]
+        self._count(self.misses, namespace)
+        return self.set(namespace, key, compute())
+
+    def clear(self, namespace=None):
+        """
+        Remove all entries, or only those in ``namespace``. Counters are kept.
+        """
+        if namespace is None:
+            self._entries.clear()
+            self.nbytes = 0
+            return
+        for namespace_key in [k for k in self._entries if k[0] == namespace]:
+            self.nbytes -= self._entries.pop(namespace_key)[1]
+
+    def reset_stats(self):
+        """
+        Zero the hit, miss and eviction counters.
+        """
+        self.hits.clear()
+        self.misses.clear()
+        self.evictions.clear()
+
+    def info(self):
+        """
+        Current size and counters of every namespace.
+
+        Returns
+        -------
+        info : dict
+            ``{namespace: {'entries', 'nbytes', 'hits', 'misses', 'evictions'}}``
+        """
+        namespaces = set(self.hits) | set(self.misses) | set(self.evictions)
+        namespaces.update(namespace for namespace, _ in self._entries)
+        info = dict((namespace, dict(entries=0, nbytes=0,
+                                     hits=self.hits.get(namespace, 0),
+                                     misses=self.misses.get(namespace, 0),
+                                     evictions=self.evictions.get(namespace, 0)))
+                    for namespace in namespaces)
+        for (namespace, _), (_, size) in self._entries.items():
+            info[namespace]['entries'] += 1
+            info[namespace]['nbytes'] += size
+        return info
+
+
+def get_observer_cache(observer):
+    """
+    The `ObserverCache` of ``observer``, created on first use.
+
+    Parameters
+    ----------
+    observer : `~astroplan.Observer`
+        The observer the cached calculations belong to.
+
+    Returns
+    -------
+    cache : `ObserverCache`
+    """
+    cache = getattr(observer, '_cache', None)
+    if cache is None:
+        cache = observer._cache = ObserverCache()
+    return cache
@@ -10,13 +10,14 @@ from __future__ import (absolute_import, division, print_function,
 # Standard library
 from abc import ABCMeta, abstractmethod
 import datetime
+import hashlib
 import warnings
 
 # Third-party
 from astropy.time import Time
 import astropy.units as u
 from astropy.coordinates import get_body, get_sun, get_moon, SkyCoord
-from astropy.coordinates import Latitude
+from astropy.coordinates import Latitude, UnitSphericalRepresentation
 from astropy import table
 
 import numpy as np
@@ -26,6 +27,7 @@ from numpy.lib.stride_tricks import as_strided
 from .moon import moon_illumination
 from .utils import time_grid_from_range
 from .target import get_skycoord
+from .cache import get_observer_cache
 
 __all__ = ["AltitudeConstraint", "AirmassConstraint", "AtNightConstraint",
            "is_observable", "is_always_observable", "time_grid_from_range",
@@ -37,6 +39,17 @@ __all__ = ["AltitudeConstraint", "AirmassConstraint", "AtNightConstraint",
            "PhaseConstraint", "is_event_observable"]
 
 
+def _digest(*arrays):
+    """
+    Digest of the raw buffers of ``arrays``.
+    """
+    digest = hashlib.sha1()
+    for array in arrays:
+        array = np.ascontiguousarray(array, dtype=float)
+        digest.update(array.view(np.uint8))
+    return digest.digest()
+
+
 def _make_cache_key(times, targets):
     """
     Make a unique key to reference this combination of ``times`` and ``targets``.
@@ -46,6 +59,10 @@ def _make_cache_key(times, targets):
     routine will provide an appropriate, hashable, key to store these
     calculations in a dictionary.
 
+    The key holds the shapes and a digest of the underlying arrays rather
+    than every value as a Python float, so that building and hashing it
+    stays cheap for long time grids and many targets.
+
     Parameters
     ----------
     times : `~astropy.time.Time`
@@ -58,23 +75,20 @@ def _make_cache_key(times, targets):
     cache_key : tuple
         A hashable tuple for use as a cache key
     """
-    # make a tuple from times
-    try:
-        timekey = tuple(times.jd) + times.shape
-    except BaseException:        # must be scalar
-        timekey = (times.jd,)
+    # digest of times, jd1 and jd2 together keep full precision
+    timekey = (np.shape(times.jd1), _digest(times.jd1, times.jd2))
     # make hashable thing from targets coords
-    try:
-        if hasattr(targets, 'frame'):
-            # treat as a SkyCoord object. Accessing the longitude
-            # attribute of the frame data should be unique and is
-            # quicker than accessing the ra attribute.
-            targkey = tuple(targets.frame.data.lon.value.ravel()) + targets.shape
-        else:
-            # assume targets is a string.
-            targkey = (targets,)
-    except BaseException:
-        targkey = (targets.frame.data.lon,)
+    if hasattr(targets, 'frame'):
+        # treat as a SkyCoord object. Accessing the spherical components
+        # of the frame data is quicker than accessing the ra attribute.
+        data = targets.frame.data
+        if not hasattr(data, 'lon'):
+            data = data.represent_as(UnitSphericalRepresentation)
+        targkey = (targets.frame.name, targets.shape,
+                   _digest(data.lon.value, data.lat.value))
+    else:
+        # assume targets is a string.
+        targkey = (targets,)
     return timekey + targkey
 
 
@@ -84,7 +98,8 @@ def _get_altaz(times, observer, targets, force_zero_pressure=False):
     the two times in ``time_range`` with grid spacing ``time_resolution``
     for ``observer``.
 
-    Cache the result on the ``observer`` object.
+    Cache the result in the ``'altaz'`` namespace of the ``observer``'s
+    `~astroplan.cache.ObserverCache`.
 
     Parameters
     ----------
@@ -104,26 +119,26 @@ def _get_altaz(times, observer, targets, force_zero_pressure=False):
         times for the alt/az computations, (2) 'altaz' contains the
         corresponding alt/az coordinates at those times.
     """
-    if not hasattr(observer, '_altaz_cache'):
-        observer._altaz_cache = {}
+    cache = get_observer_cache(observer)
 
     # convert times, targets to tuple for hashing
     aakey = _make_cache_key(times, targets)
 
-    if aakey not in observer._altaz_cache:
+    altaz_dict = cache.get('altaz', aakey)
+    if altaz_dict is None:
         try:
             if force_zero_pressure:
                 observer_old_pressure = observer.pressure
                 observer.pressure = 0
 
             altaz = observer.altaz(times, targets, grid_times_targets=False)
-            observer._altaz_cache[aakey] = dict(times=times,
-                                                altaz=altaz)
+            altaz_dict = cache.set('altaz', aakey, dict(times=times,
+                                                        altaz=altaz))
         finally:
             if force_zero_pressure:
                 observer.pressure = observer_old_pressure
 
-    return observer._altaz_cache[aakey]
+    return altaz_dict
 
 
 def _get_moon_data(times, observer, force_zero_pressure=False):
@@ -131,7 +146,8 @@ def _get_moon_data(times, observer, force_zero_pressure=False):
     Calculate moon altitude az and illumination for an array of times for
     ``observer``.
 
-    Cache the result on the ``observer`` object.
+    Cache the result in the ``'moon'`` namespace of the ``observer``'s
+    `~astroplan.cache.ObserverCache`.
 
     Parameters
     ----------
@@ -150,13 +166,13 @@ def _get_moon_data(times, observer, force_zero_pressure=False):
         corresponding alt/az coordinates at those times and (3) contains
         the moon illumination for those times.
     """
-    if not hasattr(observer, '_moon_cache'):
-        observer._moon_cache = {}
+    cache = get_observer_cache(observer)
 
     # convert times to tuple for hashing
     aakey = _make_cache_key(times, 'moon')
 
-    if aakey not in observer._moon_cache:
+    moon_dict = cache.get('moon', aakey)
+    if moon_dict is None:
         try:
             if force_zero_pressure:
                 observer_old_pressure = observer.pressure
@@ -164,14 +180,14 @@ def _get_moon_data(times, observer, force_zero_pressure=False):
 
             altaz = observer.moon_altaz(times)
             illumination = np.array(moon_illumination(times))
-            observer._moon_cache[aakey] = dict(times=times,
-                                               illum=illumination,
-                                               altaz=altaz)
+            moon_dict = cache.set('moon', aakey, dict(times=times,
+                                                      illum=illumination,
+                                                      altaz=altaz))
         finally:
             if force_zero_pressure:
                 observer.pressure = observer_old_pressure
 
-    return observer._moon_cache[aakey]
+    return moon_dict
 
 
 def _get_meridian_transit_times(times, observer, targets):
@@ -179,7 +195,8 @@ def _get_meridian_transit_times(times, observer, targets):
     Calculate next meridian transit for an array of times for ``targets`` and
     ``observer``.
 
-    Cache the result on the ``observer`` object.
+    Cache the result in the ``'transit'`` namespace of the ``observer``'s
+    `~astroplan.cache.ObserverCache`.
 
     Parameters
     ----------
@@ -196,17 +213,14 @@ def _get_meridian_transit_times(times, observer, targets):
         Dictionary containing a key-value pair. 'times' contains the
         meridian_transit times.
     """
-    if not hasattr(observer, '_meridian_transit_cache'):
-        observer._meridian_transit_cache = {}
+    cache = get_observer_cache(observer)
 
     # convert times to tuple for hashing
     aakey = _make_cache_key(times, targets)
 
-    if aakey not in observer._meridian_transit_cache:
-        meridian_transit_times = observer.target_meridian_transit_time(times, targets)
-        observer._meridian_transit_cache[aakey] = dict(times=meridian_transit_times)
-
-    return observer._meridian_transit_cache[aakey]
+    return cache.get_or_compute(
+        'transit', aakey,
+        lambda: dict(times=observer.target_meridian_transit_time(times, targets)))
 
 
 @abstractmethod
@@ -341,7 +355,12 @@ class AltitudeConstraint(Constraint):
 
     def compute_constraint(self, times, observer, targets):
         cached_altaz = _get_altaz(times, observer, targets)
-        alt = cached_altaz['altaz'].alt
+        return self._score_altitude(cached_altaz['altaz'].alt)
+
+    def _score_altitude(self, alt):
+        """
+        Apply the constraint to already computed altitudes ``alt``.
+        """
         min = Latitude(self.min.scale, self.min.bases[0])
         max = Latitude(self.max.scale, self.min.bases[0])
         if self.boolean_constraint:
@@ -388,7 +407,13 @@ class AirmassConstraint(AltitudeConstraint):
 
     def compute_constraint(self, times, observer, targets):
         cached_altaz = _get_altaz(times, observer, targets)
-        secz = cached_altaz['altaz'].secz.value
+        return self._score_secz(cached_altaz['altaz'].secz.value)
+
+    def _score_altitude(self, alt):
+        # secant of the zenith angle, as `~astropy.coordinates.AltAz.secz`
+        return self._score_secz(1 / np.sin(alt.to_value(u.rad)))
+
+    def _score_secz(self, secz):
         if self.boolean_constraint:
             if self.min is None and self.max is not None:
                 mask = secz <= self.max
@@ -454,12 +479,12 @@ class AtNightConstraint(Constraint):
         return cls(max_solar_altitude=-18*u.deg, **kwargs)
 
     def _get_solar_altitudes(self, times, observer, targets):
-        if not hasattr(observer, '_altaz_cache'):
-            observer._altaz_cache = {}
+        cache = get_observer_cache(observer)
 
         aakey = _make_cache_key(times, 'sun')
 
-        if aakey not in observer._altaz_cache:
+        sun_dict = cache.get('sun', aakey)
+        if sun_dict is None:
             try:
                 if self.force_pressure_zero:
                     observer_old_pressure = observer.pressure
@@ -469,15 +494,13 @@ class AtNightConstraint(Constraint):
                 altaz = observer.altaz(times, get_sun(times))
                 altitude = altaz.alt
                 # cache the altitude
-                observer._altaz_cache[aakey] = dict(times=times,
-                                                    altitude=altitude)
+                sun_dict = cache.set('sun', aakey, dict(times=times,
+                                                        altitude=altitude))
             finally:
                 if self.force_pressure_zero:
                     observer.pressure = observer_old_pressure
-        else:
-            altitude = observer._altaz_cache[aakey]['altitude']
 
-        return altitude
+        return sun_dict['altitude']
 
     def compute_constraint(self, times, observer, targets):
         solar_altitude = self._get_solar_altitudes(times, observer, targets)
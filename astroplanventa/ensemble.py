@@ -0,0 +1,311 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Best-of-N scheduling: run differently seeded and configured copies of a
+scheduler in a process pool, score every resulting schedule with a common
+`~astroplan.scheduling.ScheduleObjective`, and keep the best one.
+
+The ephemeris and slew tables are computed once in the calling process and
+passed to the workers in shared memory, so every worker reads the same
+arrays instead of receiving (or recomputing) its own copy.
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+# Standard library
+import os
+import copy
+
+# Third-party
+import numpy as np
+from astropy.table import Table
+
+# Package
+from .ephemeris import EphemerisTable, SlewTable
+from .cache import get_observer_cache
+from .trace import NullTrace
+from .scheduling import Scheduler, ScheduleObjective
+
+__all__ = ["SchedulerEnsemble", "SharedTables", "make_variants"]
+
+
+def make_variants(n, seed=0):
+    """
+    Settings of ``n`` variants of a `~astroplan.scheduling.SequentialScheduler`.
+
+    The first variant is the scheduler as it is. The others pick the best
+    block at random among those within 0, 1 or 5 % of the best score, pick
+    calibrators at random from the 1, 2 or 3 nearest that fit, and split long
+    blocks into pieces of the calibration gap or into equal pieces, each with
+    its own seed.
+
+    Returns
+    -------
+    variants : list of dict
+        Attributes to set on a copy of the scheduler for every variant.
+    """
+    variants = [{}]
+    for i in range(1, n):
+        variants.append({'tie_tolerance': (0., 0.01, 0.05)[i % 3],
+                         'calibrator_choices': 1 + (i // 3) % 3,
+                         'split_policy': ('gap', 'equal')[(i // 9) % 2],
+                         'seed': seed + i})
+    return variants
+
+
+class _SharedTable(object):
+    """
+    Picklable stand-in for a table whose arrays are in shared memory; see
+    `SharedTables.share`.
+    """
+
+    def __init__(self, cls, state, arrays):
+        self.cls = cls
+        self.state = state
+        # (attribute, shared memory name, shape, dtype)
+        self.arrays = arrays
+
+    def attach(self):
+        """
+        The table, with its arrays as read-only views of the shared memory.
+        Attached once per process.
+        """
+        key = tuple(name for attribute, name, shape, dtype in self.arrays)
+        if key in _attached:
+            return _attached[key][0]
+        from multiprocessing import shared_memory
+        table = self.cls.__new__(self.cls)
+        state = dict((attribute, _attach(value)) for attribute, value in self.state.items())
+        memories = []
+        for attribute, name, shape, dtype in self.arrays:
+            memory = shared_memory.SharedMemory(name=name)
+            array = np.ndarray(shape, dtype, buffer=memory.buf)
+            array.flags.writeable = False
+            state[attribute] = array
+            memories.append(memory)
+        table.__dict__.update(state)
+        # the memory has to stay open as long as the table is used
+        _attached[key] = (table, memories)
+        return table
+
+
+# tables attached in this process, by their shared memory names
+_attached = {}
+
+
+def _attach(value):
+    if isinstance(value, _SharedTable):
+        return value.attach()
+    return value
+
+
+class SharedTables(object):
+    """
+    Read-only tables in shared memory, for worker processes.
+
+    Without `multiprocessing.shared_memory` (before Python 3.8) the tables
+    are passed on as they are, and pickled for every worker.
+    """
+
+    # the arrays of each kind of table that go into shared memory
+    shared_arrays = {EphemerisTable: ('alt', '_az_unwrapped', 'jd'),
+                     SlewTable: ('separation', 'jd')}
+
+    def __init__(self):
+        self._memories = []
+        self._shared = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def share(self, table):
+        """
+        A picklable stand-in for ``table`` that a worker turns back into the
+        table with `_SharedTable.attach`, or ``table`` itself if it can't be
+        shared.
+
+        Parameters
+        ----------
+        table : `~astroplan.ephemeris.EphemerisTable`, `~astroplan.ephemeris.SlewTable` or None
+        """
+        if table is None or type(table) not in self.shared_arrays:
+            return table
+        if id(table) in self._shared:
+            return self._shared[id(table)]
+        try:
+            from multiprocessing import shared_memory
+        except ImportError:
+            return table
+        state = dict(vars(table))
+        # rows looked up by object id don't carry over to other processes
+        if '_id_rows' in state:
+            state['_id_rows'] = {}
+        arrays = []
+        for attribute in self.shared_arrays[type(table)]:
+            array = np.ascontiguousarray(state.pop(attribute))
+            memory = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            self._memories.append(memory)
+            np.ndarray(array.shape, array.dtype, buffer=memory.buf)[...] = array
+            arrays.append((attribute, memory.name, array.shape, array.dtype.str))
+        # e.g. the ephemeris a slew table was sampled from
+        for attribute, value in state.items():
+            state[attribute] = self.share(value)
+        shared = _SharedTable(type(table), state, arrays)
+        self._shared[id(table)] = shared
+        return shared
+
+    def close(self):
+        """Free the shared memory; attached tables can't be used after this."""
+        while self._memories:
+            memory = self._memories.pop()
+            memory.close()
+            memory.unlink()
+        self._shared = {}
+
+
+def _run_variant(job):
+    """
+    Run one variant of the ensemble; everything it needs comes in ``job``
+    (see `SchedulerEnsemble.__call__`).
+
+    Returns
+    -------
+    schedule : `~astroplan.scheduling.Schedule`
+    score : float
+    """
+    scheduler, variant, ephemeris, slew_table, blocks, schedule, objective = job
+    if ephemeris is not None:
+        scheduler.ephemeris = _attach(ephemeris)
+    if slew_table is not None:
+        scheduler.transitioner.slew_table = _attach(slew_table)
+    for attribute, value in variant.items():
+        setattr(scheduler, attribute, value)
+    scheduler(blocks, schedule)
+    return schedule, objective(schedule, blocks)
+
+
+def _run_worker(job):
+    """`_run_variant` in a worker process."""
+    schedule, score = _run_variant(job)
+    # the cache isn't sent back to the main process
+    get_observer_cache(schedule.observer).clear()
+    return schedule, score
+
+
+class SchedulerEnsemble(object):
+    """
+    Schedule with several variants of a scheduler and keep the best schedule.
+
+    Every variant is a copy of the scheduler with some of its attributes
+    changed (see `make_variants`), run on its own copy of the schedule. The
+    resulting schedules are scored with ``objective``, and the best one is
+    copied into the schedule passed in. Ties go to the earlier variant, so
+    with the plain scheduler first the ensemble never does worse than it.
+    """
+
+    def __init__(self, scheduler, variants=8, objective=None, workers=None, seed=0):
+        """
+        Parameters
+        ----------
+        scheduler : `~astroplan.scheduling.Scheduler`
+            The scheduler to run variants of.
+        variants : int or list of dict
+            The attributes to set on a copy of ``scheduler`` for each variant,
+            or a number of variants made with `make_variants`.
+        objective : `~astroplan.scheduling.ScheduleObjective` or None
+            Scores the schedules, higher is better. Defaults to
+            ``ScheduleObjective()``.
+        workers : int or None
+            Number of worker processes, by default one per variant, at most
+            the number of CPUs. With one worker the variants run in this
+            process.
+        seed : int
+            First seed of the variants made by `make_variants`.
+        """
+        if not isinstance(scheduler, Scheduler):
+            raise TypeError("SchedulerEnsemble needs a Scheduler, not {0!r}".format(scheduler))
+        self.scheduler = scheduler
+        if isinstance(variants, int):
+            variants = make_variants(variants, seed)
+        self.variants = list(variants)
+        self.objective = objective or ScheduleObjective()
+        self.workers = workers
+        self.scores = None
+        self.best = None
+
+    def __repr__(self):
+        return '<SchedulerEnsemble: {0} variants of {1}>'.format(
+            len(self.variants), type(self.scheduler).__name__)
+
+    def _prepare_tables(self, blocks, schedule):
+        # compute the tables once, before the scheduler is copied for the variants
+        scheduler = self.scheduler
+        if hasattr(scheduler, 'prepare_ephemeris'):
+            scheduler.schedule = schedule
+            scheduler.prepare_ephemeris(Scheduler._copy_blocks(blocks))
+        return getattr(scheduler, 'ephemeris', None), scheduler.transitioner.slew_table
+
+    def _copy_scheduler(self, ephemeris, slew_table):
+        # a copy of the scheduler without the tables, which are sent separately
+        scheduler = copy.copy(self.scheduler)
+        scheduler.transitioner = copy.copy(scheduler.transitioner)
+        scheduler.transitioner.slew_table = slew_table
+        if hasattr(scheduler, 'ephemeris'):
+            scheduler.ephemeris = ephemeris
+        scheduler.schedule = None
+        # the variants' decisions aren't traced
+        if hasattr(scheduler, 'trace'):
+            scheduler.trace = NullTrace()
+        # an incremental record belongs to the scheduler, not its copies
+        if getattr(scheduler, 'incremental', False):
+            scheduler.incremental = False
+            scheduler._record = None
+        return scheduler
+
+    def __call__(self, blocks, schedule):
+        """
+        Schedule ``blocks`` in ``schedule`` with every variant, see
+        `~astroplan.scheduling.Scheduler.__call__`, and fill ``schedule`` with
+        the best result.
+
+        The score of every variant is kept in ``self.scores`` and the index of
+        the best one in ``self.best``.
+        """
+        blocks = Scheduler._copy_blocks(blocks)
+        empty = copy.deepcopy(schedule)
+        ephemeris, slew_table = self._prepare_tables(blocks, empty)
+
+        workers = self.workers
+        if workers is None:
+            workers = min(len(self.variants), os.cpu_count() or 1)
+        if workers > 1 and len(self.variants) > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            with SharedTables() as shared:
+                jobs = [(self._copy_scheduler(None, None), variant, shared.share(ephemeris),
+                         shared.share(slew_table), blocks, empty, self.objective)
+                        for variant in self.variants]
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    results = list(executor.map(_run_worker, jobs))
+        else:
+            # in this process the tables are shared by reference
+            results = [_run_variant((self._copy_scheduler(ephemeris, slew_table), variant, None, None,
+                                     blocks, copy.deepcopy(empty), self.objective))
+                       for variant in self.variants]
+
+        self.scores = [score for result, score in results]
+        self.best = int(np.argmax(self.scores))
+        best = results[self.best][0]
+        schedule._index = best._index
+        schedule.stats = best.stats
+        schedule.observer = self.scheduler.observer
+        return schedule
+
+    def table(self):
+        """
+        The variants of the last call and their scores as a `~astropy.table.Table`.
+        """
+        return Table([list(range(len(self.variants))), [str(variant) for variant in self.variants],
+                      self.scores], names=('variant', 'settings', 'score'))
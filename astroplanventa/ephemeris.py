@@ -0,0 +1,437 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Precomputed alt/az, slew and calibrator distance tables for answering
+scheduling questions without repeating coordinate transformations for every
+candidate time.
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+# Third-party
+import numpy as np
+import astropy.units as u
+from astropy.time import Time
+from astropy.coordinates import UnitSphericalRepresentation
+
+# Package
+from .constraints import AltitudeConstraint
+from .target import get_skycoord
+
+__all__ = ["EphemerisTable", "SlewTable", "CalibratorIndex"]
+
+
+def _coord_key(target):
+    """
+    Hashable key identifying the sky position of ``target``.
+
+    Split blocks create new `~astroplan.FixedTarget` objects with the same
+    coordinates, so positions rather than object identity are used to find
+    a target's row in the table.
+    """
+    coord = getattr(target, 'coord', target)
+    sph = coord.frame.represent_as(UnitSphericalRepresentation)
+    return (coord.frame.name, round(float(sph.lon.deg), 9),
+            round(float(sph.lat.deg), 9))
+
+
+def _to_jd(times):
+    if isinstance(times, Time):
+        return times.jd
+    return np.asarray(times, dtype=float)
+
+
+class EphemerisTable(object):
+    """
+    Altitude and azimuth of a fixed set of targets on a regular time grid.
+
+    The whole (targets x times) grid is transformed to the
+    `~astropy.coordinates.AltAz` frame in a single vectorized call. Later
+    queries are answered by linear interpolation between grid points, which
+    for sidereal targets on a one minute grid is accurate to well below an
+    arcsecond.
+    """
+
+    def __init__(self, observer, targets, times):
+        """
+        Parameters
+        ----------
+        observer : `~astroplan.Observer`
+            The observer whose horizon the table is computed for.
+        targets : list of `~astroplan.FixedTarget`
+            Targets (and calibrators) to tabulate.
+        times : `~astropy.time.Time`
+            Regularly spaced grid of times, at least two long.
+        """
+        if len(times) < 2:
+            raise ValueError("EphemerisTable needs at least two grid times.")
+        self.observer = observer
+        self.targets = list(targets)
+        self.times = times
+        self.jd = times.jd
+        self._step = self.jd[1] - self.jd[0]
+
+        self._rows = {}
+        unique_targets = []
+        for target in self.targets:
+            key = _coord_key(target)
+            if key not in self._rows:
+                self._rows[key] = len(unique_targets)
+                unique_targets.append(target)
+        # remembers rows already looked up; keeps the target alive so that
+        # its id can't be reused by another object while the table exists
+        self._id_rows = {}
+
+        altaz = observer.altaz(times, get_skycoord(unique_targets),
+                               grid_times_targets=True)
+        self.alt = np.atleast_2d(altaz.alt.deg)
+        # unwrap so interpolation across the 0/360 degree boundary works
+        self._az_unwrapped = np.degrees(
+            np.unwrap(np.atleast_2d(altaz.az.rad), axis=1))
+
+    def __repr__(self):
+        return ('<EphemerisTable: {0} targets x {1} times between {2} and {3}>'
+                .format(self.alt.shape[0], self.alt.shape[1],
+                        self.times[0].iso, self.times[-1].iso))
+
+    @classmethod
+    @u.quantity_input(time_resolution=u.second, margin=u.second)
+    def from_range(cls, observer, targets, start_time, end_time,
+                   time_resolution=1*u.minute, margin=0*u.second):
+        """
+        Build a table covering ``start_time`` to ``end_time`` + ``margin``.
+
+        Parameters
+        ----------
+        observer : `~astroplan.Observer`
+            The observer whose horizon the table is computed for.
+        targets : list of `~astroplan.FixedTarget`
+            Targets (and calibrators) to tabulate.
+        start_time, end_time : `~astropy.time.Time`
+            The window to cover, e.g. ``schedule.start_time`` and
+            ``schedule.end_time``.
+        time_resolution : `~astropy.units.Quantity`
+            Grid spacing.
+        margin : `~astropy.units.Quantity`
+            Extra time tabulated after ``end_time``, for blocks that start
+            inside the window but end after it.
+        """
+        step = time_resolution.to(u.day).value
+        span = (end_time - start_time).to(u.day).value + margin.to(u.day).value
+        n_times = max(int(np.ceil(span / step)) + 1, 2)
+        times = Time(start_time.jd + step * np.arange(n_times), format='jd')
+        return cls(observer, targets, times)
+
+    def row(self, target):
+        """
+        Row of ``target`` in the table, or `None` if it isn't tabulated.
+        """
+        cached = self._id_rows.get(id(target))
+        if cached is not None:
+            return cached[1]
+        row = self._rows.get(_coord_key(target))
+        self._id_rows[id(target)] = (target, row)
+        return row
+
+    def rows(self, targets):
+        """
+        Rows of a list of ``targets`` as an (n, 1) index array that broadcasts
+        against (n, m) times, or `None` if any of them isn't tabulated.
+        """
+        rows = [self.row(target) for target in targets]
+        if any(row is None for row in rows):
+            return None
+        return np.array(rows, dtype=int)[:, np.newaxis]
+
+    def covers(self, times):
+        """
+        True if every time in ``times`` lies inside the tabulated grid.
+        """
+        jd = _to_jd(times)
+        # allow for float rounding at the grid edges (~10 ms)
+        tolerance = 1e-7
+        return bool(np.all((jd >= self.jd[0] - tolerance) &
+                           (jd <= self.jd[-1] + tolerance)))
+
+    def _interpolate(self, values, rows, jd):
+        x = (jd - self.jd[0]) / self._step
+        lower = np.clip(np.floor(x).astype(int), 0, len(self.jd) - 2)
+        frac = x - lower
+        return values[rows, lower] * (1 - frac) + values[rows, lower + 1] * frac
+
+    def altitude(self, target, times):
+        """
+        Interpolated altitude of ``target`` in degrees at ``times``.
+
+        Parameters
+        ----------
+        target : `~astroplan.FixedTarget`
+            A tabulated target.
+        times : `~astropy.time.Time` or array of JD floats
+            Times inside the tabulated grid.
+
+        Returns
+        -------
+        altitude : `~numpy.ndarray`
+            Altitudes in degrees with the shape of ``times``.
+        """
+        row = self.row(target)
+        if row is None:
+            raise KeyError("{0} is not in the ephemeris table"
+                           .format(getattr(target, 'name', target)))
+        return self._interpolate(self.alt, row, _to_jd(times))
+
+    def azimuth(self, target, times):
+        """
+        Interpolated azimuth of ``target`` in degrees, on [0, 360).
+        """
+        row = self.row(target)
+        if row is None:
+            raise KeyError("{0} is not in the ephemeris table"
+                           .format(getattr(target, 'name', target)))
+        return self._interpolate(self._az_unwrapped, row, _to_jd(times)) % 360
+
+    def evaluate(self, constraint, target, times):
+        """
+        Evaluate ``constraint`` for ``target`` at ``times``.
+
+        Altitude and airmass constraints are answered from the table. Any
+        other constraint, an untabulated target or times outside the grid
+        fall back to calling the constraint directly.
+
+        Parameters
+        ----------
+        constraint : `~astroplan.constraints.Constraint`
+            The constraint to evaluate.
+        target : `~astroplan.FixedTarget` or list
+            Target to evaluate it for. A list of n targets is evaluated
+            against (n, m) shaped ``times``, one row of times per target.
+        times : `~astropy.time.Time` or array of JD floats
+            Times to evaluate it at.
+
+        Returns
+        -------
+        constraint_result : `~numpy.ndarray`
+            Same as ``constraint(observer, target, times)``.
+        """
+        rows = self.rows(target) if isinstance(target, list) else self.row(target)
+        if (isinstance(constraint, AltitudeConstraint) and
+                rows is not None and self.covers(times)):
+            alt = self._interpolate(self.alt, rows, _to_jd(times))
+            return constraint._score_altitude(alt * u.deg)
+        if not isinstance(times, Time):
+            times = Time(times, format='jd')
+        if isinstance(target, list):
+            target = get_skycoord(target)[:, np.newaxis]
+        return constraint(self.observer, target, times)
+
+
+def _angular_separation(lon1, lat1, lon2, lat2):
+    """
+    Great circle distance between points given in radians (Vincenty formula,
+    accurate for both small and antipodal separations).
+    """
+    sdlon = np.sin(lon2 - lon1)
+    cdlon = np.cos(lon2 - lon1)
+    slat1, clat1 = np.sin(lat1), np.cos(lat1)
+    slat2, clat2 = np.sin(lat2), np.cos(lat2)
+    num1 = clat2 * sdlon
+    num2 = clat1 * slat2 - slat1 * clat2 * cdlon
+    denominator = slat1 * slat2 + clat1 * clat2 * cdlon
+    return np.arctan2(np.hypot(num1, num2), denominator)
+
+
+class SlewTable(object):
+    """
+    Pairwise alt/az separations of a set of targets on a coarse time grid.
+
+    Built from an `EphemerisTable`, so no further coordinate transformations
+    are needed. Separations between grid points are linearly interpolated.
+    """
+
+    def __init__(self, ephemeris, step=1):
+        """
+        Parameters
+        ----------
+        ephemeris : `EphemerisTable`
+            Table with the alt/az of every target that slews are looked up for.
+        step : int
+            Use every ``step``-th time of ``ephemeris`` (the last time is always
+            kept so the table covers the same window).
+        """
+        self.ephemeris = ephemeris
+        self.observer = ephemeris.observer
+        columns = np.arange(0, len(ephemeris.jd), max(int(step), 1))
+        if columns[-1] != len(ephemeris.jd) - 1:
+            columns = np.append(columns, len(ephemeris.jd) - 1)
+        self.jd = ephemeris.jd[columns]
+        alt = np.radians(ephemeris.alt[:, columns])
+        az = np.radians(ephemeris._az_unwrapped[:, columns])
+        # (targets x targets x times), in degrees
+        self.separation = np.degrees(_angular_separation(az[:, np.newaxis], alt[:, np.newaxis],
+                                                         az[np.newaxis], alt[np.newaxis]))
+
+    def __repr__(self):
+        return ('<SlewTable: {0} targets x {1} times>'
+                .format(self.separation.shape[0], len(self.jd)))
+
+    @classmethod
+    @u.quantity_input(time_resolution=u.second, margin=u.second)
+    def from_range(cls, observer, targets, start_time, end_time,
+                   time_resolution=30*u.minute, margin=0*u.second):
+        """
+        Build a table covering ``start_time`` to ``end_time`` + ``margin``,
+        see `EphemerisTable.from_range`.
+        """
+        return cls(EphemerisTable.from_range(observer, targets, start_time, end_time,
+                                             time_resolution=time_resolution,
+                                             margin=margin))
+
+    def row(self, target):
+        """
+        Row of ``target`` in the table, or `None` if it isn't tabulated.
+        """
+        return self.ephemeris.row(target)
+
+    def covers(self, times):
+        """
+        True if every time in ``times`` lies inside the tabulated grid.
+        """
+        return self.ephemeris.covers(times)
+
+    def separations(self, target, targets, time):
+        """
+        Interpolated alt/az separation from ``target`` to each of ``targets``.
+
+        Parameters
+        ----------
+        target : `~astroplan.FixedTarget`
+            Target to measure from.
+        targets : list of `~astroplan.FixedTarget`
+            Targets to measure to.
+        time : `~astropy.time.Time` or JD float
+            Single time inside the tabulated grid.
+
+        Returns
+        -------
+        separations : `~numpy.ndarray` or None
+            Separations in degrees, or `None` if ``time`` or any of the targets
+            isn't in the table.
+        """
+        row = self.row(target)
+        rows = self.ephemeris.rows(targets)
+        if row is None or rows is None or not self.covers(time):
+            return None
+        jd = float(_to_jd(time))
+        # the last interval may be shorter, so find it by bisection
+        lower = min(max(int(np.searchsorted(self.jd, jd, side='right')) - 1, 0),
+                    len(self.jd) - 2)
+        frac = (jd - self.jd[lower]) / (self.jd[lower + 1] - self.jd[lower])
+        rows = rows[:, 0]
+        return (self.separation[row, rows, lower] * (1 - frac) +
+                self.separation[row, rows, lower + 1] * frac)
+
+
+def _unit_vectors(targets):
+    """
+    ICRS unit vectors of ``targets`` as an (n, 3) array.
+    """
+    xyz = get_skycoord(list(targets)).icrs.represent_as(UnitSphericalRepresentation)
+    xyz = xyz.to_cartesian().xyz.value
+    return np.atleast_2d(xyz.T)
+
+
+class CalibratorIndex(object):
+    """
+    Calibrators ordered by their angular distance from a target.
+
+    The target x calibrator separations are worked out from unit vectors, so
+    looking up the nearest calibrators needs no coordinate transformations.
+    For the targets given up front the full ordering is precomputed. Catalogs
+    with more than ``kdtree_threshold`` calibrators are searched with a
+    KD-tree instead, if scipy is installed.
+    """
+    #: Catalog size above which a KD-tree is used
+    kdtree_threshold = 256
+
+    def __init__(self, calibrators, targets=()):
+        """
+        Parameters
+        ----------
+        calibrators : list of `~astroplan.FixedTarget`
+            The calibrator catalog.
+        targets : list of `~astroplan.FixedTarget`
+            Targets to precompute the calibrator ordering for.
+        """
+        self.calibrators = list(calibrators)
+        self._xyz = _unit_vectors(self.calibrators)
+        self._orders = {}
+        self._tree = None
+        if len(self.calibrators) > self.kdtree_threshold:
+            try:
+                from scipy.spatial import cKDTree
+            except ImportError:
+                pass
+            else:
+                self._tree = cKDTree(self._xyz)
+        self.add_targets(targets)
+
+    def __repr__(self):
+        return '<CalibratorIndex: {0} calibrators>'.format(len(self.calibrators))
+
+    def __len__(self):
+        return len(self.calibrators)
+
+    def _separations(self, xyz):
+        # separations in degrees between (n, 3) unit vectors and the catalog
+        return np.degrees(np.arccos(np.clip(np.dot(xyz, self._xyz.T), -1, 1)))
+
+    def add_targets(self, targets):
+        """
+        Precompute the calibrator ordering for ``targets`` (skipped when a
+        KD-tree is used).
+        """
+        if self._tree is not None:
+            return
+        keys = {}
+        for target in targets:
+            key = _coord_key(target)
+            if key not in self._orders:
+                keys[key] = target
+        if not keys:
+            return
+        separations = self._separations(_unit_vectors(list(keys.values())))
+        orders = np.argsort(separations, axis=1, kind='mergesort')
+        for key, order, separation in zip(keys, orders, separations):
+            self._orders[key] = (order, separation[order])
+
+    def nearest(self, target, k=None):
+        """
+        The ``k`` calibrators closest to ``target``, closest first.
+
+        Parameters
+        ----------
+        target : `~astroplan.FixedTarget`
+            Target to measure from.
+        k : int or None
+            Number of calibrators to return, all of them if `None`.
+
+        Returns
+        -------
+        indices : `~numpy.ndarray`
+            Indices into ``calibrators``.
+        separations : `~numpy.ndarray`
+            Their separations from ``target`` in degrees.
+        """
+        key = _coord_key(target)
+        if key not in self._orders:
+            xyz = _unit_vectors([target])
+            if (self._tree is not None and k is not None and
+                    k < len(self.calibrators)):
+                chords, indices = self._tree.query(xyz[0], k)
+                return (np.atleast_1d(indices),
+                        np.degrees(2 * np.arcsin(np.clip(np.atleast_1d(chords) / 2, 0, 1))))
+            separation = self._separations(xyz)[0]
+            order = np.argsort(separation, kind='mergesort')
+            self._orders[key] = (order, separation[order])
+        order, separation = self._orders[key]
+        return order[:k], separation[:k]
@@ -0,0 +1,172 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Per-phase timers and counters of a scheduling run.
+
+A scheduler made with ``profile=True`` collects a `PhaseStats` for every
+run and attaches it to the resulting schedule as ``schedule.stats``, a
+table of calls and time per phase. Methods are only wrapped with timers for
+the duration of a profiled run, and inline phases are guarded with
+``stats.enabled``, so a scheduler that isn't profiled runs unchanged.
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+# Standard library
+import functools
+from collections import OrderedDict
+from timeit import default_timer
+
+# Third-party
+from astropy import units as u
+from astropy.table import Table
+
+__all__ = ["PhaseStats", "NullStats"]
+
+
+class _NullPhase(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class NullStats(object):
+    """
+    Stats of a run that isn't profiled: collects nothing.
+    """
+    enabled = False
+
+    def add(self, name, seconds, calls=1):
+        pass
+
+    def count(self, name, calls=1):
+        pass
+
+    def phase(self, name):
+        return _NullPhase()
+
+
+class _Phase(object):
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.start = default_timer()
+        return self
+
+    def __exit__(self, *exc):
+        self.stats.add(self.name, default_timer() - self.start)
+        return False
+
+
+class _TimedProxy(object):
+    """
+    Stands in for ``obj``, timing calls of ``obj`` itself and of its
+    ``methods`` as phase ``name``; other attributes are passed through.
+    """
+
+    def __init__(self, obj, stats, name, methods):
+        self._obj = obj
+        self._call = stats.timed(obj, name)
+        for method in methods:
+            setattr(self, method, stats.timed(getattr(obj, method), name))
+
+    def __call__(self, *args, **kwargs):
+        return self._call(*args, **kwargs)
+
+    def __getattr__(self, attribute):
+        if attribute == '_obj':
+            raise AttributeError(attribute)
+        return getattr(self._obj, attribute)
+
+
+class PhaseStats(NullStats):
+    """
+    Number of calls and time spent in each phase of a scheduling run.
+
+    Times are inclusive, so phases that call each other (e.g. the
+    calibrator search evaluates constraints) overlap.
+    """
+    enabled = True
+
+    def __init__(self):
+        self.calls = OrderedDict()
+        self.seconds = OrderedDict()
+        self._wrapped = []
+
+    def __repr__(self):
+        return '<PhaseStats: {0}>'.format(', '.join(
+            '{0} {1:.3f} s'.format(name, seconds) for name, seconds in self.seconds.items()))
+
+    def add(self, name, seconds, calls=1):
+        """Add ``calls`` calls taking ``seconds`` in total to phase ``name``."""
+        self.calls[name] = self.calls.get(name, 0) + calls
+        self.seconds[name] = self.seconds.get(name, 0.) + seconds
+
+    def count(self, name, calls=1):
+        """Count ``calls`` of phase ``name`` without timing them."""
+        self.add(name, 0., calls)
+
+    def phase(self, name):
+        """Context manager that times its body as phase ``name``."""
+        return _Phase(self, name)
+
+    def timed(self, function, name):
+        """``function`` wrapped to time every call as phase ``name``."""
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = default_timer()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.add(name, default_timer() - start)
+        return wrapper
+
+    def wrap(self, obj, attribute, name, methods=None):
+        """
+        Time ``obj.attribute`` as phase ``name`` until `restore` is called.
+
+        The attribute is replaced by a timed wrapper if it is a method, or
+        by a proxy timing calls of it and of its ``methods`` otherwise.
+        """
+        original = getattr(obj, attribute)
+        own = attribute in vars(obj)
+        if methods is None:
+            timed = self.timed(original, name)
+        else:
+            timed = _TimedProxy(original, self, name, methods)
+        setattr(obj, attribute, timed)
+        self._wrapped.append((obj, attribute, own, original))
+
+    def restore(self):
+        """Undo all `wrap` calls."""
+        while self._wrapped:
+            obj, attribute, own, original = self._wrapped.pop()
+            if own:
+                setattr(obj, attribute, original)
+            else:
+                delattr(obj, attribute)
+
+    def table(self, total=None):
+        """
+        The stats as a `~astropy.table.Table` with one row per phase.
+
+        Parameters
+        ----------
+        total : str or None
+            Phase that the ``fraction`` column is relative to, e.g.
+            ``'total'``. Defaults to the sum of all phases.
+        """
+        names = list(self.seconds)
+        seconds = [self.seconds[name] for name in names]
+        reference = self.seconds.get(total) if total is not None else sum(seconds)
+        table = Table([names, [self.calls[name] for name in names], seconds,
+                       [s / reference if reference else 0. for s in seconds]],
+                      names=('phase', 'calls', 'time', 'fraction'))
+        table['time'].unit = u.second
+        table['time'].format = '.4f'
+        table['fraction'].format = '.3f'
+        return table
@@ -19,13 +19,19 @@ from astropy.table import Table
 
 from operator import itemgetter
 from heapq import nsmallest
+from collections import OrderedDict
+from timeit import default_timer
 
-from .utils import time_grid_from_range, stride_array
+from .utils import time_grid_from_range, window_sums
 from .constraints import AltitudeConstraint, AirmassConstraint
 from .target import get_skycoord, FixedTarget
+from .ephemeris import EphemerisTable, SlewTable, CalibratorIndex
+from .trace import make_trace
+from .profiling import PhaseStats, NullStats
 
-__all__ = ['ObservingBlock', 'TransitionBlock', 'Schedule', 'Slot', 'Scheduler',
-           'SequentialScheduler', 'PriorityScheduler', 'Transitioner', 'Scorer']
+__all__ = ['ObservingBlock', 'ObservingBlockSet', 'TransitionBlock', 'Schedule', 'Slot',
+           'Scheduler', 'SequentialScheduler', 'PriorityScheduler', 'Transitioner', 'Scorer',
+           'SlotIndex', 'LocalSearchScheduler', 'ScheduleObjective', 'BeamSearchScheduler']
 
 
 class ObservingBlock(object):
@@ -99,6 +105,248 @@ class ObservingBlock(object):
         return ob
 
 
+class ObservingBlockSet(object):
+    """
+    Observing blocks of a catalog as arrays, built in one pass instead of
+    one `~astroplan.scheduling.ObservingBlock` at a time.
+
+    Durations (seconds), priorities, the index of every block's target in
+    ``targets`` and the start, middle and end offsets of the blocks are kept
+    as arrays; the blocks share ``configuration`` and ``constraints``. The
+    schedulers take a set wherever they take a list of blocks. Indexing or
+    iterating gives `~astroplan.scheduling.ObservingBlock` views of the
+    rows, made the first time they are accessed.
+    """
+
+    def __init__(self, targets, durations, priorities, target_index=None,
+                 configuration={}, constraints=None):
+        """
+        Parameters
+        ----------
+        targets : list of `~astroplan.FixedTarget`
+            Targets of the blocks.
+        durations : `~astropy.units.Quantity`
+            Duration of every block.
+        priorities : array-like
+            Priority of every block, 1 is highest.
+        target_index : array-like of int or None
+            Index in ``targets`` of the target of every block. Defaults to
+            one block per target.
+        configuration : dict
+            Configuration metadata of all blocks.
+        constraints : list of `~astroplan.constraints.Constraint` objects
+            Constraints applying to all blocks.
+        """
+        self.targets = list(targets)
+        if target_index is None:
+            target_index = np.arange(len(self.targets))
+        self.target_index = np.asarray(target_index, dtype=int)
+        self.durations = np.array(u.Quantity(durations).to_value(u.second), dtype=float, ndmin=1)
+        self.priorities = np.asarray(priorities)
+        self.offsets = self.durations[:, np.newaxis] * np.array([0., 0.5, 1.])
+        self.configuration = configuration
+        self.constraints = constraints
+        self._views = [None] * len(self.durations)
+
+    def __repr__(self):
+        return '<ObservingBlockSet: {0} blocks of {1} targets>'.format(len(self), len(self.targets))
+
+    def __len__(self):
+        return len(self.durations)
+
+    def __iter__(self):
+        return (self[row] for row in range(len(self)))
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self[row] for row in range(*item.indices(len(self)))]
+        row = item + len(self) if item < 0 else item
+        if not 0 <= row < len(self):
+            raise IndexError('block index out of range')
+        if self._views[row] is None:
+            self._views[row] = _BlockView(self, row)
+        return self._views[row]
+
+    @classmethod
+    def from_exposures(cls, targets, priorities, time_per_exposure, number_exposures,
+                       readout_time=0 * u.second, configuration={}, constraints=None):
+        """
+        One block per entry of ``targets``, like
+        `~astroplan.scheduling.ObservingBlock.from_exposures`, with
+        ``priorities`` and ``number_exposures`` (and optionally
+        ``time_per_exposure`` and ``readout_time``) given for every block.
+
+        A target appearing more than once is stored once in ``targets``.
+        """
+        rows = OrderedDict()
+        target_index = [rows.setdefault(id(target), (len(rows), target))[0] for target in targets]
+        number_exposures = np.asarray(number_exposures)
+        durations = number_exposures * (time_per_exposure + readout_time)
+        block_set = cls([target for _, target in rows.values()], durations, priorities,
+                        target_index, configuration, constraints)
+        block_set.time_per_exposure = time_per_exposure
+        block_set.number_exposures = number_exposures
+        block_set.readout_time = readout_time
+        return block_set
+
+    @classmethod
+    def from_table(cls, table, time_per_exposure, readout_time=0 * u.second,
+                   configuration={}, constraints=None):
+        """
+        Blocks from the rows of a table of planned observations.
+
+        Parameters
+        ----------
+        table : `~astropy.table.Table` or list of tuples
+            Rows of target, priority and number of exposures.
+        time_per_exposure, readout_time : `~astropy.units.Quantity`
+            Same for all blocks.
+        """
+        rows = [tuple(row) for row in table]
+        if not rows:
+            return cls([], [] * u.second, [], configuration=configuration,
+                       constraints=constraints)
+        targets, priorities, number_exposures = zip(*rows)
+        return cls.from_exposures(targets, priorities, time_per_exposure, number_exposures,
+                                  readout_time, configuration, constraints)
+
+    def copy(self):
+        """A copy of the set with its own arrays and new views, like copying every block."""
+        block_set = copy.copy(self)
+        for name in ('target_index', 'durations', 'priorities', 'offsets'):
+            setattr(block_set, name, getattr(self, name).copy())
+        block_set._views = [None] * len(self)
+        return block_set
+
+    def prepare(self, constraints):
+        """
+        Combine the set's constraints with the scheduler's ``constraints``,
+        the same way the schedulers do for single blocks, and set the
+        offsets from the durations.
+
+        Returns
+        -------
+        all_constraints : list of `~astroplan.constraints.Constraint`
+            The constraints of every block of the set.
+        """
+        if self.constraints is None:
+            all_constraints = constraints
+        else:
+            all_constraints = constraints + self.constraints
+        # to make sure the scheduler has some constraint to work off of
+        # and to prevent scheduling of targets below the horizon
+        if all_constraints is None:
+            all_constraints = [AltitudeConstraint(min=0 * u.deg)]
+            self.constraints = [AltitudeConstraint(min=0 * u.deg)]
+        elif not any(isinstance(c, AltitudeConstraint) for c in all_constraints):
+            all_constraints.append(AltitudeConstraint(min=0 * u.deg))
+            if self.constraints is None:
+                self.constraints = [AltitudeConstraint(min=0 * u.deg)]
+            else:
+                self.constraints.append(AltitudeConstraint(min=0 * u.deg))
+        self.offsets = self.durations[:, np.newaxis] * np.array([0., 0.5, 1.])
+        return all_constraints
+
+
+class _BlockView(ObservingBlock):
+    """An `ObservingBlock` reading and writing row ``row`` of an `ObservingBlockSet`."""
+
+    def __init__(self, block_set, row):
+        self._block_set = block_set
+        self._row = row
+        self.start_time = self.end_time = None
+        self.observer = None
+        self.calibration = False
+
+    @property
+    def target(self):
+        return self._block_set.targets[self._block_set.target_index[self._row]]
+
+    @property
+    def duration(self):
+        return self._block_set.durations[self._row] * u.second
+
+    @duration.setter
+    def duration(self, duration):
+        self._block_set.durations[self._row] = duration.to_value(u.second)
+
+    @property
+    def priority(self):
+        return self._block_set.priorities[self._row]
+
+    @priority.setter
+    def priority(self, priority):
+        self._block_set.priorities[self._row] = priority
+
+    @property
+    def configuration(self):
+        return self._block_set.configuration
+
+    @property
+    def constraints(self):
+        return self._block_set.constraints
+
+    @constraints.setter
+    def constraints(self, constraints):
+        self._block_set.constraints = constraints
+
+    @property
+    def _duration_offsets(self):
+        return self._block_set.offsets[self._row] * u.second
+
+    @_duration_offsets.setter
+    def _duration_offsets(self, offsets):
+        self._block_set.offsets[self._row] = offsets.to_value(u.second)
+
+    @property
+    def number_exposures(self):
+        return self._block_set.number_exposures[self._row]
+
+    @property
+    def time_per_exposure(self):
+        return self._exposure_setting('time_per_exposure')
+
+    @property
+    def readout_time(self):
+        return self._exposure_setting('readout_time')
+
+    def _exposure_setting(self, name):
+        value = getattr(self._block_set, name)
+        return value[self._row] if not value.isscalar else value
+
+
+def _duration_offsets(blocks):
+    """
+    (blocks x 3) start, middle and end offsets of ``blocks`` in seconds,
+    straight from the arrays if they are all views of one `ObservingBlockSet`.
+    """
+    block_set = getattr(blocks[0], '_block_set', None) if len(blocks) else None
+    if block_set is not None and all(getattr(b, '_block_set', None) is block_set for b in blocks):
+        return block_set.offsets[[b._row for b in blocks]]
+    return np.array([b._duration_offsets.to_value(u.second) for b in blocks])
+
+
+def _constraint_key(constraint):
+    """
+    Key that is the same for constraints of the same class with equal
+    settings, so that they can be evaluated together.
+    """
+    items = []
+    for name, value in sorted(vars(constraint).items()):
+        if isinstance(value, Time):
+            value = ('time', tuple(np.ravel(value.jd)))
+        elif isinstance(value, u.Quantity):
+            value = (tuple(np.ravel(value.value)), str(value.unit))
+        elif isinstance(value, np.ndarray):
+            value = tuple(np.ravel(value))
+        try:
+            hash(value)
+        except TypeError:
+            value = ('id', id(value))
+        items.append((name, value))
+    return (type(constraint),) + tuple(items)
+
+
 class Scorer(object):
     """
     Returns scores and score arrays from the evaluation of constraints on
@@ -124,16 +372,26 @@ class Scorer(object):
         self.global_constraints = global_constraints
         self.targets = get_skycoord([block.target for block in self.blocks])
 
-    def create_score_array(self, time_resolution=1*u.minute):
+    #: largest number of target-times a constraint is evaluated at in one call
+    max_grid_size = 2 ** 18
+
+    def create_score_array(self, time_resolution=1*u.minute, chunk_size=None):
         """
         this makes a score array over the entire schedule for all of the
         blocks and each `~astroplan.Constraint` in the .constraints of
         each block and in self.global_constraints.
 
+        Blocks with equal constraints (e.g. the same `AltitudeConstraint`
+        limits) are evaluated together, once per constraint over a
+        (targets x times) grid, and the time axis is evaluated in chunks.
+
         Parameters
         ----------
         time_resolution : `~astropy.units.Quantity`
             the time between each scored time
+        chunk_size : int or None
+            Number of times to evaluate a constraint at in one call. Defaults
+            to keeping every call under ``max_grid_size`` target-times.
 
         Returns
         -------
@@ -144,16 +402,23 @@ class Scorer(object):
         end = self.schedule.end_time
         times = time_grid_from_range((start, end), time_resolution)
         score_array = np.ones((len(self.blocks), len(times)))
+        groups = OrderedDict()
         for i, block in enumerate(self.blocks):
             # TODO: change the default constraints from None to []
             if block.constraints:
                 for constraint in block.constraints:
-                    applied_score = constraint(self.observer, block.target,
-                                               times=times)
-                    score_array[i] *= applied_score
-        for constraint in self.global_constraints:
-            score_array *= constraint(self.observer, self.targets, times,
-                                      grid_times_targets=True)
+                    groups.setdefault(_constraint_key(constraint), (constraint, []))[1].append(i)
+        if len(self.blocks):
+            for constraint in self.global_constraints:
+                groups.setdefault(('global', id(constraint)),
+                                  (constraint, list(range(len(self.blocks)))))
+        for constraint, indices in groups.values():
+            targets = get_skycoord([self.blocks[i].target for i in indices])[:, np.newaxis]
+            step = chunk_size or max(1, self.max_grid_size // len(indices))
+            for first in range(0, len(times), step):
+                last = min(first + step, len(times))
+                score_array[indices, first:last] *= constraint(self.observer, targets,
+                                                               times[first:last])
         return score_array
 
     @classmethod
@@ -229,6 +494,9 @@ class Schedule(object):
     """
     An object that represents a schedule, consisting of a list of
     `~astroplan.scheduling.Slot` objects.
+
+    The slots are stored as arrays in a `~astroplan.scheduling.SlotIndex`;
+    ``slots`` gives views of them as `~astroplan.scheduling.Slot` objects.
     """
     # as currently written, there should be no consecutive unoccupied slots
     # this should change to allow for more flexibility (e.g. dark slots, grey slots)
@@ -248,8 +516,10 @@ class Schedule(object):
         """
         self.start_time = start_time
         self.end_time = end_time
-        self.slots = [Slot(start_time, end_time)]
+        self._index = SlotIndex([Slot(start_time, end_time)])
         self.observer = None
+        # per-phase `~astropy.table.Table` of the last profiled run, see Scheduler
+        self.stats = None
         self.targColor = targColor
         self.calibColor = calibColor
         self.minalt = minalt
@@ -260,55 +530,71 @@ class Schedule(object):
                 ' observing blocks between ' + str(self.slots[0].start.iso) +
                 ' and ' + str(self.slots[-1].end.iso))
 
+    @property
+    def slots(self):
+        return self._index.slots
+
+    @slots.setter
+    def slots(self, slots):
+        self._index = SlotIndex(slots)
+
     @property
     def observing_blocks(self):
-        return [slot.block for slot in self.slots if isinstance(slot.block, ObservingBlock)]
+        index = self._index
+        return [index.blocks[row] for row in index.block[index.kind == _OBSERVING]]
+
+    @property
+    def last_observing_block(self):
+        """The last `~astroplan.scheduling.ObservingBlock` scheduled, `None` if there are none."""
+        rows = self._index.rows(_OBSERVING)
+        return self._index.block_at(rows[-1]) if len(rows) else None
 
     @property
     def scheduled_blocks(self):
-        return [slot.block for slot in self.slots if slot.block]
+        index = self._index
+        return [index.blocks[row] for row in index.block[index.kind != _OPEN]]
 
     @property
     def open_slots(self):
-        return [slot for slot in self.slots if not slot.occupied]
+        return [self.slots[row] for row in self._index.rows(_OPEN)]
 
     def to_table(self, show_transitions=True, show_unused=False):
         # TODO: allow different coordinate types
+        index = self._index
+        rows = []
         target_names = []
-        start_times = []
-        end_times = []
-        durations = []
         ra = []
         dec = []
         config = []
-        for slot in self.slots:
-            if hasattr(slot.block, 'target'):
-                start_times.append(slot.start.iso)
-                end_times.append(slot.end.iso)
-                durations.append(slot.duration.to(u.minute).value)
-                target_names.append(slot.block.target.name)
-                ra.append(slot.block.target.ra)
-                dec.append(slot.block.target.dec)
-                config.append(slot.block.configuration)
-            elif show_transitions and slot.block:
-                start_times.append(slot.start.iso)
-                end_times.append(slot.end.iso)
-                durations.append(slot.duration.to(u.minute).value)
+        for row in range(len(index)):
+            block = index.block_at(row)
+            if hasattr(block, 'target'):
+                target_names.append(block.target.name)
+                ra.append(block.target.ra)
+                dec.append(block.target.dec)
+                config.append(block.configuration)
+            elif show_transitions and block:
                 target_names.append('TransitionBlock')
                 ra.append('')
                 dec.append('')
-                changes = list(slot.block.components.keys())
+                changes = list(block.components.keys())
                 if 'slew_time' in changes:
                     changes.remove('slew_time')
                 config.append(changes)
-            elif slot.block is None and show_unused:
-                start_times.append(slot.start.iso)
-                end_times.append(slot.end.iso)
-                durations.append(slot.duration.to(u.minute).value)
+            elif block is None and show_unused:
                 target_names.append('Unused Time')
                 ra.append('')
                 dec.append('')
                 config.append('')
+            else:
+                continue
+            rows.append(row)
+        rows = np.array(rows, dtype=int)
+        starts = index.start(rows)
+        ends = index.end(rows)
+        start_times = list(starts.iso)
+        end_times = list(ends.iso)
+        durations = list((ends - starts).to(u.minute).value)
         return Table([target_names, start_times, end_times, durations, ra, dec, config],
                      names=('target', 'start time (UTC)', 'end time (UTC)',
                             'duration (minutes)', 'ra', 'dec', 'configuration'))
@@ -355,46 +641,49 @@ class Schedule(object):
         """
         # due to float representation, this will change block start time
         # and duration by up to 1 second in order to fit in a slot
-        for j, slot in enumerate(self.slots):
-            if ((slot.start < start_time or abs(slot.start-start_time) < 1*u.second)
-                    and (slot.end > start_time + 1*u.second)):
-                slot_index = j
-        if (block.duration - self.slots[slot_index].duration) > 1*u.second:
+        slot_index = self._index.find(start_time + 1*u.second)
+        if slot_index is None:
+            raise ValueError('no slot at {0}'.format(start_time.iso))
+        slot_start = self._index.start(slot_index)
+        slot_end = self._index.end(slot_index)
+        slot_duration = slot_end - slot_start
+        if (block.duration - slot_duration) > 1*u.second:
             raise ValueError('longer block than slot')
-        elif self.slots[slot_index].end - block.duration < start_time:
-            start_time = self.slots[slot_index].end - block.duration
+        elif slot_end - block.duration < start_time:
+            start_time = slot_end - block.duration
 
-        if abs((self.slots[slot_index].duration - block.duration)) < 1 * u.second:
+        if abs((slot_duration - block.duration)) < 1 * u.second:
             # slot duration is very similar to block duration.
             # force equality so block fits
-            block.duration = self.slots[slot_index].duration
-            start_time = self.slots[slot_index].start
-            end_time = self.slots[slot_index].end
-        elif abs(self.slots[slot_index].start - start_time) < 1*u.second:
+            block.duration = slot_duration
+            start_time = slot_start
+            end_time = slot_end
+        elif abs(slot_start - start_time) < 1*u.second:
             # start time of block is very close to slot start time
             # force equality to avoid tiny gaps
-            start_time = self.slots[slot_index].start
+            start_time = slot_start
             end_time = start_time + block.duration
-        elif abs(self.slots[slot_index].end - start_time - block.duration) < 1*u.second:
+        elif abs(slot_end - start_time - block.duration) < 1*u.second:
             # end time is very close to slot end time
             # force equality to avoid tiny gaps
-            end_time = self.slots[slot_index].end
+            end_time = slot_end
         else:
             end_time = start_time + block.duration
 
         if isinstance(block, ObservingBlock):
             # TODO: make it shift observing/transition blocks to fill small amounts of open space
             block.end_time = start_time+block.duration
-        earlier_slots = self.slots[:slot_index]
-        later_slots = self.slots[slot_index+1:]
         block.start_time = start_time
-        new_slots = self.new_slots(slot_index, start_time, end_time)
+        # split a copy of the slot, so its times aren't rebuilt from the arrays again
+        slot = Slot(slot_start, slot_end)
+        slot.occupied = self._index.kind[slot_index] != _OPEN
+        new_slots = slot.split_slot(start_time, end_time)
         for new_slot in new_slots:
             if new_slot.middle:
                 new_slot.occupied = True
                 new_slot.block = block
-        self.slots = earlier_slots + new_slots + later_slots
-        return earlier_slots + new_slots + later_slots
+        self._index.replace(slot_index, new_slots)
+        return self.slots
 
     def change_slot_block(self, slot_index, new_block=None):
         """
@@ -423,8 +712,7 @@ class Schedule(object):
             self.slots[slot_index + 1].start = new_end
             return slot_index
         else:
-            self.slots[slot_index + 1].start = self.slots[slot_index].start
-            del self.slots[slot_index]
+            self._index.merge_next(slot_index)
             return slot_index - 1
 
 
@@ -486,6 +774,275 @@ class Slot(object):
             return [new_slot]
 
 
+# kinds of the slots in a SlotIndex
+_OPEN, _OBSERVING, _TRANSITION, _OTHER = 0, 1, 2, 3
+
+
+def _slot_kind(block):
+    if block is None:
+        return _OPEN
+    if isinstance(block, ObservingBlock):
+        return _OBSERVING
+    if isinstance(block, TransitionBlock):
+        return _TRANSITION
+    return _OTHER
+
+
+class SlotIndex(object):
+    """
+    The slots of a `~astroplan.scheduling.Schedule` in time order, as arrays
+    rather than `~astroplan.scheduling.Slot` objects.
+
+    Start and end times are kept as two-part JDs, so they convert back to
+    exactly the `~astropy.time.Time` they were made from, and as plain JDs
+    in ``starts`` and ``ends``, so that the slot holding a given time is
+    found by bisection. Every slot also has a ``kind`` code (open,
+    observing, transition or another block) and the index of its block in
+    ``blocks`` and of its target in ``targets`` (-1 if it has none).
+
+    ``slots`` gives `~astroplan.scheduling.Slot` views of the rows, made
+    only when they are accessed. A view reads and writes its row by
+    position, so it's only valid until slots are added or removed.
+
+    Finding a slot is O(log n), but inserting or merging slots copies the
+    columns, which is O(n). A schedule has at most a few hundred slots,
+    where the copy is a small part of an `~astroplan.scheduling.Schedule.insert_slot`
+    next to its `~astropy.time.Time` arithmetic.
+    """
+
+    def __init__(self, slots):
+        """
+        Parameters
+        -----------
+        slots : list of `~astroplan.scheduling.Slot`
+            Consecutive, non-overlapping slots in time order.
+        """
+        slots = list(slots)
+        self.scale = slots[0].start.scale if slots else 'utc'
+        self.format = slots[0].start.format if slots else 'jd'
+        self.blocks = []
+        self.targets = []
+        self._target_rows = {}
+        columns = self._columns(slots)
+        (self.start1, self.start2, self.end1, self.end2,
+         self.kind, self.block, self.target) = columns
+        self.starts = self.start1 + self.start2
+        self.ends = self.end1 + self.end2
+
+    def __len__(self):
+        return len(self.kind)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['starts'], state['ends']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.starts = self.start1 + self.start2
+        self.ends = self.end1 + self.end2
+
+    @property
+    def slots(self):
+        return _SlotList(self)
+
+    def _jds(self, time):
+        if time.scale != self.scale:
+            time = getattr(time, self.scale)
+        return time.jd1, time.jd2
+
+    def _add_block(self, block):
+        if block is None:
+            return -1, -1
+        self.blocks.append(block)
+        target = getattr(block, 'target', None)
+        if target is None:
+            return len(self.blocks) - 1, -1
+        name = getattr(target, 'name', None)
+        key = id(target) if name is None else name
+        if key not in self._target_rows:
+            self._target_rows[key] = len(self.targets)
+            self.targets.append(target)
+        return len(self.blocks) - 1, self._target_rows[key]
+
+    def _columns(self, slots):
+        columns = [[] for _ in range(7)]
+        for slot in slots:
+            row = self._jds(slot.start) + self._jds(slot.end) + (_slot_kind(slot.block),)
+            for column, value in zip(columns, row + self._add_block(slot.block)):
+                column.append(value)
+        dtypes = [float] * 4 + [np.int8, int, int]
+        return [np.array(column, dtype=dtype) for column, dtype in zip(columns, dtypes)]
+
+    def time(self, jd1, jd2):
+        """`~astropy.time.Time` from parts of the time columns."""
+        time = Time(jd1, jd2, format='jd', scale=self.scale)
+        time.format = self.format
+        return time
+
+    def start(self, index):
+        """Start time of the slot at ``index``."""
+        return self.time(self.start1[index], self.start2[index])
+
+    def end(self, index):
+        """End time of the slot at ``index``."""
+        return self.time(self.end1[index], self.end2[index])
+
+    def block_at(self, index):
+        """Block of the slot at ``index``, `None` if it's open."""
+        row = self.block[index]
+        return None if row < 0 else self.blocks[row]
+
+    def rows(self, *kinds):
+        """Indices of the slots of the given ``kinds``, in time order."""
+        return np.flatnonzero(np.isin(self.kind, kinds))
+
+    def find(self, time):
+        """
+        Index of the slot that starts before and ends after ``time``, or `None`.
+
+        Parameters
+        ----------
+        time : `~astropy.time.Time` or float
+            The time to look up, as a `~astropy.time.Time` or a JD.
+        """
+        jd = time.jd if isinstance(time, Time) else time
+        index = int(np.searchsorted(self.starts, jd, 'left')) - 1
+        if index >= 0 and self.ends[index] > jd:
+            return index
+        return None
+
+    def replace(self, index, new_slots):
+        """
+        Replace the slot at ``index`` with ``new_slots``, e.g. the pieces
+        returned by `~astroplan.scheduling.Slot.split_slot`. Copies the
+        columns, O(n).
+        """
+        columns = self._columns(new_slots)
+        names = ('start1', 'start2', 'end1', 'end2', 'kind', 'block', 'target')
+        for name, column in zip(names, columns):
+            old = getattr(self, name)
+            setattr(self, name, np.concatenate((old[:index], column, old[index + 1:])))
+        self.starts = np.concatenate((self.starts[:index], columns[0] + columns[1],
+                                      self.starts[index + 1:]))
+        self.ends = np.concatenate((self.ends[:index], columns[2] + columns[3],
+                                    self.ends[index + 1:]))
+
+    def set_start(self, index, time):
+        self.start1[index], self.start2[index] = self._jds(time)
+        self.starts[index] = self.start1[index] + self.start2[index]
+
+    def set_end(self, index, time):
+        self.end1[index], self.end2[index] = self._jds(time)
+        self.ends[index] = self.end1[index] + self.end2[index]
+
+    def set_block(self, index, block):
+        self.kind[index] = _slot_kind(block)
+        self.block[index], self.target[index] = self._add_block(block)
+
+    def merge_next(self, index):
+        """
+        Remove the slot at ``index`` by extending the slot after it back to
+        its start time. Copies the columns, O(n).
+        """
+        self.start1[index + 1] = self.start1[index]
+        self.start2[index + 1] = self.start2[index]
+        self.starts[index + 1] = self.starts[index]
+        for name in ('start1', 'start2', 'end1', 'end2', 'kind', 'block', 'target',
+                     'starts', 'ends'):
+            setattr(self, name, np.delete(getattr(self, name), index))
+
+    def copy(self, blocks=None):
+        """
+        A copy of the index, unaffected by slots inserted into or edited in
+        this one.
+
+        Parameters
+        ----------
+        blocks : dict or None
+            Blocks to put in the copy instead of those of the index, by `id`.
+        """
+        index = copy.copy(self)
+        for name in ('start1', 'start2', 'end1', 'end2', 'kind', 'block', 'target',
+                     'starts', 'ends'):
+            setattr(index, name, getattr(self, name).copy())
+        index.blocks = [block if blocks is None else blocks.get(id(block), block)
+                        for block in self.blocks]
+        index.targets = list(self.targets)
+        index._target_rows = dict(self._target_rows)
+        return index
+
+
+class _SlotView(Slot):
+    """A `Slot` reading and writing the row ``row`` of a `SlotIndex`."""
+
+    middle = False
+
+    def __init__(self, index, row):
+        self._slot_index = index
+        self._row = row
+
+    def __repr__(self):
+        return '<Slot {0} to {1}: {2}>'.format(self.start.iso, self.end.iso, self.block)
+
+    @property
+    def start(self):
+        return self._slot_index.start(self._row)
+
+    @start.setter
+    def start(self, time):
+        self._slot_index.set_start(self._row, time)
+
+    @property
+    def end(self):
+        return self._slot_index.end(self._row)
+
+    @end.setter
+    def end(self, time):
+        self._slot_index.set_end(self._row, time)
+
+    @property
+    def block(self):
+        return self._slot_index.block_at(self._row)
+
+    @block.setter
+    def block(self, block):
+        self._slot_index.set_block(self._row, block)
+
+    @property
+    def occupied(self):
+        return self._slot_index.kind[self._row] != _OPEN
+
+    @occupied.setter
+    def occupied(self, occupied):
+        # a row is occupied exactly when it has a block
+        if not occupied:
+            self.block = None
+        elif self._slot_index.kind[self._row] == _OPEN:
+            raise ValueError('a slot of a schedule is occupied by setting its block')
+
+
+class _SlotList(object):
+    """The slots of a `SlotIndex` as a sequence of `_SlotView`."""
+
+    def __init__(self, index):
+        self._index = index
+
+    def __len__(self):
+        return len(self._index)
+
+    def __iter__(self):
+        return (_SlotView(self._index, row) for row in range(len(self._index)))
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [_SlotView(self._index, row) for row in range(*item.indices(len(self)))]
+        row = item + len(self) if item < 0 else item
+        if not 0 <= row < len(self):
+            raise IndexError('slot index out of range')
+        return _SlotView(self._index, row)
+
+
 class Scheduler(object):
     """
     Schedule a set of `~astroplan.scheduling.ObservingBlock` objects
@@ -493,9 +1050,12 @@ class Scheduler(object):
 
     __metaclass__ = ABCMeta
 
+    # (method, phase) pairs timed when profiling
+    _profiled_methods = ()
+
     @u.quantity_input(gap_time=u.second, time_resolution=u.second)
     def __init__(self, constraints, observer, transitioner=None,
-                 gap_time=5*u.min, time_resolution=20*u.second):
+                 gap_time=5*u.min, time_resolution=20*u.second, profile=False):
         """
         Parameters
         ----------
@@ -513,6 +1073,10 @@ class Scheduler(object):
         time_resolution : `~astropy.units.Quantity` with time units
             The smallest factor of time used in scheduling, all Blocks scheduled
             will have a duration that is a multiple of it.
+        profile : bool
+            Time the phases of every run (constraint evaluation, transitions,
+            ``insert_slot``, ...) and attach the result to the schedule as
+            ``schedule.stats``, see `~astroplan.profiling.PhaseStats`.
         """
         self.constraints = constraints
         self.observer = observer
@@ -521,6 +1085,8 @@ class Scheduler(object):
             raise ValueError("A Transitioner is required")
         self.gap_time = gap_time
         self.time_resolution = time_resolution
+        self.profile = profile
+        self.stats = NullStats()
 
     def __call__(self, blocks, schedule):
         """
@@ -531,7 +1097,8 @@ class Scheduler(object):
         blocks : list of `~astroplan.scheduling.ObservingBlock` objects
             The observing blocks to schedule.  Note that the input
             `~astroplan.scheduling.ObservingBlock` objects will *not* be
-            modified - new ones will be created and returned.
+            modified - new ones will be created and returned. An
+            `~astroplan.scheduling.ObservingBlockSet` can be given instead.
         schedule : `~astroplan.scheduling.Schedule` object
             A schedule that the blocks will be scheduled in. At this time
             the ``schedule`` must be empty, only defined by a start and
@@ -547,11 +1114,33 @@ class Scheduler(object):
         """
         self.schedule = schedule
         self.schedule.observer = self.observer
-        # these are *shallow* copies
-        copied_blocks = [copy.copy(block) for block in blocks]
-        schedule = self._make_schedule(copied_blocks)
+        if not self.profile:
+            self.stats = NullStats()
+            return self._make_schedule(self._copy_blocks(blocks))
+
+        self.stats = PhaseStats()
+        self.stats.wrap(self, 'transitioner', 'transitions', methods=('durations',))
+        self.stats.wrap(self.schedule, 'insert_slot', 'insert_slot')
+        for method, phase in self._profiled_methods:
+            self.stats.wrap(self, method, phase)
+        try:
+            with self.stats.phase('total'):
+                schedule = self._make_schedule(self._copy_blocks(blocks))
+        finally:
+            self.stats.restore()
+            self.schedule.stats = self.stats.table(total='total')
         return schedule
 
+    @staticmethod
+    def _copy_blocks(blocks):
+        """
+        *Shallow* copies of ``blocks``, as a list; the views of a copy of
+        the set if ``blocks`` is an `~astroplan.scheduling.ObservingBlockSet`.
+        """
+        if isinstance(blocks, ObservingBlockSet):
+            return list(blocks.copy())
+        return [copy.copy(block) for block in blocks]
+
     @abstractmethod
     def _make_schedule(self, blocks):
         """
@@ -599,6 +1188,78 @@ class Scheduler(object):
 def getDegree(elem):
     return elem[0].degree
 
+
+def _block_key(block): #Viss, no ka atkarigs block novertejums un ievietosana
+    # constraints compare by identity, which survives pickling along with the scheduler
+    target = block.target
+    return (target.ra.deg, target.dec.deg, block.duration.to_value(u.second), block.priority,
+            None if block.constraints is None else list(block.constraints))
+
+
+class _RunRecord(object):
+    """
+    What an incremental `SequentialScheduler` keeps of a run so that it can
+    be continued from any step of the scheduling loop: the settings and
+    blocks it started with, the blocks fixed before the loop, and the state
+    and slots of the schedule at the top of every step along with the
+    candidates the step tried and the blocks it took out.
+    """
+
+    def __init__(self, scheduler, blocks, filled_times):
+        self.settings = scheduler._run_settings()
+        self.filled_times = filled_times
+        self.schedule = scheduler.schedule
+        self.order = [block.target.name for block in blocks]
+        self.blocks = dict((block.target.name, block) for block in blocks)
+        self.keys = dict((name, _block_key(block)) for name, block in self.blocks.items())
+        self.fixed = []
+        self.preFilled = []
+        self.steps = []
+        self.stopped = False
+        self._remaining = None
+        self._scores = None
+
+    def prefilled(self, preFilled, blocks):
+        """Record the blocks the fixed times took out before the loop."""
+        left = set(block.target.name for block in blocks)
+        self.fixed = [self.blocks[name] for name in self.order if name not in left]
+        self.preFilled = list(preFilled)
+
+    def step(self, current_time, blocks, timeStart=None, lastBlock=None, firstSchedule=None):
+        """
+        Record the state at the top of a step, closing the previous step.
+        Returns the dict of the new step.
+        """
+        names = [block.target.name for block in blocks]
+        if self._remaining is not None:
+            left = set(names)
+            scores = self._scores
+            self.steps[-1]['removed'] = [(name, 0. if scores is None else scores[i])
+                                         for i, name in enumerate(self._remaining) if name not in left]
+        step = {'t': current_time, 'last': self.schedule.last_observing_block,
+                'slots': self.schedule._index.copy(),
+                'timeStart': timeStart, 'lastBlock': lastBlock, 'firstSchedule': firstSchedule,
+                'fill': False, 'removed': [], 'tried': [], 'final': False, 'stopped': False}
+        self.steps.append(step)
+        self._remaining = names
+        self._scores = None
+        return step
+
+    def scored(self, scores):
+        """Record the scores of the remaining blocks in the current step."""
+        self._scores = list(scores[:len(self._remaining)])
+
+    def finish(self, current_time, blocks, end_time, timeStart=None, lastBlock=None,
+               firstSchedule=None):
+        """Record the state the loop ended in."""
+        step = self.step(current_time, blocks, timeStart, lastBlock, firstSchedule)
+        step['final'] = True
+        # the loop was left with a break, not because it ran out of blocks or time
+        step['stopped'] = self.stopped or (len(blocks) > 0 and current_time < end_time)
+        self._remaining = None
+        return step
+
+
 class SequentialScheduler(Scheduler):
     """
     A scheduler that does "stupid simple sequential scheduling".  That is, it
@@ -606,286 +1267,739 @@ class SequentialScheduler(Scheduler):
     moves on.
     """
 
-    def __init__(self, calibrators=None, colorDict=None, config=None, timeDict=None, *args, **kwargs):
+    _profiled_methods = (('prepare_ephemeris', 'ephemeris'), ('score_blocks', 'scoring'),
+                         ('evaluate_constraint', 'constraints'),
+                         ('get_closest_calibrator', 'calibrators'),
+                         ('get_shortest_observation', 'shortest'))
+
+    def __init__(self, calibrators=None, colorDict=None, config=None, timeDict=None, ephemeris=None,
+                 ephemeris_resolution=1*u.min, trace=None, incremental=False, tie_tolerance=None,
+                 calibrator_choices=1, split_policy='gap', seed=None, *args, **kwargs):
+        """
+        Parameters
+        ----------
+        ephemeris : `~astroplan.ephemeris.EphemerisTable` (optional)
+            A precomputed table to reuse, e.g. from an earlier run over the same
+            window. If it doesn't cover the window or the targets, a new one is built.
+        ephemeris_resolution : `~astropy.units.Quantity`
+            Grid spacing of the ephemeris table built at the start of ``_make_schedule``.
+        trace : `~astroplan.trace.DecisionTrace`, str, bool or None
+            Where to record the scheduler's decisions, see `~astroplan.trace.make_trace`.
+            Disabled by default, in which case nothing is computed for it.
+        incremental : bool
+            Keep the state of every step of the last run, so that `reschedule`
+            can redo only the steps an edit of the blocks affects.
+        tie_tolerance : float or None
+            If not `None`, the best block of a step is picked at random from the
+            blocks scoring within this fraction of the best score, instead of
+            the first of the best.
+        calibrator_choices : int
+            Pick a calibrator at random from this many of the nearest ones that
+            fit, instead of the nearest.
+        split_policy : str
+            How blocks longer than ``maxtimewithoutcalibration`` are split:
+            ``'gap'`` into pieces of that length and a shorter last piece,
+            ``'equal'`` into as many pieces of equal length.
+        seed : int or None
+            Seed of the random choices of ``tie_tolerance`` and ``calibrator_choices``.
+        """
         self.calibrators = calibrators
         self.colorDict = colorDict
         self.config = config
         self.load_config()
         self.timeDict = timeDict
+        self.ephemeris = ephemeris
+        self.ephemeris_resolution = ephemeris_resolution
+        self.calibrator_index = None
+        self.trace = make_trace(trace)
+        self.incremental = incremental
+        if split_policy not in ('gap', 'equal'):
+            raise ValueError("split_policy should be 'gap' or 'equal', not {0!r}".format(split_policy))
+        self.tie_tolerance = tie_tolerance
+        self.calibrator_choices = calibrator_choices
+        self.split_policy = split_policy
+        self.seed = seed
+        self._random = np.random.RandomState(seed)
+        self._record = None
+        self._resume = None
         super(SequentialScheduler, self).__init__(*args, **kwargs)
 
+    def __call__(self, blocks, schedule, trace=None):
+        """
+        Schedule ``blocks`` in ``schedule``, see `Scheduler.__call__`.
+
+        ``trace`` replaces ``self.trace`` for this run only.
+        """
+        default = self.trace
+        if trace is not None:
+            self.trace = make_trace(trace)
+        try:
+            if self.trace.enabled:
+                self.trace.start_run(start=schedule.start_time, end=schedule.end_time,
+                                     blocks=len(blocks), calibration=bool(self.calibrators))
+            result = super(SequentialScheduler, self).__call__(blocks, schedule)
+            if self.trace.enabled:
+                self.trace.finish_run(scheduled=len(self.schedule.observing_blocks))
+            return result
+        finally:
+            self.trace = default
+
+    def reschedule(self, blocks, schedule, trace=None):
+        """
+        Schedule ``blocks`` again after an edit of the blocks of the last run,
+        e.g. a changed priority or duration, or a block added or removed.
+
+        Blocks are matched to those of the last run by target name. The steps
+        of the last run before the first step the edit can change are kept as
+        they were, and only the rest of the loop is run again, reusing the
+        ephemeris, slew and calibrator tables. If the last run can't be
+        continued (no last run, or a different window or settings), all of
+        ``blocks`` are scheduled from scratch.
+
+        Parameters
+        ----------
+        blocks : list of `~astroplan.scheduling.ObservingBlock`
+            All the blocks to schedule, as for a full run.
+        schedule : `~astroplan.scheduling.Schedule`
+            An empty schedule over the window of the last run.
+        trace : see `__call__`
+        """
+        if not self.incremental:
+            raise ValueError("reschedule needs a scheduler made with incremental=True")
+        self._resume = self._record
+        try:
+            return self(blocks, schedule, trace=trace)
+        finally:
+            self._resume = None
+
     def load_config(self): #Ielade config iestatijumus
         self.calibGap = int(self.config['maxtimewithoutcalibration'])
         self.calibLen = int(self.config['calibrationlength'])
         self.minAlt = int(self.config['minaltitude'])
         self.maxAlt = int(self.config['maxaltitude'])
 
+    def prepare_ephemeris(self, blocks): #Vienreiz aprekina alt/az visiem targets un calibrators
+        """
+        Make sure ``self.ephemeris`` covers the schedule window and every target
+        in ``blocks`` and ``self.calibrators``, building a new table if needed.
+        If the transitioner precomputes slews, its slew table is sampled from it.
+        """
+        targets = [b.target for b in blocks] + list(self.calibrators or [])
+        if not targets:
+            return self.ephemeris
+        longest = max([b.duration for b in blocks] + [self.calibLen * u.min])
+        margin = longest + self.gap_time + 1 * u.hour
+        end = self.schedule.end_time + margin
+        if not (self.ephemeris is not None and
+                self.ephemeris.covers(Time([self.schedule.start_time, end])) and
+                all(self.ephemeris.row(target) is not None for target in targets)):
+            if self.incremental and self.ephemeris is not None:
+                # edits bring targets back, keep tabulating those of earlier runs
+                targets = targets + self.ephemeris.targets
+            self.ephemeris = EphemerisTable.from_range(self.observer, targets,
+                                                       self.schedule.start_time,
+                                                       self.schedule.end_time,
+                                                       time_resolution=self.ephemeris_resolution,
+                                                       margin=margin)
+        if getattr(self.transitioner, 'precompute_slews', False):
+            self.transitioner.precompute(self.observer, targets, self.schedule.start_time,
+                                         self.schedule.end_time, margin=margin,
+                                         ephemeris=self.ephemeris)
+        return self.ephemeris
+
+    def evaluate_constraint(self, constraint, target, times):
+        if self.ephemeris is not None:
+            return self.ephemeris.evaluate(constraint, target, times)
+        if not isinstance(times, Time):
+            times = Time(times, format='jd')
+        if isinstance(target, list):
+            target = get_skycoord(target)[:, np.newaxis]
+        return constraint(self.observer, target, times)
+
+    def _seconds(self, time): #Laiks sekundes no loga sakuma
+        """
+        Seconds from the start of the scheduled window to ``time``.
+        """
+        return ((time.jd1 - self._window_start.jd1) +
+                (time.jd2 - self._window_start.jd2)) * 86400.
+
+    def _time(self, seconds):
+        """
+        `~astropy.time.Time` ``seconds`` after the start of the scheduled window.
+        """
+        start = self._window_start
+        time = Time(start.jd1, start.jd2 + np.asarray(seconds) / 86400.,
+                    format='jd', scale=start.scale)
+        time.format = start.format
+        return time
+
+    def _jd(self, seconds):
+        """
+        JD ``seconds`` after the start of the scheduled window, precise enough
+        for evaluating constraints but not for placing blocks.
+        """
+        return self._window_start_jd + np.asarray(seconds) / 86400.
+
+    def _prepare_blocks(self, blocks): #Pievieno blocks constraints un nobides
+        """
+        Set ``_all_constraints``, ``_duration_offsets`` and ``observer`` of
+        every block; once per set for views of an
+        `~astroplan.scheduling.ObservingBlockSet`.
+        """
+        prepared = {}
+        for b in blocks:
+            block_set = getattr(b, '_block_set', None)
+            if block_set is not None:
+                if id(block_set) not in prepared:
+                    prepared[id(block_set)] = block_set.prepare(self.constraints)
+                b._all_constraints = prepared[id(block_set)]
+                b.observer = self.observer
+                continue
+            if b.constraints is None:
+                b._all_constraints = self.constraints
+            else:
+                b._all_constraints = self.constraints + b.constraints
+            # to make sure the scheduler has some constraint to work off of
+            # and to prevent scheduling of targets below the horizon
+            # TODO : change default constraints to [] and switch to append
+            if b._all_constraints is None:
+                b._all_constraints = [AltitudeConstraint(min=0 * u.deg)]
+                b.constraints = [AltitudeConstraint(min=0 * u.deg)]
+            elif not any(isinstance(c, AltitudeConstraint) for c in b._all_constraints):
+                b._all_constraints.append(AltitudeConstraint(min=0 * u.deg))
+                if b.constraints is None:
+                    b.constraints = [AltitudeConstraint(min=0 * u.deg)]
+                else:
+                    b.constraints.append(AltitudeConstraint(min=0 * u.deg))
+            b._duration_offsets = u.Quantity([0 * u.second, b.duration / 2,
+                                              b.duration])
+            b.observer = self.observer
+
+    def _filled_times(self): #Jau aizpilditie laiki sekundes no loga sakuma
+        """
+        Start and end seconds of the slots filled before scheduling, flat and
+        as (n, 2) pairs; two dummy slots before the window if there are none.
+        """
+        pre_filled = np.array([[block.start_time, block.end_time] for
+                               block in self.schedule.scheduled_blocks])
+        if len(pre_filled) == 0:
+            a = self.schedule.start_time
+            filled_times = Time([a - 1 * u.hour, a - 1 * u.hour,
+                                 a - 1 * u.minute, a - 1 * u.minute])
+        else:
+            filled_times = Time(pre_filled.flatten())
+        filled_times = self._seconds(filled_times)
+        return filled_times, filled_times.reshape((int(len(filled_times) / 2), 2))
+
+    def _insert_fixed_blocks(self, blocks, preFilled, hour_offset=0): #Ievieto blocks ar timeDict dotajiem laikiem
+        """
+        Schedule the blocks with a time in ``self.timeDict`` at that time, if
+        they fit, taking them out of ``blocks`` and adding their start and end
+        seconds to ``preFilled``. ``hour_offset`` is added to the hours of
+        the times.
+        """
+        for key, value in self.timeDict.items():
+            string = value
+            hour, min = string.split(":")
+            obsTime = self.schedule.start_time.to_datetime()
+            obsTime = obsTime.replace(hour = int(hour) + hour_offset, minute=int(min))
+            obsTime = Time(obsTime)
+            for block in blocks:
+                if block.target.name == key:
+                    newb = block
+                    break
+
+            newb.start_time = obsTime
+
+            newb.end_time = obsTime + newb.duration
+            obsStart = self._seconds(obsTime)
+            if self.fits_constraints(newb, obsStart):
+                preFilledOK = True
+                for preFilledStart, preFilledEnd in preFilled:
+                    if obsStart < preFilledStart and obsStart + newb.duration.to_value(u.second) > preFilledStart:
+                        preFilledOK = False
+                    if obsStart > preFilledStart and obsStart < preFilledEnd:
+                        preFilledOK = False
+                if preFilledOK:
+                    self.schedule.insert_slot(newb.start_time, newb)
+                    if self.trace.enabled:
+                        self.trace.record('fixed', target=key, time=value, start=obsStart)
+                    preFilled.append([obsStart, obsStart + newb.duration.to_value(u.second)])
+                    blocks.remove(newb)
+                else:
+                    if self.trace.enabled:
+                        self.trace.record('fixed_rejected', target=key, time=value, reason='overlap')
+            else:
+                if self.trace.enabled:
+                    self.trace.record('fixed_rejected', target=key, time=value, reason='constraints')
+
+    def score_blocks(self, blocks, current_time, filled_times, pre_filled): #Noverte visus blocks uzreiz
+        """
+        Score every block in ``blocks`` as if it were started at ``current_time``
+        (after its transition), with one broadcast evaluation per constraint.
+
+        Parameters
+        ----------
+        blocks : list of `~astroplan.scheduling.ObservingBlock`
+            Remaining blocks, with ``_all_constraints`` and ``_duration_offsets`` set.
+        current_time : float
+            Seconds since the start of the window when the transition to the
+            block would start.
+        filled_times, pre_filled : `~numpy.ndarray`
+            Start/end seconds of the slots filled before scheduling, flat and
+            as (n, 2) pairs.
+
+        Returns
+        -------
+        block_constraint_results : list of float
+            Product of all constraints over all three check times for each block,
+            zero for blocks that would run into a pre-filled slot.
+        """
+        return self._score_blocks(blocks, current_time, self.schedule.last_observing_block,
+                                  filled_times, pre_filled)
+
+    def _score_blocks(self, blocks, current_time, last_block, filled_times, pre_filled):
+        """`score_blocks` with the transitions starting from ``last_block``."""
+        return list(self._score_candidates(blocks, current_time, last_block,
+                                           filled_times, pre_filled)[0])
+
+    def _score_candidates(self, blocks, current_time, last_block, filled_times, pre_filled):
+        """
+        `_score_blocks` as an array, along with the (blocks x 3) start, middle
+        and end seconds each block was scored at.
+        """
+        if last_block is not None:
+            trans_times = self.transitioner.durations(last_block, blocks,
+                                                      self._time(current_time), self.observer)
+        else:
+            trans_times = np.zeros(len(blocks))
+        offsets = _duration_offsets(blocks)
+        # (blocks x 3) start, middle and end times of every candidate
+        times = current_time + trans_times[:, np.newaxis] + offsets
+
+        # make sure it isn't in a pre-filled slot
+        blocked = np.any((current_time < filled_times) &
+                         (filled_times < times[:, 2:3]), axis=1)
+        if any(abs(pre_filled.T[0] - current_time) < 1):
+            blocked[:] = True
+
+        scores = np.ones(len(blocks))
+        groups = OrderedDict()
+        for i, b in enumerate(blocks):
+            if not blocked[i]:
+                for constraint in b._all_constraints:
+                    groups.setdefault(id(constraint), (constraint, []))[1].append(i)
+        for constraint, indices in groups.values():
+            res = self.evaluate_constraint(constraint, [blocks[i].target for i in indices],
+                                           self._jd(times[indices]))
+            # take the product over all the constraints *and* times
+            scores[indices] *= np.prod(res, axis=1)
+        scores[blocked] = 0
+        return scores, times
+
+    def _altitudes(self, target, times): #Tikai trace vajadzibam
+        """
+        Altitudes of ``target`` in degrees at ``times`` (JD), from the ephemeris
+        if it covers them.
+        """
+        if self.ephemeris is not None and self.ephemeris.covers(times):
+            return self.ephemeris.altitude(target, times)
+        return self.observer.altaz(Time(times, format='jd'), target).alt.deg
+
     def fits_constraints(self, block, start_time, last_block = None): #Paligfunkcija, kas parbauda vai konkrets block atbilst constraints
         for constraint in self.constraints:
             if last_block is not None:
-                trans = self.transitioner(last_block, block, start_time, self.observer)
+                trans = self.transitioner(last_block, block, self._time(start_time), self.observer)
             else:
                 trans = None
-            transition_time = 0 * u.second if trans is None else trans.duration
-            times = start_time + transition_time + u.Quantity(
-                [0 * u.second, self.calibLen * u.min / 2, self.calibLen * u.min])
-            calibratorConstraint = constraint(self.observer, block.target, times)
-            for time in times:
-                print(self.observer.altaz(time, block.target).alt.to_string(decimal=True))
+            transition_time = 0 if trans is None else trans.duration.to_value(u.second)
+            times = self._jd(start_time + transition_time +
+                             np.array([0, self.calibLen * 60. / 2, self.calibLen * 60.]))
+            calibratorConstraint = self.evaluate_constraint(constraint, block.target, times)
+            if self.trace.enabled:
+                self.trace.record('constraint', target=block.target.name, t=start_time + transition_time,
+                                  constraint=type(constraint).__name__, values=calibratorConstraint,
+                                  altitudes=self._altitudes(block.target, times))
             if False in calibratorConstraint:
                 return False
         return True
 
+    def prepare_calibrator_index(self, blocks): #Vienreiz aprekina kalibratoru attalumus lidz visiem targets
+        """
+        Make sure ``self.calibrator_index`` indexes ``self.calibrators``, with the
+        nearest calibrators of every target in ``blocks`` precomputed.
+        """
+        if not self.calibrators:
+            self.calibrator_index = None
+            return None
+        if (self.calibrator_index is None or
+                self.calibrator_index.calibrators != list(self.calibrators)):
+            self.calibrator_index = CalibratorIndex(self.calibrators)
+        self.calibrator_index.add_targets([b.target for b in blocks])
+        return self.calibrator_index
+
     def get_closest_calibrator(self, next_block, current_time, last_block=None): #Paligfunkcija, kas no target atrod tuvako calibrator
-        angles = []
-        for calibrator in self.calibrators:
-            angles.append([next_block.target.coord.separation(calibrator.coord), calibrator])
-        angles.sort(key=getDegree)
-        for angle in angles:
-            calibrator = angle[1]
-            calibratorBlock = ObservingBlock(calibrator, self.calibLen * u.min, 1, calibration=True)
-            constraintTrue = True
+        index = self.calibrator_index
+        if index is None or index.calibrators != list(self.calibrators):
+            index = self.prepare_calibrator_index([next_block])
+        # check the nearest calibrators in growing batches, all of a batch at once
+        checked = 0
+        k = 16
+        while checked < len(index):
+            order, separations = index.nearest(next_block.target, k)
+            order = order[checked:]
+            calibrators = [self.calibrators[i] for i in order]
+            calibratorBlocks = [ObservingBlock(calibrator, self.calibLen * u.min, 1, calibration=True)
+                                for calibrator in calibrators]
+            if last_block is not None:
+                trans_times = self.transitioner.durations(last_block, calibratorBlocks,
+                                                          self._time(current_time), self.observer)
+            else:
+                trans_times = np.zeros(len(calibratorBlocks))
+            times = current_time + trans_times[:, np.newaxis] + np.array(
+                [0, self.calibLen * 60. / 2, self.calibLen * 60.])
+            # visibility of every candidate, for all constraints at all three times
+            fits = np.ones(len(calibrators), dtype=bool)
+            results = []
             for constraint in self.constraints:
-                if last_block is not None:
-                    trans = self.transitioner(last_block, calibratorBlock, current_time, self.observer)
-                else:
-                    trans = None
-                transition_time = 0 * u.second if trans is None else trans.duration
-                times = current_time + transition_time + u.Quantity(
-                    [0 * u.second, self.calibLen * u.min / 2, self.calibLen * u.min])
-                calibratorConstraint = constraint(self.observer, calibrator, times)
-                if False in calibratorConstraint:
-                    constraintTrue = False
-                    print("Calibrator ",calibrator.name," doesn't meet constraints, checking next")
-            if constraintTrue:
-                print("Calibrator ", calibrator.name, "  fits")
-                for time in times:
-                    print(self.observer.altaz(time, calibratorBlock.target).alt.to_string(decimal=True))
-                print(calibratorConstraint)
+                result = np.asarray(self.evaluate_constraint(constraint, calibrators,
+                                                             self._jd(times)))
+                results.append(result)
+                fits &= np.all(result != 0, axis=1)
+            fitting = np.flatnonzero(fits)
+            if len(fitting):
+                i = fitting[0]
+                if self.calibrator_choices > 1:
+                    i = fitting[self._random.randint(min(self.calibrator_choices, len(fitting)))]
+                calibrator = calibrators[i]
+                if self.trace.enabled:
+                    self.trace.record('calibrator', target=next_block.target.name, t=current_time,
+                                      calibrator=calibrator.name, rejected=checked + i,
+                                      values=[result[i] for result in results],
+                                      altitudes=self._altitudes(calibrator, self._jd(times[i])))
                 return calibrator
-        print("No calibrator fits, returning None")
+            checked += len(calibrators)
+            k *= 2
+        if self.trace.enabled:
+            self.trace.record('no_calibrator', target=next_block.target.name, t=current_time,
+                              rejected=checked)
         return None
 
+    def _best_block(self, results): #Paligfunkcija, kas izvelas labako block
+        """
+        Index of the best of the block ``results``: the first of the best, or
+        with ``tie_tolerance`` set, a random one of those within that fraction
+        of the best.
+        """
+        best = np.argmax(results)
+        if self.tie_tolerance is None or results[best] == 0:
+            return best
+        close = np.flatnonzero(np.asarray(results) >= results[best] * (1 - self.tie_tolerance))
+        return close[self._random.randint(len(close))]
+
+    def _split_length(self, duration): #Paligfunkcija, cik garos gabalos sagriezt noverojumu
+        """
+        Length of the pieces a block of ``duration`` is split into, see ``split_policy``.
+        """
+        gap = self.calibGap * u.min
+        if self.split_policy == 'equal':
+            pieces = np.ceil(float(duration / gap))
+            return np.ceil((duration / pieces).to_value(u.second)) * u.second
+        return gap
+
     def get_shortest_observation(self, current_time, blocks): #Paligfunkcija, kas atgriez visisako obs
-        print("Scheduled block by priority doesn't fit, checking if others do")
-        time_left = self.schedule.end_time - current_time
-        total_times = []
-        obs_times = []
-        trans_times = []
-        for b in blocks:
-            if len(self.schedule.observing_blocks) > 0:
-                trans = self.transitioner(self.schedule.observing_blocks[-1], b, current_time, self.observer)
-                if trans is not None:
-                    time = trans.duration
-                    trans_times.append(trans.duration.value)
-                    time += b.duration
-                    obs_times.append(b.duration.value)
-            else:
-                trans = 0
-                trans_times.append(trans)
-                time = b.duration
-                obs_times.append(b.duration.value)
-            total_times.append(time.value)
+        time_left = self._window_end - current_time
+        if self.schedule.last_observing_block is not None:
+            trans_times = self.transitioner.durations(self.schedule.last_observing_block, blocks,
+                                                      self._time(current_time), self.observer)
+        else:
+            trans_times = np.zeros(len(blocks))
+        obs_times = np.array([b.duration.to_value(u.second) for b in blocks])
+        total_times = list(trans_times + obs_times)
         index = np.argmin(total_times)
         shortest_time = total_times[index]
-        if (shortest_time * u.second > time_left):
-            print("No block fits or meets constraints")
+        if (shortest_time > time_left):
+            if self.trace.enabled:
+                self.trace.record('shortest', t=current_time, target=None, reason='too long')
             return None, None
         i = 1
         target = blocks[index].target
         while(i <= len(blocks)):
-            if trans_times[index] is not None:
-                transition_time = trans_times[index] * u.second
-            else:
-                transition_time = 0 * u.second
-
-            times = current_time + transition_time + u.Quantity(
-                [0 * u.second, obs_times[index] * u.second / 2, obs_times[index] * u.second])
+            times = self._jd(current_time + trans_times[index] +
+                             np.array([0, obs_times[index] / 2, obs_times[index]]))
             constraintTrue = True
             for constraint in self.constraints:
-                #for time in times:
-                #    print(self.observer.altaz(time, target).alt.to_string(decimal=True))
-                obsConstraint = constraint(self.observer, target, times)
+                obsConstraint = self.evaluate_constraint(constraint, target, times)
                 if False in obsConstraint:
                     constraintTrue = False
             if constraintTrue:
-                print(target.name, " fits and meets constraints")
+                if self.trace.enabled:
+                    self.trace.record('shortest', t=current_time, target=target.name, tried=i)
                 shortest_time = nsmallest(i, total_times)[-1]
                 return index, shortest_time * u.second
-            else:
-                print(target.name, " doesn't meet constraints")
+            elif self.trace.enabled:
+                self.trace.record('rejected', target=target.name, t=current_time, reason='constraints')
             i = i+1
             shortest_time = nsmallest(i, total_times)[-1]
-            if (shortest_time * u.second > time_left):
-                print("No block fits or meets constraints")
+            if (shortest_time > time_left):
+                if self.trace.enabled:
+                    self.trace.record('shortest', t=current_time, target=None, reason='too long', tried=i - 1)
                 return None, None
             index = total_times.index(shortest_time)
             target = blocks[index].target
-            print("Trying ", target.name)
-        print("No block meets constraints")
+        if self.trace.enabled:
+            self.trace.record('shortest', t=current_time, target=None, reason='constraints', tried=i - 1)
         return None, None
 
+    def _run_settings(self): #Iestatijumi, kuriem jasakrit, lai planosanu varetu turpinat
+        start, end = self.schedule.start_time, self.schedule.end_time
+        return (start.jd1, start.jd2, end.jd1, end.jd2,
+                [(c.name, c.ra.deg, c.dec.deg) for c in self.calibrators or []],
+                sorted((self.timeDict or {}).items()),
+                (self.calibGap, self.calibLen, self.minAlt, self.maxAlt),
+                (self.tie_tolerance, self.calibrator_choices, self.split_policy, self.seed),
+                list(self.constraints or []),
+                self.gap_time.to_value(u.second), self.transitioner)
+
+    def _resume_point(self, blocks, filled_times, pre_filled):
+        """
+        The run to continue and the step to continue it from, if `reschedule`
+        was called and the last run can be continued for ``blocks``.
+        """
+        record = self._resume
+        # random choices can't be replayed from the middle of a run
+        randomized = self.tie_tolerance is not None or self.calibrator_choices > 1
+        if (record is None or randomized or record.settings != self._run_settings() or
+                not np.array_equal(record.filled_times, filled_times)):
+            return None
+        k = self._first_affected(record, blocks, filled_times, pre_filled)
+        return None if k is None else (record, k)
 
+    def _first_affected(self, record, blocks, filled_times, pre_filled):
+        """
+        Index of the first step of the ``record``ed run whose decisions can be
+        different with ``blocks``, or None if the run can't be continued.
+        """
+        new = OrderedDict((b.target.name, b) for b in blocks)
+        if len(new) != len(blocks) or len(record.blocks) != len(record.order):
+            return None
+        changed = set(name for name in record.order
+                      if name not in new or record.keys[name] != _block_key(new[name]))
+        changed.update(name for name in new if name not in record.blocks)
+        # the fixed times are put in before the loop, and the others keep their order
+        if changed & set(self.timeDict or ()):
+            return None
+        if ([name for name in record.order if name not in changed] !=
+                [name for name in new if name not in changed]):
+            return None
+        fixed = set(block.target.name for block in record.fixed)
+        old = [name for name in record.order if name not in fixed]
+        now = [name for name in new if name not in fixed]
+        for k, step in enumerate(record.steps):
+            if step['final'] or self._step_affected(step, old, now, changed, record.blocks, new,
+                                                    filled_times, pre_filled):
+                return k
+            removed = set(name for name, score in step['removed'])
+            old = [name for name in old if name not in removed]
+            now = [name for name in now if name not in removed]
+        return None
 
-    def _make_schedule(self, blocks):
-        self.firstSchedule = True
-        if not self.calibrators: #Ja nav jaievieto calibrators
-            pre_filled = np.array([[block.start_time, block.end_time] for
-                                   block in self.schedule.scheduled_blocks])
-            if len(pre_filled) == 0:
-                a = self.schedule.start_time
-                filled_times = Time([a - 1 * u.hour, a - 1 * u.hour,
-                                     a - 1 * u.minute, a - 1 * u.minute])
-                pre_filled = filled_times.reshape((2, 2))
-            else:
-                filled_times = Time(pre_filled.flatten())
-                pre_filled = filled_times.reshape((int(len(filled_times) / 2), 2))
-            for b in blocks:
-                if b.constraints is None:
-                    b._all_constraints = self.constraints
-                else:
-                    b._all_constraints = self.constraints + b.constraints
-                # to make sure the scheduler has some constraint to work off of
-                # and to prevent scheduling of targets below the horizon
-                # TODO : change default constraints to [] and switch to append
-                if b._all_constraints is None:
-                    b._all_constraints = [AltitudeConstraint(min=0 * u.deg)]
-                    b.constraints = [AltitudeConstraint(min=0 * u.deg)]
-                elif not any(isinstance(c, AltitudeConstraint) for c in b._all_constraints):
-                    b._all_constraints.append(AltitudeConstraint(min=0 * u.deg))
-                    if b.constraints is None:
-                        b.constraints = [AltitudeConstraint(min=0 * u.deg)]
-                    else:
-                        b.constraints.append(AltitudeConstraint(min=0 * u.deg))
-                b._duration_offsets = u.Quantity([0 * u.second, b.duration / 2,
-                                                  b.duration])
-                b.observer = self.observer
-            current_time = self.schedule.start_time
-
-            preFilled = []
-            if self.timeDict is not None: #Ja ir doti specifiski laiki, tad tos ievieto pirmos
-
-                for key, value in self.timeDict.items():
-                    print(key, value)
-                    string = value
-                    hour, min = string.split(":")
-                    obsTime = current_time.to_datetime()
-                    obsTime = obsTime.replace(hour = int(hour), minute=int(min))
-                    obsTime = Time(obsTime)
-                    for block in blocks:
-                        if block.target.name == key:
-                            newb = block
-                            break
-
-                    newb.start_time = obsTime
-
-                    newb.end_time = obsTime + newb.duration
-                    if self.fits_constraints(newb, newb.start_time):
-                        preFilledOK = True
-                        for preFilledStart, preFilledEnd in preFilled:
-                            if newb.start_time < preFilledStart and newb.start_time + newb.duration > preFilledStart:
-                                preFilledOK = False
-                            if newb.start_time > preFilledStart and newb.start_time < preFilledEnd:
-                                preFilledOK = False
-                        if preFilledOK:
-                            print("before insert")
-                            print(newb.start_time)
-                            self.schedule.insert_slot(newb.start_time, newb)
-                            print(newb.target.name, " observed")
-                            preFilled.append([newb.start_time, newb.end_time])
-                            print(newb)
-                            print(newb.start_time)
-                            print(newb.end_time)
-                            blocks.remove(newb)
-                        else:
-                            print(key," specified time overlaps with other times")
-                    else:
-                        print(key, " specified time doesn't meet constraints")
-
-
-
-            while (len(blocks) > 0) and (current_time < self.schedule.end_time): #Veic planosanu lidz ir ieplanoti visi noverojumi vai beidzies laiks
-                print(current_time," ", self.schedule.end_time)
-                # first compute the value of all the constraints for each block
-                # given the current starting time
-                block_transitions = []
-                block_constraint_results = []
-                for b in blocks:
-                    # first figure out the transition
-                    if len(self.schedule.observing_blocks) > 0:
-                        trans = self.transitioner(
-                            self.schedule.observing_blocks[-1], b, current_time, self.observer)
-                    else:
-                        trans = None
-                    block_transitions.append(trans)
-                    transition_time = 0 * u.second if trans is None else trans.duration
+    def _step_affected(self, step, old, now, changed, old_blocks, new_blocks, filled_times, pre_filled):
+        """
+        Whether a recorded ``step`` can go differently if the ``changed``
+        blocks are as in ``new_blocks``. ``old`` and ``now`` are the names of
+        the blocks remaining at the step, in the order of the recorded run and
+        of the new one.
+
+        A step only reads the scores of all remaining blocks, the candidates
+        it tried, the blocks it took out and the last remaining block, so it
+        goes the same if none of those are edited, keep their index, and no
+        edited block scores high enough to be tried.
+        """
+        present_old = [name for name in old if name in changed]
+        present_new = [name for name in now if name in changed]
+        if not present_old and not present_new:
+            return False
+        if step['fill']: #Isakais noverojums tiek meklets starp visiem
+            return True
+        tried = step['tried']
+        looked = [name for name, score in step['removed'] + tried]
+        if any(name in changed for name in looked):
+            return True
+        # candidates and the blocks taken out are picked by their index
+        if any(old.index(name) != now.index(name) for name in looked):
+            return True
+        # calibrator transitions start from the last remaining block
+        if self.calibrators and (old[-1:] != now[-1:] or old[-1] in changed):
+            return True
+        if not tried:
+            # a gap: nothing was tried, an edited block would be if it's observable
+            return any(self._block_score(new_blocks[name], step, filled_times, pre_filled) > 0
+                       for name in present_new)
+        if len(tried) >= len(old):
+            # every remaining block was tried, an added one would be too
+            return True
+        # candidates are tried best first, ties in list order
+        worst = max((-score, old.index(name)) for name, score in tried)
+        for names, order, blocks in ((present_old, old, old_blocks), (present_new, now, new_blocks)):
+            for name in names:
+                score = self._block_score(blocks[name], step, filled_times, pre_filled)
+                if (-score, order.index(name)) < worst:
+                    return True
+        return False
+
+    def _block_score(self, block, step, filled_times, pre_filled):
+        """Score of ``block`` at a recorded ``step``, as `score_blocks` gave it."""
+        return self._score_blocks([block], step['t'], step['last'], filled_times, pre_filled)[0]
+
+    def _restore(self, resume, blocks):
+        """
+        Put the slots the recorded run had at the step to continue from into
+        the schedule, and return the state of the loop at that step.
 
-                    times = current_time + transition_time + b._duration_offsets
+        Returns
+        -------
+        current_time, blocks, timeStart, lastBlock, preFilled
+            ``blocks`` are those of ``blocks`` still to be scheduled.
+        """
+        record, k = resume
+        step = record.steps[k]
+        # the blocks of the recorded schedule stay as they are
+        copies = dict((id(block), copy.copy(block)) for block in step['slots'].blocks)
+        self.schedule._index = step['slots'].copy(copies)
+
+        taken = set(block.target.name for block in record.fixed)
+        for previous in record.steps[:k]:
+            taken.update(name for name, score in previous['removed'])
+        remaining = [block for block in blocks if block.target.name not in taken]
+        if step['stopped']:
+            remaining = []
+        if step['firstSchedule'] is not None:
+            self.firstSchedule = step['firstSchedule']
+        lastBlock = copies.get(id(step['lastBlock']), step['lastBlock'])
+
+        if self.incremental:
+            self._record.fixed = [copies[id(block)] for block in record.fixed]
+            self._record.preFilled = list(record.preFilled)
+            self._record.stopped = step['stopped']
+            self._record.steps = [dict(previous, last=copies.get(id(previous['last']), previous['last']),
+                                       lastBlock=copies.get(id(previous['lastBlock']), previous['lastBlock']),
+                                       slots=previous['slots'].copy(copies))
+                                  for previous in record.steps[:k]]
+        if self.trace.enabled:
+            self.trace.record('resume', t=step['t'], step=k, steps=len(record.steps),
+                              kept=len(self.schedule.scheduled_blocks))
+        return step['t'], remaining, step['timeStart'], lastBlock, list(record.preFilled)
 
-                    # make sure it isn't in a pre-filled slot
-                    if (any((current_time < filled_times) & (filled_times < times[2])) or
-                            any(abs(pre_filled.T[0] - current_time) < 1 * u.second)):
-                        block_constraint_results.append(0)
+    def _make_schedule(self, blocks):
+        self.firstSchedule = True
+        self._random = np.random.RandomState(self.seed)
+        self.prepare_ephemeris(blocks)
+        self.prepare_calibrator_index(blocks)
+        # the loops below keep time as float seconds since the start of the
+        # window, Time objects are only made for blocks put into the schedule
+        self._window_start = self.schedule.start_time
+        self._window_start_jd = self._window_start.jd
+        self._window_end = self._seconds(self.schedule.end_time)
+        end_time = self._window_end
+        gap_time = self.gap_time.to_value(u.second)
+        if not self.calibrators: #Ja nav jaievieto calibrators
+            filled_times, pre_filled = self._filled_times()
+            self._prepare_blocks(blocks)
+            current_time = 0.
 
-                    else:
-                        constraint_res = []
-                        for constraint in b._all_constraints:
-                            constraint_res.append(constraint(
-                                self.observer, b.target, times))
-                        # take the product over all the constraints *and* times
-                        block_constraint_results.append(np.prod(constraint_res))
+            preFilled = []
+            resume = self._resume_point(blocks, filled_times, pre_filled)
+            if self.incremental:
+                self._record = _RunRecord(self, blocks, filled_times)
+            if self.stats.enabled:
+                prefill_start = default_timer()
+            if self.timeDict is not None and resume is None: #Ja ir doti specifiski laiki, tad tos ievieto pirmos
+                self._insert_fixed_blocks(blocks, preFilled)
+            if self.stats.enabled and self.timeDict is not None:
+                self.stats.add('prefill', default_timer() - prefill_start)
+            if resume is not None: #Turpina ieprieksejo planosanu no pirma soli, ko izmainas ietekme
+                current_time, blocks, timeStart, lastBlock, preFilled = self._restore(resume, blocks)
+            elif self.incremental:
+                self._record.prefilled(preFilled, blocks)
+            while (len(blocks) > 0) and (current_time < end_time): #Veic planosanu lidz ir ieplanoti visi noverojumi vai beidzies laiks
+                if self.stats.enabled:
+                    step_start = default_timer()
+                if self.trace.enabled:
+                    self.trace.record('step', t=current_time, blocks=len(blocks))
+                if self.incremental:
+                    step = self._record.step(current_time, blocks)
+                # first compute the value of all the constraints for each block
+                # given the current starting time
+                block_constraint_results = self.score_blocks(blocks, current_time,
+                                                             filled_times, pre_filled)
+                if self.incremental:
+                    self._record.scored(block_constraint_results)
+                trans = None
 
                 # now identify the block that's the best
-                bestblock_idx = np.argmax(block_constraint_results)
+                bestblock_idx = self._best_block(block_constraint_results)
 
                 if block_constraint_results[bestblock_idx] == 0.:
                     # if even the best is unobservable, we need a gap
-                    current_time += self.gap_time
+                    current_time += gap_time
+                    if self.stats.enabled:
+                        self.stats.add('gaps', default_timer() - step_start)
                 else:
                     newb = blocks[bestblock_idx]
-                    print(newb)
+                    if self.trace.enabled:
+                        self.trace.record('candidate', target=newb.target.name, t=current_time,
+                                          score=block_constraint_results[bestblock_idx])
                     blocksTemp = blocks.copy()
                     bestblock_indexes = block_constraint_results.copy()
 
 
-                    if (current_time + newb.duration < self.schedule.end_time): #Ja vel ir atlicis laiks prieks noverojuma tad veic parbaudes un to ievieto
+                    if (current_time + newb.duration.to_value(u.second) < end_time): #Ja vel ir atlicis laiks prieks noverojuma tad veic parbaudes un to ievieto
                         while(True):
+                            if self.incremental:
+                                step['tried'].append((newb.target.name, bestblock_indexes[bestblock_idx]))
                             preFilledOK = True
                             for preFilledStart, preFilledEnd, key in preFilled:
-                                if current_time < preFilledStart and current_time + newb.duration > preFilledStart:
+                                if current_time < preFilledStart and current_time + newb.duration.to_value(u.second) > preFilledStart:
                                     preFilledOK = False
                                 if current_time > preFilledStart and current_time < preFilledEnd:
                                     preFilledOK = False
                             if preFilledOK:
-                                if len(self.schedule.observing_blocks)>0:
-                                    trans = self.transitioner(self.schedule.observing_blocks[-1], newb,
-                                                              current_time,
+                                if self.schedule.last_observing_block is not None:
+                                    trans = self.transitioner(self.schedule.last_observing_block, newb,
+                                                              self._time(current_time),
                                                               self.observer)
                                 if trans is not None:
-                                    current_time += trans.duration
+                                    current_time += trans.duration.to_value(u.second)
                                     self.schedule.insert_slot(trans.start_time, trans)
                                 if self.fits_constraints(newb, current_time):
                                     blocks.pop(bestblock_idx)
-                                    newb.start_time = current_time
-                                    current_time += newb.duration
-                                    newb.end_time = current_time
+                                    newb.start_time = self._time(current_time)
+                                    current_time += newb.duration.to_value(u.second)
+                                    newb.end_time = self._time(current_time)
                                     newb.constraints_value = block_constraint_results[bestblock_idx]
-                                    print(newb.target.name, " observed")
+                                    if self.trace.enabled:
+                                        self.trace.record('scheduled', target=newb.target.name,
+                                                          start=self._seconds(newb.start_time), end=current_time,
+                                                          score=newb.constraints_value)
                                     self.schedule.insert_slot(newb.start_time, newb)
                                     if newb in blocks:
                                         blocks.remove(newb)
                                     break
                                 else:
-                                    print(newb.target.name, " fits but doesn't meet constraints")
+                                    if self.trace.enabled:
+                                        self.trace.record('rejected', target=newb.target.name, t=current_time, reason='constraints')
                                     blocksTemp.pop(bestblock_idx)
                                     bestblock_indexes.pop(bestblock_idx)
 
                                     if len(blocksTemp) > 0:
                                         bestblock_idx = np.argmax(bestblock_indexes)
                                         newb = blocksTemp[bestblock_idx]
-                                        print(current_time, newb.target.name)
+                                        if self.trace.enabled:
+                                            self.trace.record('candidate', target=newb.target.name, t=current_time,
+                                                              score=bestblock_indexes[bestblock_idx])
                                     else:
-                                        current_time += self.gap_time
+                                        current_time += gap_time
                                         break
                             else:
                                 blocksTemp.pop(bestblock_idx)
@@ -894,27 +2008,32 @@ class SequentialScheduler(Scheduler):
                                 if len(blocksTemp) > 0:
                                     bestblock_idx = np.argmax(bestblock_indexes)
                                     newb = blocksTemp[bestblock_idx]
-                                    print(current_time, newb.target.name)
+                                    if self.trace.enabled:
+                                        self.trace.record('candidate', target=newb.target.name, t=current_time,
+                                                          score=bestblock_indexes[bestblock_idx])
                                 else:
-                                    current_time += self.gap_time
+                                    current_time += gap_time
                                     break
 
                     else: #Ja prieks noverojuma nepietiek laiks, tad atlikuso laiku aizpilda ar mazakiem noverojumiem
-                        print(current_time, self.schedule.end_time)
+                        if self.trace.enabled:
+                            self.trace.record('fill', t=current_time, reason='too long', target=newb.target.name)
+                        if self.incremental:
+                            step['fill'] = True
                         if preFilled:
                             npPreFilled = np.array(preFilled)
-                            if self.schedule.end_time not in npPreFilled[:,1]:
+                            if end_time not in npPreFilled[:,1]:
                                 index, shortest_time = self.get_shortest_observation(current_time, blocks)
                                 if index is not None and shortest_time is not None:
-                                    if len(self.schedule.observing_blocks) > 0:
-                                        trans = self.transitioner(self.schedule.observing_blocks[-1], blocks[index], current_time,
+                                    if self.schedule.last_observing_block is not None:
+                                        trans = self.transitioner(self.schedule.last_observing_block, blocks[index], self._time(current_time),
                                                                   self.observer)
                                     else:
                                         trans = None
                                     newb = blocks[index]
                                     preFilledOK = True;
                                     for preFilledStart, preFilledEnd, key in preFilled:
-                                        if current_time < preFilledStart and current_time + newb.duration > preFilledStart:
+                                        if current_time < preFilledStart and current_time + newb.duration.to_value(u.second) > preFilledStart:
                                             preFilledOK = False
                                         if current_time > preFilledStart and current_time < preFilledEnd:
                                             preFilledOK = False
@@ -922,25 +2041,30 @@ class SequentialScheduler(Scheduler):
                                         blocks.pop(index)
                                         if trans is not None:
                                             self.schedule.insert_slot(trans.start_time, trans)
-                                            current_time += trans.duration
-                                        newb.start_time = current_time
-                                        current_time += newb.duration
-                                        newb.end_time = current_time
+                                            current_time += trans.duration.to_value(u.second)
+                                        newb.start_time = self._time(current_time)
+                                        current_time += newb.duration.to_value(u.second)
+                                        newb.end_time = self._time(current_time)
                                         newb.constraints_value = block_constraint_results[bestblock_idx]
                                         self.schedule.insert_slot(newb.start_time, newb)
+                                        if self.trace.enabled:
+                                            self.trace.record('scheduled', target=newb.target.name,
+                                                              start=self._seconds(newb.start_time), end=current_time,
+                                                              score=newb.constraints_value, shortest=True)
                                     else:
-                                        current_time += self.gap_time
+                                        current_time += gap_time
                                 else:
                                     break
                             else:
-                                print("Schedule ends with prefilled block, breaking")
+                                if self.trace.enabled:
+                                    self.trace.record('stop', t=current_time, reason='fixed block at the end')
                                 break
                         else:
                             index, shortest_time = self.get_shortest_observation(current_time, blocks)
                             if index is not None and shortest_time is not None:
-                                if len(self.schedule.observing_blocks) > 0:
-                                    trans = self.transitioner(self.schedule.observing_blocks[-1], blocks[index],
-                                                              current_time,
+                                if self.schedule.last_observing_block is not None:
+                                    trans = self.transitioner(self.schedule.last_observing_block, blocks[index],
+                                                              self._time(current_time),
                                                               self.observer)
                                 else:
                                     trans = None
@@ -948,60 +2072,42 @@ class SequentialScheduler(Scheduler):
                                 blocks.pop(index)
                                 if trans is not None:
                                     self.schedule.insert_slot(trans.start_time, trans)
-                                    current_time += trans.duration
-                                newb.start_time = current_time
-                                current_time += newb.duration
-                                newb.end_time = current_time
+                                    current_time += trans.duration.to_value(u.second)
+                                newb.start_time = self._time(current_time)
+                                current_time += newb.duration.to_value(u.second)
+                                newb.end_time = self._time(current_time)
                                 newb.constraints_value = block_constraint_results[bestblock_idx]
                                 self.schedule.insert_slot(newb.start_time, newb)
+                                if self.trace.enabled:
+                                    self.trace.record('scheduled', target=newb.target.name,
+                                                      start=self._seconds(newb.start_time), end=current_time,
+                                                      score=newb.constraints_value, shortest=True)
                             else:
                                 break
+            if self.incremental:
+                self._record.finish(current_time, blocks, end_time)
 
 
 
 
         else: #Noverojumu planosana ar kalibresanu ieslegtu
-            timeStart = self.schedule.start_time
-            pre_filled = np.array([[block.start_time, block.end_time] for
-                                   block in self.schedule.scheduled_blocks])
-            if len(pre_filled) == 0:
-                a = self.schedule.start_time
-                filled_times = Time([a - 1 * u.hour, a - 1 * u.hour,
-                                     a - 1 * u.minute, a - 1 * u.minute])
-                pre_filled = filled_times.reshape((2, 2))
-            else:
-                filled_times = Time(pre_filled.flatten())
-                pre_filled = filled_times.reshape((int(len(filled_times) / 2), 2))
-            for b in blocks:
-                if b.constraints is None:
-                    b._all_constraints = self.constraints
-                else:
-                    b._all_constraints = self.constraints + b.constraints
-                # to make sure the scheduler has some constraint to work off of
-                # and to prevent scheduling of targets below the horizon
-                # TODO : change default constraints to [] and switch to append
-                if b._all_constraints is None:
-                    b._all_constraints = [AltitudeConstraint(min=0 * u.deg)]
-                    b.constraints = [AltitudeConstraint(min=0 * u.deg)]
-                elif not any(isinstance(c, AltitudeConstraint) for c in b._all_constraints):
-                    b._all_constraints.append(AltitudeConstraint(min=0 * u.deg))
-                    if b.constraints is None:
-                        b.constraints = [AltitudeConstraint(min=0 * u.deg)]
-                    else:
-                        b.constraints.append(AltitudeConstraint(min=0 * u.deg))
-                b._duration_offsets = u.Quantity([0 * u.second, b.duration / 2,
-                                                  b.duration])
-                b.observer = self.observer
-            current_time = self.schedule.start_time
+            timeStart = 0.
+            lastBlock = None
+            filled_times, pre_filled = self._filled_times()
+            self._prepare_blocks(blocks)
+            current_time = 0.
 
             preFilled = []
-            if self.timeDict is not None: #Vispirms ieplano specifiskos laikus
-                print(self.timeDict)
+            resume = self._resume_point(blocks, filled_times, pre_filled)
+            if self.incremental:
+                self._record = _RunRecord(self, blocks, filled_times)
+            if self.stats.enabled:
+                prefill_start = default_timer()
+            if self.timeDict is not None and resume is None: #Vispirms ieplano specifiskos laikus
                 for key, value in self.timeDict.items():
-                    print(key, value)
                     string = value
                     hour, min = string.split(":")
-                    obsTime = current_time.to_datetime()
+                    obsTime = self.schedule.start_time.to_datetime()
                     obsTime = obsTime.replace(hour = int(hour)-1, minute=int(min))
                     obsTime = Time(obsTime)
                     newb = None
@@ -1023,97 +2129,90 @@ class SequentialScheduler(Scheduler):
 
 
                         newb.end_time = obsTime + newb.duration
-                        if self.fits_constraints(newb, newb.start_time):
+                        obsStart = self._seconds(obsTime)
+                        if self.fits_constraints(newb, obsStart):
                             preFilledOK = True
                             for preFilledStart, preFilledEnd in preFilled:
-                                if newb.start_time < preFilledStart and newb.start_time + newb.duration > preFilledStart:
+                                if obsStart < preFilledStart and obsStart + newb.duration.to_value(u.second) > preFilledStart:
                                     preFilledOK = False
-                                if newb.start_time > preFilledStart and newb.start_time < preFilledEnd:
+                                if obsStart > preFilledStart and obsStart < preFilledEnd:
                                     preFilledOK = False
                             if preFilledOK:
-                                print("before insert")
-                                print(newb.start_time)
-                                print(self.schedule.start_time)
-                                print(self.schedule.end_time)
                                 self.schedule.insert_slot(newb.start_time, newb)
-                                print(newb.target.name, " observed")
-                                preFilled.append([newb.start_time, newb.end_time])
-                                print(newb)
-                                print(newb.start_time)
-                                print(newb.end_time)
+                                if self.trace.enabled:
+                                    self.trace.record('fixed', target=key, time=value, start=obsStart)
+                                preFilled.append([obsStart, obsStart + newb.duration.to_value(u.second)])
                                 blocks.remove(newb)
                             else:
-                                print(key," specified time overlaps with other times")
+                                if self.trace.enabled:
+                                    self.trace.record('fixed_rejected', target=key, time=value, reason='overlap')
                         else:
-                            print(key, " specified time doesn't meet constraints")
-
-            while (len(blocks) > 0) and (current_time < self.schedule.end_time):
-                print(current_time," ", self.schedule.end_time)
+                            if self.trace.enabled:
+                                self.trace.record('fixed_rejected', target=key, time=value, reason='constraints')
+
+            if self.stats.enabled and self.timeDict is not None:
+                self.stats.add('prefill', default_timer() - prefill_start)
+            if resume is not None: #Turpina ieprieksejo planosanu no pirma soli, ko izmainas ietekme
+                current_time, blocks, timeStart, lastBlock, preFilled = self._restore(resume, blocks)
+            elif self.incremental:
+                self._record.prefilled(preFilled, blocks)
+            while (len(blocks) > 0) and (current_time < end_time):
+                if self.stats.enabled:
+                    step_start = default_timer()
+                if self.trace.enabled:
+                    self.trace.record('step', t=current_time, blocks=len(blocks))
+                if self.incremental:
+                    step = self._record.step(current_time, blocks, timeStart, lastBlock, self.firstSchedule)
                 # first compute the value of all the constraints for each block
                 # given the current starting time
-                block_constraint_results = []
-                for b in blocks:
-                    # first figure out the transition
-                    if len(self.schedule.observing_blocks) > 0:
-                        trans = self.transitioner(
-                            self.schedule.observing_blocks[-1], b, current_time, self.observer)
-                    else:
-                        trans = None
-                    transition_time = 0 * u.second if trans is None else trans.duration
-
-                    times = current_time + transition_time + b._duration_offsets
-
-                    # make sure it isn't in a pre-filled slot
-                    if (any((current_time < filled_times) & (filled_times < times[2])) or
-                            any(abs(pre_filled.T[0] - current_time) < 1 * u.second)):
-                        block_constraint_results.append(0)
-
-                    else:
-                        constraint_res = []
-                        for constraint in b._all_constraints:
-                            constraint_res.append(constraint(self.observer, b.target, times))
-                        # take the product over all the constraints *and* times
-                        block_constraint_results.append(np.prod(constraint_res))
+                block_constraint_results = self.score_blocks(blocks, current_time,
+                                                             filled_times, pre_filled)
+                if self.incremental:
+                    self._record.scored(block_constraint_results)
+                b = blocks[-1] # the calibrator transitions below start from the last block
 
                 # now identify the block that's the best
-                bestblock_idx = np.argmax(block_constraint_results)
+                bestblock_idx = self._best_block(block_constraint_results)
                 if block_constraint_results[bestblock_idx] == 0.:
                     # if even the best is unobservable, we need a gap
-                    current_time += self.gap_time
+                    current_time += gap_time
+                    if self.stats.enabled:
+                        self.stats.add('gaps', default_timer() - step_start)
                 else:
                     if(self.firstSchedule):
-                        print("First schedule")
+                        if self.trace.enabled:
+                            self.trace.record('first_calibration', t=current_time)
                         #Noverojuma sakuma ieplano tuvako kalibratoru noverojumam ar vislielako prioritati
                         calibrator = self.get_closest_calibrator(blocks[bestblock_idx], current_time)
                         calibratorBlock = ObservingBlock(calibrator, self.calibLen * u.min, 1, calibration=True)
 
-                        calibratorBlock.start_time = current_time
-                        current_time += calibratorBlock.duration
-                        calibratorBlock.end_time = current_time
-                        timeStart = calibratorBlock.end_time
+                        calibratorBlock.start_time = self._time(current_time)
+                        current_time += calibratorBlock.duration.to_value(u.second)
+                        calibratorBlock.end_time = self._time(current_time)
+                        timeStart = current_time
 
                         self.schedule.insert_slot(calibratorBlock.start_time, calibratorBlock)
                         lastBlock = calibratorBlock
-                        trans = self.transitioner(blocks[bestblock_idx], b, current_time, self.observer)
-                        transition_time = 0 * u.second if trans is None else trans.duration
+                        trans = self.transitioner(blocks[bestblock_idx], b, self._time(current_time), self.observer)
+                        transition_time = 0 if trans is None else trans.duration.to_value(u.second)
 
-                        times = current_time + transition_time + b._duration_offsets
+                        times = current_time + transition_time + b._duration_offsets.to_value(u.second)
 
                         # make sure it isn't in a pre-filled slot
                         if (any((current_time < filled_times) & (filled_times < times[2])) or
-                                any(abs(pre_filled.T[0] - current_time) < 1 * u.second)):
+                                any(abs(pre_filled.T[0] - current_time) < 1)):
                             block_constraint_results.append(0)
                         else:
                             constraint_res = []
                             for constraint in b._all_constraints:
-                                constraint_res.append(constraint(
-                                    self.observer, b.target, times))
+                                constraint_res.append(self.evaluate_constraint(
+                                    constraint, b.target, self._jd(times)))
                             # take the product over all the constraints *and* times
                             block_constraint_results.append(np.prod(constraint_res))
 
                         if trans is not None:
                             self.schedule.insert_slot(trans.start_time, trans)
-                            current_time += trans.duration
+                            current_time += trans.duration.to_value(u.second)
 
                         self.firstSchedule = False
 
@@ -1123,47 +2222,54 @@ class SequentialScheduler(Scheduler):
                     bestblock_indexes = block_constraint_results.copy()
 
                     while(True):
-                        if ((current_time - timeStart).to_datetime().seconds / 60 > self.calibGap):  # Ja laiks parsniedz settingos noradito laiku
+                        if self.incremental:
+                            step['tried'].append((newb.target.name, bestblock_indexes[bestblock_idx]))
+                        if (int(current_time - timeStart) / 60 > self.calibGap):  # Ja laiks parsniedz settingos noradito laiku
                             calibrator = self.get_closest_calibrator(newb, current_time, last_block=lastBlock)  # tad ievieto calibrator
                             calibratorBlock = ObservingBlock(calibrator, self.calibLen * u.min, 1, constraints=self.constraints, calibration=True)
-                            trans = self.transitioner(calibratorBlock, b, current_time, self.observer)
-                            transition_time = 0 * u.second if trans is None else trans.duration
-                            if (current_time + calibratorBlock.duration + transition_time < self.schedule.end_time):
+                            trans = self.transitioner(calibratorBlock, b, self._time(current_time), self.observer)
+                            transition_time = 0 if trans is None else trans.duration.to_value(u.second)
+                            if (current_time + calibratorBlock.duration.to_value(u.second) + transition_time < end_time):
                                 preFilledOK = True;
                                 for preFilledStart, preFilledEnd in preFilled:
-                                    if current_time < preFilledStart and current_time + newb.duration > preFilledStart:
+                                    if current_time < preFilledStart and current_time + newb.duration.to_value(u.second) > preFilledStart:
                                         preFilledOK = False
                                     if current_time > preFilledStart and current_time < preFilledEnd:
                                         preFilledOK = False
                                 if preFilledOK:
                                     if trans is not None:
                                         self.schedule.insert_slot(trans.start_time, trans)
-                                    current_time += trans.duration
-                                    calibratorBlock.start_time = current_time
-                                    current_time += calibratorBlock.duration
-                                    calibratorBlock.end_time = current_time
+                                    current_time += trans.duration.to_value(u.second)
+                                    calibratorBlock.start_time = self._time(current_time)
+                                    current_time += calibratorBlock.duration.to_value(u.second)
+                                    calibratorBlock.end_time = self._time(current_time)
                                     self.schedule.insert_slot(calibratorBlock.start_time, calibratorBlock)
                                     lastBlock = calibratorBlock
-                                    timeStart = calibratorBlock.end_time
+                                    timeStart = current_time
                                 else:
-                                    print("Can't calibrate because fixed times interfere")
-                                    current_time += self.gap_time
+                                    if self.trace.enabled:
+                                        self.trace.record('calibration_skipped', t=current_time, reason='fixed times')
+                                    current_time += gap_time
                             else:
-                                current_time = self.schedule.end_time
+                                current_time = end_time
 
                         # If there's a best one that's observable, first get its transition
 
 
-                        trans = self.transitioner(lastBlock, newb, current_time, self.observer)
-                        totalTime = current_time + newb.duration
+                        trans = self.transitioner(lastBlock, newb, self._time(current_time), self.observer)
+                        totalTime = current_time + newb.duration.to_value(u.second)
                         if trans is not None:
-                            totalTime += trans.duration
+                            totalTime += trans.duration.to_value(u.second)
                         # now assign the block itself times and add it to the schedule
-                        if (totalTime < self.schedule.end_time):
+                        if (totalTime < end_time):
 
                             splits = []
                             if (newb.duration > self.calibGap * u.min): #Ja noverojums garaks par settings noradito laiku, to sagriez lai ievietotu cailbrator
-                                print(newb.target.name," too long, will be split")
+                                if self.stats.enabled:
+                                    split_start = default_timer()
+                                if self.trace.enabled:
+                                    self.trace.record('split_start', target=newb.target.name, t=current_time,
+                                                      duration=newb.duration.to_value(u.second))
 
                                 splitLeft = newb.duration
                                 target = FixedTarget(newb.target.coord, newb.target.name)
@@ -1173,87 +2279,79 @@ class SequentialScheduler(Scheduler):
                                 lastBlockSave = lastBlock
                                 current_timeSave = current_time
 
-                                splitDur = 0 * u.min
+                                splitDur = 0.
+                                splitLength = self._split_length(newb.duration)
                                 target = FixedTarget(newb.target.coord, newb.target.name)
                                 target.name = target.name + " split"
                                 while(splitLeft > 0 * u.s):
-                                    print("")
-
-                                    print("NEW SPLIT")
-                                    print(current_time)
-                                    print(splitLeft)
-                                    if (splitLeft >= self.calibGap * u.min):
-                                        splitBlock = ObservingBlock(target, self.calibGap * u.min, newb.priority)
+                                    if (splitLeft >= splitLength):
+                                        splitBlock = ObservingBlock(target, splitLength, newb.priority)
 
                                     else:
                                         splitBlock = ObservingBlock(newb.target, splitLeft, newb.priority)
 
                                         lastSplit = True
 
-                                    trans = self.transitioner(lastBlock, splitBlock, current_time, self.observer)
+                                    trans = self.transitioner(lastBlock, splitBlock, self._time(current_time), self.observer)
 
                                     if trans is not None:
-                                        trans_time = trans.duration
-                                        trans.start_time = current_time
+                                        trans_time = trans.duration.to_value(u.second)
+                                        trans.start_time = self._time(current_time)
                                     else:
-                                        trans_time = 0 * u.second
+                                        trans_time = 0.
 
                                     #trans.end_time = current_time + trans.duration
                                     splitDur += trans_time
                                     current_time += trans_time
                                     splits.append(trans)
-                                    times = current_time + trans_time + self.calibLen * u.min + u.Quantity(
-                                        [0 * u.min, (newb.duration + self.calibLen * u.min) / 2, newb.duration + self.calibLen * u.min])
+                                    span = (newb.duration + self.calibLen * u.min).to_value(u.second)
+                                    times = self._jd(current_time + trans_time + self.calibLen * 60. +
+                                                     np.array([0, span / 2, span]))
 
                                     constraintTrue = True
                                     for constraint in self.constraints:
-                                        splitConstraint = constraint(self.observer, newb.target, times)
+                                        splitConstraint = self.evaluate_constraint(constraint, newb.target, times)
                                         if False in splitConstraint:
                                             constraintTrue = False
-                                            print("Can't split ", newb.target.name,
-                                                  " doesn't meet constraints")
+                                            if self.trace.enabled:
+                                                self.trace.record('rejected', target=newb.target.name, t=current_time,
+                                                                  reason='split constraints', constraint=type(constraint).__name__)
 
                                     if constraintTrue:
                                         if not lastSplit:
-                                            print(splitLeft)
-
-                                            splitBlock.start_time = current_time
-                                            splitBlock.end_time = current_time + splitBlock.duration
+                                            splitBlock.start_time = self._time(current_time)
+                                            splitBlock.end_time = self._time(current_time + splitBlock.duration.to_value(u.second))
                                             splits.append(splitBlock)
-                                            splitDur += splitBlock.duration
-                                            current_time += splitBlock.duration
+                                            splitDur += splitBlock.duration.to_value(u.second)
+                                            current_time += splitBlock.duration.to_value(u.second)
                                             splitLeft = splitLeft - splitBlock.duration
-                                            print(splitLeft)
 
                                             calibrator = self.get_closest_calibrator(splitBlock, current_time, last_block = lastBlock)
                                             calibratorBlock = ObservingBlock(calibrator, self.calibLen * u.min, 1, calibration=True)
                                             lastBlock = splitBlock
-                                            trans = self.transitioner(lastBlock, calibratorBlock, current_time, self.observer)
+                                            trans = self.transitioner(lastBlock, calibratorBlock, self._time(current_time), self.observer)
                                             if trans is not None:
-                                                trans_time = trans.duration
+                                                trans_time = trans.duration.to_value(u.second)
                                             else:
-                                                trans_time = 0 * u.second
-                                            trans.start_time = current_time
+                                                trans_time = 0.
+                                            trans.start_time = self._time(current_time)
                                             splits.append(trans)
                                             splitDur += trans_time
                                             current_time += trans_time
-                                            print(splitLeft)
 
-                                            calibratorBlock.start_time = current_time
-                                            calibratorBlock.end_time = current_time + calibratorBlock.duration
+                                            calibratorBlock.start_time = self._time(current_time)
+                                            calibratorBlock.end_time = self._time(current_time + calibratorBlock.duration.to_value(u.second))
                                             splits.append(calibratorBlock)
-                                            splitDur += calibratorBlock.duration
-                                            current_time += calibratorBlock.duration
+                                            splitDur += calibratorBlock.duration.to_value(u.second)
+                                            current_time += calibratorBlock.duration.to_value(u.second)
                                             #timeStart = calibratorBlock.end_time #only change this when insterting
                                             lastBlock = calibratorBlock
-                                            print("")
-                                            print(splitLeft)
                                         else:
-                                            splitBlock.start_time = current_time
-                                            splitBlock.end_time = current_time + splitBlock.duration
+                                            splitBlock.start_time = self._time(current_time)
+                                            splitBlock.end_time = self._time(current_time + splitBlock.duration.to_value(u.second))
                                             splits.append(splitBlock)
-                                            splitDur += splitBlock.duration
-                                            current_time += splitBlock.duration
+                                            splitDur += splitBlock.duration.to_value(u.second)
+                                            current_time += splitBlock.duration.to_value(u.second)
                                             splitLeft = splitLeft - splitBlock.duration
                                             lastBlock = splitBlock
                                             break
@@ -1262,9 +2360,11 @@ class SequentialScheduler(Scheduler):
                                         lastBlock = lastBlockSave
                                         current_time = current_timeSave
                                         break
-                                print("END OF SPLITTING")
-                                print(current_time)
-                                if (current_timeSave + splitDur < self.schedule.end_time):
+                                if self.trace.enabled:
+                                    self.trace.record('split_end', target=newb.target.name, t=current_time, splits=len(splits))
+                                if self.stats.enabled:
+                                    self.stats.add('splitting', default_timer() - split_start)
+                                if (current_timeSave + splitDur < end_time):
                                     if constraintTrue:
                                         preFilledOK = True;
                                         for preFilledStart, preFilledEnd in preFilled:
@@ -1273,14 +2373,14 @@ class SequentialScheduler(Scheduler):
                                             if current_timeSave > preFilledStart and current_timeSave < preFilledEnd:
                                                 preFilledOK = False
                                         if preFilledOK:
-                                            print("TRYING TO INSTERT SPLIT OBSERVATION")
+                                            if self.trace.enabled:
+                                                self.trace.record('scheduled', target=newb.target.name, start=current_timeSave,
+                                                                  end=current_timeSave + splitDur, splits=len(splits))
                                             blocks.pop(bestblock_idx)
                                             for split in splits:
                                                 if isinstance(split, ObservingBlock):
                                                     if split.calibration:
-                                                        timeStart = split.end_time
-                                                if split.end_time is not None:
-                                                    print(split)
+                                                        timeStart = self._seconds(split.end_time)
                                                 self.schedule.insert_slot(split.start_time, split)
                                             break
                                         else:
@@ -1291,9 +2391,11 @@ class SequentialScheduler(Scheduler):
                                             if len(blocksTemp) > 0:
                                                 bestblock_idx = np.argmax(bestblock_indexes)
                                                 newb = blocksTemp[bestblock_idx]
-                                                print(current_time, newb.target.name)
+                                                if self.trace.enabled:
+                                                    self.trace.record('candidate', target=newb.target.name, t=current_time,
+                                                                      score=bestblock_indexes[bestblock_idx])
                                             else:
-                                                current_time += self.gap_time
+                                                current_time += gap_time
                                                 break
                                     else:
                                         current_time = current_timeSave
@@ -1304,9 +2406,11 @@ class SequentialScheduler(Scheduler):
                                         if len(blocksTemp) > 0:
                                             bestblock_idx = np.argmax(bestblock_indexes)
                                             newb = blocksTemp[bestblock_idx]
-                                            print(current_time, newb.target.name)
+                                            if self.trace.enabled:
+                                                self.trace.record('candidate', target=newb.target.name, t=current_time,
+                                                                  score=bestblock_indexes[bestblock_idx])
                                         else:
-                                            current_time += self.gap_time
+                                            current_time += gap_time
                                             break
                                 else:
                                     current_time = current_timeSave
@@ -1317,49 +2421,56 @@ class SequentialScheduler(Scheduler):
                                     if len(blocksTemp) > 0:
                                         bestblock_idx = np.argmax(bestblock_indexes)
                                         newb = blocksTemp[bestblock_idx]
-                                        print(current_time, newb.target.name)
+                                        if self.trace.enabled:
+                                            self.trace.record('candidate', target=newb.target.name, t=current_time,
+                                                              score=bestblock_indexes[bestblock_idx])
                                     else:
-                                        current_time += self.gap_time
+                                        current_time += gap_time
                                         break
 
                             else: #Ja nav jaievieto calibrator ievieto noverojumu
                                     preFilledOK = True
-                                    print(preFilled)
                                     for preFilledStart, preFilledEnd in preFilled:
-                                        if current_time < preFilledStart and current_time + newb.duration > preFilledStart:
+                                        if current_time < preFilledStart and current_time + newb.duration.to_value(u.second) > preFilledStart:
                                             preFilledOK = False
                                         if current_time > preFilledStart and current_time < preFilledEnd:
                                             preFilledOK = False
                                     if preFilledOK:
-                                        trans = self.transitioner(self.schedule.observing_blocks[-1], newb,
-                                                                  current_time,
+                                        trans = self.transitioner(self.schedule.last_observing_block, newb,
+                                                                  self._time(current_time),
                                                                   self.observer)
                                         if self.fits_constraints(newb, current_time):
                                             if trans is not None:
-                                                current_time += trans.duration
+                                                current_time += trans.duration.to_value(u.second)
                                                 self.schedule.insert_slot(trans.start_time, trans)
                                             blocks.pop(bestblock_idx)
-                                            newb.start_time = current_time
-                                            current_time += newb.duration
-                                            newb.end_time = current_time
+                                            newb.start_time = self._time(current_time)
+                                            current_time += newb.duration.to_value(u.second)
+                                            newb.end_time = self._time(current_time)
                                             newb.constraints_value = block_constraint_results[bestblock_idx]
-                                            print(newb.target.name, " observed")
+                                            if self.trace.enabled:
+                                                self.trace.record('scheduled', target=newb.target.name,
+                                                                  start=self._seconds(newb.start_time), end=current_time,
+                                                                  score=newb.constraints_value)
                                             self.schedule.insert_slot(newb.start_time, newb)
                                             lastBlock = newb
                                             if newb in blocks:
                                                 blocks.remove(newb)
                                             break
                                         else:
-                                            print(newb.target.name, " fits but doesn't meet constraints")
+                                            if self.trace.enabled:
+                                                self.trace.record('rejected', target=newb.target.name, t=current_time, reason='constraints')
                                             blocksTemp.pop(bestblock_idx)
                                             bestblock_indexes.pop(bestblock_idx)
 
                                             if len(blocksTemp) > 0:
                                                 bestblock_idx = np.argmax(bestblock_indexes)
                                                 newb = blocksTemp[bestblock_idx]
-                                                print(current_time, newb.target.name)
+                                                if self.trace.enabled:
+                                                    self.trace.record('candidate', target=newb.target.name, t=current_time,
+                                                                      score=bestblock_indexes[bestblock_idx])
                                             else:
-                                                current_time += self.gap_time
+                                                current_time += gap_time
                                                 break
                                     else:
                                         blocksTemp.pop(bestblock_idx)
@@ -1368,16 +2479,20 @@ class SequentialScheduler(Scheduler):
                                         if len(blocksTemp) > 0:
                                             bestblock_idx = np.argmax(bestblock_indexes)
                                             newb = blocksTemp[bestblock_idx]
-                                            print(current_time, newb.target.name)
+                                            if self.trace.enabled:
+                                                self.trace.record('candidate', target=newb.target.name, t=current_time,
+                                                                  score=bestblock_indexes[bestblock_idx])
                                         else:
-                                            current_time += self.gap_time
+                                            current_time += gap_time
                                             break
                         else: #Ja nevar ievietot doto noverojumu, ievieto isakus
+                            if self.incremental:
+                                step['fill'] = True
                             index, shortest_time = self.get_shortest_observation(current_time, blocks)
                             if index is not None and shortest_time is not None:
-                                if len(self.schedule.observing_blocks) > 0:
-                                    trans = self.transitioner(self.schedule.observing_blocks[-1], blocks[index],
-                                                              current_time,
+                                if self.schedule.last_observing_block is not None:
+                                    trans = self.transitioner(self.schedule.last_observing_block, blocks[index],
+                                                              self._time(current_time),
                                                               self.observer)
                                 else:
                                     trans = None
@@ -1385,19 +2500,25 @@ class SequentialScheduler(Scheduler):
                                 blocks.pop(index)
                                 if trans is not None:
                                     self.schedule.insert_slot(trans.start_time, trans)
-                                    current_time += trans.duration
-                                newb.start_time = current_time
-                                current_time += newb.duration
-                                newb.end_time = current_time
+                                    current_time += trans.duration.to_value(u.second)
+                                newb.start_time = self._time(current_time)
+                                current_time += newb.duration.to_value(u.second)
+                                newb.end_time = self._time(current_time)
                                 newb.constraints_value = block_constraint_results[bestblock_idx]
                                 self.schedule.insert_slot(newb.start_time, newb)
+                                if self.trace.enabled:
+                                    self.trace.record('scheduled', target=newb.target.name,
+                                                      start=self._seconds(newb.start_time), end=current_time,
+                                                      score=newb.constraints_value, shortest=True)
                             else:
-                                print("Breaking here11")
-                                current_time += self.gap_time
+                                if self.trace.enabled:
+                                    self.trace.record('stop', t=current_time, reason='nothing fits')
+                                current_time += gap_time
                                 break
-            timeLeft = self.schedule.end_time - current_time
-            timeLeft = timeLeft.to_datetime()
-            print("Time left - ", timeLeft)
+            if self.incremental:
+                self._record.finish(current_time, blocks, end_time, timeStart, lastBlock, self.firstSchedule)
+            if self.trace.enabled:
+                self.trace.record('time_left', t=current_time, seconds=end_time - current_time)
             return self.schedule
 
 
@@ -1686,17 +2807,385 @@ class SequentialScheduler(Scheduler):
 
 
 
+class _BeamState(object):
+    """
+    A partial schedule of `BeamSearchScheduler`: the time (seconds since the
+    window start) and last block it has reached, the end of its last
+    calibration (`None` before the first), the indices of the blocks still
+    to schedule, and the (block, transition start, start, score, piece) of
+    everything placed so far.
+    """
+    __slots__ = ('time', 'last', 'remaining', 'placed', 'value', 'calibrated', 'expired')
+
+    def __init__(self, time, last, remaining, placed, value, calibrated=None):
+        self.time = time
+        self.last = last
+        self.remaining = remaining
+        self.placed = placed
+        # observed seconds weighted by their score
+        self.value = value
+        self.calibrated = calibrated
+        # seconds of the remaining blocks that can't be started any more
+        self.expired = 0.
+
+    @property
+    def lost(self):
+        """
+        Seconds of the window up to ``time`` not spent on well-scored
+        observations, calibrations included, and the seconds of the blocks
+        it has let set.
+        """
+        return self.time - self.value + self.expired
+
+    def key(self):
+        calibrated = None if self.calibrated is None else round(self.calibrated, 3)
+        return (self.remaining, self.last, round(self.time, 3), calibrated)
+
+
+class BeamSearchScheduler(SequentialScheduler):
+    """
+    A `SequentialScheduler` that looks ahead: instead of always taking the
+    best-scoring block, it keeps the ``beam_width`` best partial schedules,
+    and extends each with its ``branching`` best-scoring blocks at every step.
+
+    Partial schedules are ranked by the time they have lost so far to
+    transitions, gaps, calibrations and low scores, so a block that forces a
+    long slew or an early calibration can lose to one that scores a little
+    lower. A block that is left until it can't be observed any more counts
+    as lost too. If ``time_budget`` runs out, the best partial schedule is
+    finished with plain greedy steps.
+
+    With calibrators, a partial schedule is calibrated like the
+    `SequentialScheduler` loop does: with the calibrator nearest to its first
+    block, again before a block once ``maxtimewithoutcalibration`` minutes
+    have passed since the last calibration, and between the pieces of blocks
+    longer than that. The end of the last calibration is part of the state,
+    so schedules that only differ in it aren't merged.
+
+    The search pays off when not every block fits in the window, or when
+    calibrations can be saved; if every block fits either way, it only
+    shortens the slews.
+    """
+
+    _profiled_methods = SequentialScheduler._profiled_methods + (('_expand', 'expansions'),
+                                                                 ('_expand_calibrated', 'expansions'))
+
+    def __init__(self, beam_width=4, branching=None, time_budget=None, *args, **kwargs):
+        """
+        Takes the parameters of `~astroplan.scheduling.SequentialScheduler`, and
+
+        Parameters
+        ----------
+        beam_width : int
+            Number of partial schedules kept at every step; without
+            calibrators, 1 is the `SequentialScheduler` loop.
+        branching : int or None
+            Number of best-scoring blocks each partial schedule is extended
+            with, ``beam_width`` by default.
+        time_budget : `~astropy.units.Quantity` or None
+            How long the search may take before falling back to greedy steps.
+            No limit if `None`.
+        """
+        self.beam_width = int(beam_width)
+        self.branching = int(branching or beam_width)
+        self.time_budget = time_budget
+        super(BeamSearchScheduler, self).__init__(*args, **kwargs)
+        if self.incremental:
+            raise ValueError("BeamSearchScheduler can't reschedule incrementally")
+        # whether the last run fell back to greedy steps
+        self.fell_back = False
+        self._calibrator_blocks = {}
+        self._latest = None
+
+    def _expand(self, state, blocks, branching, filled_times, pre_filled, preFilled):
+        """
+        The partial schedules that extend ``state`` with each of its
+        ``branching`` best-scoring blocks, or with a gap if none fit.
+        """
+        remaining = list(state.remaining)
+        scores, times = self._score_candidates([blocks[i] for i in remaining], state.time, state.last,
+                                               filled_times, pre_filled)
+        # the whole block has to be in the window and clear of the fixed blocks
+        ok = (scores > 0) & (times[:, 2] < self._window_end)
+        for preFilledStart, preFilledEnd in preFilled:
+            ok &= (times[:, 2] <= preFilledStart) | (state.time >= preFilledEnd)
+        order = self._candidate_order(remaining, scores, ok, branching)
+        children = []
+        for k in order[:branching]:
+            i = remaining[k]
+            duration = times[k, 2] - times[k, 0]
+            children.append(_BeamState(times[k, 2], blocks[i], state.remaining - frozenset([i]),
+                                       state.placed + ((blocks[i], state.time, times[k, 0], scores[k], None),),
+                                       state.value + scores[k] * duration))
+        if not children:
+            # if even the best is unobservable, we need a gap
+            children.append(_BeamState(state.time + self.gap_time.to_value(u.second), state.last,
+                                       state.remaining, state.placed, state.value))
+        return children
+
+    def _expand_calibrated(self, state, blocks, branching, filled_times, pre_filled, preFilled):
+        """
+        `_expand` with calibrators: the ``branching`` best-scoring blocks
+        that can be placed along with the calibrations they need.
+        """
+        remaining = list(state.remaining)
+        scores, times = self._score_candidates([blocks[i] for i in remaining], state.time, state.last,
+                                               filled_times, pre_filled)
+        children = []
+        for k in self._candidate_order(remaining, scores, scores > 0, branching):
+            child = self._place_calibrated(state, remaining[k], blocks, pre_filled, preFilled)
+            if child is not None:
+                children.append(child)
+                if len(children) == branching:
+                    break
+        if not children:
+            # if even the best is unobservable, we need a gap
+            children.append(_BeamState(state.time + self.gap_time.to_value(u.second), state.last,
+                                       state.remaining, state.placed, state.value, state.calibrated))
+        return children
+
+    def _candidate_order(self, remaining, scores, ok, branching):
+        """
+        Indices into ``remaining`` of the candidates that are ``ok``, best
+        score first; with more than one branch the one that sets first goes
+        first, so a block isn't left until it is gone just because others
+        score the same.
+        """
+        order = np.argsort(-scores, kind='mergesort')
+        order = order[ok[order]]
+        if branching > 1 and len(order) > 1:
+            k = np.argmin(self._latest[np.asarray(remaining)[order]])
+            order = np.concatenate([order[k:k + 1], order[:k], order[k + 1:]])
+        return order
+
+    def _place_calibrated(self, state, i, blocks, pre_filled, preFilled): #Ievieto block un vajadzigos kalibratorus
+        """
+        ``state`` extended with block ``i``, split and calibrated as needed,
+        or `None` if it doesn't fit.
+        """
+        block = blocks[i]
+        duration = block.duration.to_value(u.second)
+        t = state.time
+        if t + duration > self._window_end:
+            return None
+        last = state.last
+        calibrated = state.calibrated
+        placed = []
+        if calibrated is None or int(t - calibrated) / 60 > self.calibGap:
+            t, last = self._place_calibrator(block, t, last, placed)
+            if last is None:
+                return None
+            calibrated = t
+        if block.duration > self.calibGap * u.min:
+            length = self._split_length(block.duration).to_value(u.second)
+            count = int(np.ceil(duration / length - 1e-9))
+            pieces = [length] * (count - 1) + [duration - length * (count - 1)]
+        else:
+            pieces = [duration]
+        value = 0.
+        for n, piece in enumerate(pieces):
+            if n > 0:
+                t, last = self._place_calibrator(block, t, last, placed)
+                if last is None:
+                    return None
+                calibrated = t
+            transition_start = t
+            t += self._transition(last, block, t)
+            score = self._span_score(block, t, piece)
+            if score <= 0 or t + piece > self._window_end:
+                return None
+            placed.append((block, transition_start, t, score,
+                           None if len(pieces) == 1 else (piece, n == len(pieces) - 1)))
+            t += piece
+            value += score * piece
+            last = block
+        # everything placed has to be clear of the slots filled before
+        if np.any((state.time < pre_filled[:, 1]) & (t > pre_filled[:, 0])):
+            return None
+        for preFilledStart, preFilledEnd in preFilled:
+            if state.time < preFilledEnd and t > preFilledStart:
+                return None
+        return _BeamState(t, last, state.remaining - frozenset([i]), state.placed + tuple(placed),
+                          state.value + value, calibrated)
+
+    def _place_calibrator(self, block, t, last, placed):
+        """
+        Append the calibrator nearest to ``block`` at ``t`` to ``placed``;
+        the time and block it ends at, or `None` for the block if no
+        calibrator fits.
+        """
+        calibrator = self.get_closest_calibrator(block, t, last_block=last)
+        if calibrator is None:
+            return t, None
+        calibration = self._calibrator_blocks.get(calibrator.name)
+        if calibration is None:
+            calibration = ObservingBlock(calibrator, self.calibLen * u.min, 1, calibration=True)
+            self._calibrator_blocks[calibrator.name] = calibration
+        transition_start = t
+        t += self._transition(last, calibration, t)
+        placed.append((calibration, transition_start, t, 1., None))
+        return t + self.calibLen * 60., calibration
+
+    def _transition(self, last, block, time):
+        """Seconds of the transition from ``last`` to ``block`` starting at ``time``."""
+        if last is None:
+            return 0.
+        return float(self.transitioner.durations(last, [block], self._time(time), self.observer)[0])
+
+    def _span_score(self, block, start, duration):
+        """
+        Product of the constraints of ``block`` at the start, middle and end
+        of ``duration`` seconds from ``start``.
+        """
+        times = self._jd(start + np.array([0, duration / 2., duration]))
+        score = 1.
+        for constraint in block._all_constraints:
+            score *= np.prod(self.evaluate_constraint(constraint, block.target, times))
+        return score
+
+    def _latest_starts(self, blocks): #Velakais laiks, kad katru block vel var sakt
+        """
+        Latest start (seconds since the window start, on a grid of
+        ``gap_time``) at which each of ``blocks`` fits its constraints and
+        the window, ``-inf`` if there is none.
+        """
+        if not blocks:
+            return np.zeros(0)
+        starts = np.arange(0., self._window_end, self.gap_time.to_value(u.second))
+        offsets = _duration_offsets(blocks)
+        # (blocks x starts x 3) start, middle and end times
+        times = starts[np.newaxis, :, np.newaxis] + offsets[:, np.newaxis, :]
+        fits = times[:, :, 2] <= self._window_end
+        groups = OrderedDict()
+        for i, b in enumerate(blocks):
+            for constraint in b._all_constraints:
+                groups.setdefault(id(constraint), (constraint, []))[1].append(i)
+        for constraint, indices in groups.values():
+            res = self.evaluate_constraint(constraint, [blocks[i].target for i in indices],
+                                           self._jd(times[indices].reshape(len(indices), -1)))
+            fits[indices] &= np.all(np.asarray(res).reshape(len(indices), len(starts), 3) > 0, axis=2)
+        latest = np.full(len(blocks), -np.inf)
+        for i, row in enumerate(fits):
+            possible = np.flatnonzero(row)
+            if len(possible):
+                latest[i] = starts[possible[-1]]
+        return latest
+
+    def _search(self, blocks, filled_times, pre_filled, preFilled):
+        """
+        Beam search from the window start; the best complete schedule found.
+        """
+        started = default_timer()
+        latest = self._latest = self._latest_starts(blocks)
+        durations = np.array([b.duration.to_value(u.second) for b in blocks])
+        budget = None if self.time_budget is None else self.time_budget.to_value(u.second)
+        width, branching = self.beam_width, self.branching
+        expand = self._expand_calibrated if self.calibrators else self._expand
+        beam = [_BeamState(0., None, frozenset(range(len(blocks))), (), 0.)]
+        finished = []
+        while beam:
+            if (budget is not None and width > 1 and default_timer() - started > budget):
+                # out of time: finish the best partial schedule greedily
+                if self.trace.enabled:
+                    self.trace.record('beam_fallback', t=beam[0].time, states=len(beam))
+                self.fell_back = True
+                width, branching = 1, 1
+                beam = beam[:1]
+            children = []
+            for state in beam:
+                if state.time >= self._window_end or not state.remaining:
+                    finished.append(state)
+                else:
+                    children.extend(expand(state, blocks, branching, filled_times,
+                                           pre_filled, preFilled))
+            for state in children:
+                remaining = list(state.remaining)
+                state.expired = durations[remaining][latest[remaining] < state.time].sum()
+            children.sort(key=lambda state: state.lost)
+            # different orders of the same blocks can end up in the same state
+            beam = []
+            seen = set()
+            for state in children:
+                if state.key() not in seen:
+                    seen.add(state.key())
+                    beam.append(state)
+                    if len(beam) == width:
+                        break
+            if self.trace.enabled and beam:
+                self.trace.record('beam_step', t=beam[0].time, states=len(beam), lost=beam[0].lost)
+        return max(finished, key=lambda state: state.value)
+
+    def _make_schedule(self, blocks):
+        self.fell_back = False
+        self._random = np.random.RandomState(self.seed)
+        self._calibrator_blocks = {}
+        self.prepare_ephemeris(blocks)
+        self.prepare_calibrator_index(blocks)
+        self._window_start = self.schedule.start_time
+        self._window_start_jd = self._window_start.jd
+        self._window_end = self._seconds(self.schedule.end_time)
+        filled_times, pre_filled = self._filled_times()
+        self._prepare_blocks(blocks)
+        preFilled = []
+        if self.timeDict is not None:
+            # the calibrated loop reads the specific times an hour earlier
+            self._insert_fixed_blocks(blocks, preFilled, hour_offset=-1 if self.calibrators else 0)
+
+        best = self._search(blocks, filled_times, pre_filled, preFilled)
+
+        last = None
+        for block, transition_start, start, score, piece in best.placed:
+            if last is not None:
+                trans = self.transitioner(last, block, self._time(transition_start), self.observer)
+                if trans is not None:
+                    self.schedule.insert_slot(trans.start_time, trans)
+            if block.calibration:
+                newb = ObservingBlock(block.target, self.calibLen * u.min, 1, calibration=True)
+            elif piece is not None:
+                length, final = piece
+                target = block.target
+                if not final:
+                    target = FixedTarget(block.target.coord, block.target.name + " split")
+                newb = ObservingBlock(target, length * u.second, block.priority)
+            else:
+                newb = block
+            end = start + newb.duration.to_value(u.second)
+            newb.start_time = self._time(start)
+            newb.end_time = self._time(end)
+            if not block.calibration:
+                newb.constraints_value = score
+                if self.trace.enabled:
+                    self.trace.record('scheduled', target=block.target.name, start=start,
+                                      end=end, score=score)
+            self.schedule.insert_slot(newb.start_time, newb)
+            last = block
+        return self.schedule
+
+
 class PriorityScheduler(Scheduler):
     """
     A scheduler that optimizes a prioritized list.  That is, it
     finds the best time for each ObservingBlock, in order of priority.
     """
 
+    _profiled_methods = (('attempt_insert_block', 'insert attempts'),)
+
     def __init__(self, *args, **kwargs):
         """
+        Takes the parameters of `~astroplan.scheduling.Scheduler`, and
 
+        Parameters
+        ----------
+        search_step : int
+            Number of start times in a cell of the coarse search for the best
+            start time of a block, see `_candidate_starts`. 1 (the default)
+            tries every start time in order of score.
         """
+        self.search_step = int(kwargs.pop('search_step', 1))
         super(PriorityScheduler, self).__init__(*args, **kwargs)
+        # open times of the time grid of the current run, see `_close_times`
+        self._times = self._times_jd = None
+        self._open_times = None
 
     def _get_filled_indices(self, times):
         is_open_time = np.ones(len(times), bool)
@@ -1711,6 +3200,47 @@ class PriorityScheduler(Scheduler):
                 is_open_time[min(filled[0]) - 1] = False
         return is_open_time
 
+    def _close_times(self, block):
+        """
+        Close the times of the grid that ``block`` fills in ``self._open_times``,
+        like `_get_filled_indices` does for every block, but only looking at
+        the grid times around the block.
+        """
+        if self._open_times is None:
+            return
+        times = self._times
+        first = max(np.searchsorted(self._times_jd, block.start_time.jd) - 1, 0)
+        last = min(np.searchsorted(self._times_jd, block.end_time.jd) + 1, len(times))
+        filled = first + np.flatnonzero((block.start_time < times[first:last]) &
+                                        (times[first:last] < block.end_time))
+        if len(filled) > 0:
+            self._open_times[filled] = False
+            self._open_times[min(filled) - 1] = False
+
+    def _candidate_starts(self, sum_scores):
+        """
+        Indices of the start times to try, for windows with a score above zero.
+
+        With ``search_step`` 1, all of them, best window first. Otherwise the
+        grid is split into cells of ``search_step`` start times, and the best
+        start of every cell is tried first, best cell first; the rest of the
+        starts only if none of those fit.
+        """
+        tried = np.zeros(len(sum_scores), bool)
+        if self.search_step > 1:
+            step = self.search_step
+            cells = np.zeros(-(-len(sum_scores) // step) * step)
+            cells[:len(sum_scores)] = sum_scores
+            cells = cells.reshape(-1, step)
+            best = np.argmax(cells, axis=1) + step * np.arange(len(cells))
+            coarse = best[np.argsort(sum_scores[best])[::-1]]
+            for idx in coarse[sum_scores[coarse] > 0]:
+                tried[idx] = True
+                yield idx
+        order = np.argsort(sum_scores)[::-1]
+        for idx in order[(sum_scores[order] > 0) & ~tried[order]]:
+            yield idx
+
     def _make_schedule(self, blocks):
         # Combine individual constraints with global constraints, and
         # retrieve priorities from each block to define scheduling order
@@ -1738,13 +3268,20 @@ class PriorityScheduler(Scheduler):
                                      time_resolution=time_resolution)
 
         # generate the score arrays for all of the blocks
-        scorer = Scorer(blocks, self.observer, self.schedule,
-                        global_constraints=self.constraints)
-        score_array = scorer.create_score_array(time_resolution)
+        with self.stats.phase('constraints'):
+            scorer = Scorer(blocks, self.observer, self.schedule,
+                            global_constraints=self.constraints)
+            score_array = scorer.create_score_array(time_resolution)
 
         # Sort the list of blocks by priority
         sorted_indices = np.argsort(_block_priorities)
 
+        # times that are already filled are closed once, and then as blocks
+        # are inserted, see `attempt_insert_block`
+        self._times = times
+        self._times_jd = times.jd
+        self._open_times = self._get_filled_indices(times)
+
         unscheduled_blocks = []
         # Compute the optimal observation time in priority order
         for i in sorted_indices:
@@ -1755,7 +3292,7 @@ class PriorityScheduler(Scheduler):
 
             # Add up the applied constraints to prioritize the best blocks
             # And then remove any times that are already scheduled
-            is_open_time = self._get_filled_indices(times)
+            is_open_time = self._open_times
             constraint_scores[~is_open_time] = 0
 
             # Select the most optimal time
@@ -1763,16 +3300,12 @@ class PriorityScheduler(Scheduler):
             # calculate the number of time slots needed for this exposure
             _stride_by = np.int(np.ceil(float(b.duration / time_resolution)))
 
-            # Stride the score arrays by that number
-            _strided_scores = stride_array(constraint_scores, _stride_by)
-
-            # Collapse the sub-arrays
+            # Sum the scores over every window of that many slots
             # (run them through scorekeeper again? Just add them?
             # If there's a zero anywhere in there, def. have to skip)
-            good = np.all(_strided_scores > 1e-5, axis=1)
-            sum_scores = np.zeros(len(_strided_scores))
-            sum_scores[good] = np.sum(_strided_scores[good], axis=1)
+            sum_scores, good = window_sums(constraint_scores, _stride_by, threshold=1e-5)
 
+            _is_scheduled = False
             if np.all(constraint_scores == 0) or np.all(~good):
                 # No further calculation if no times meet the constraints
                 _is_scheduled = False
@@ -1780,12 +3313,7 @@ class PriorityScheduler(Scheduler):
                 # schedulable in principle, provided the transition
                 # does not prevent us from fitting it in.
                 # loop over valid times and see if it fits
-                # TODO: speed up by searching multiples of time resolution?
-                for idx in np.argsort(sum_scores)[::-1]:
-                    if sum_scores[idx] <= 0.0:
-                        # we've run through all optimal blocks
-                        _is_scheduled = False
-                        break
+                for idx in self._candidate_starts(sum_scores):
                     try:
                         start_time_idx = idx
                         new_start_time = times[start_time_idx]
@@ -1801,6 +3329,7 @@ class PriorityScheduler(Scheduler):
             if not _is_scheduled:
                 unscheduled_blocks.append(b)
 
+        self._open_times = None
         return self.schedule
 
     def attempt_insert_block(self, b, new_start_time, start_time_idx):
@@ -1810,8 +3339,9 @@ class PriorityScheduler(Scheduler):
         b.duration = duration_indices * self.time_resolution
 
         # add 1 second to the start time to allow for scheduling at the start of a slot
-        slot_index = [q for q, slot in enumerate(self.schedule.slots)
-                      if slot.start < new_start_time + 1*u.second < slot.end][0]
+        slot_index = self.schedule._index.find(new_start_time + 1*u.second)
+        if slot_index is None:
+            raise IndexError('no slot at {0}'.format(new_start_time.iso))
         slots_before = self.schedule.slots[:slot_index]
         slots_after = self.schedule.slots[slot_index + 1:]
 
@@ -1834,6 +3364,7 @@ class PriorityScheduler(Scheduler):
                 b.constraints = b.constraints + self.constraints
             try:
                 self.schedule.insert_slot(new_start_time, b)
+                self._close_times(b)
                 return True
             except ValueError as error:
                 # this shouldn't ever happen
@@ -1929,6 +3460,7 @@ class PriorityScheduler(Scheduler):
             elif self.constraints is not None:
                 b.constraints = b.constraints + self.constraints
             self.schedule.insert_slot(new_start_time, b)
+            self._close_times(b)
 
             if tb_after:
                 self.schedule.insert_slot(tb_after.start_time, tb_after)
@@ -1943,6 +3475,490 @@ class PriorityScheduler(Scheduler):
         return True
 
 
+class ScheduleObjective(object):
+    """
+    Score of a schedule, higher is better.
+
+    A weighted sum of the priority-weighted time of the scheduled blocks, the
+    fraction of the window filled with science observations, and a penalty
+    for the time between calibrations beyond ``calibration_gap``. Subclasses can change
+    the score by overriding `score`.
+    """
+
+    @u.quantity_input(calibration_gap=u.second)
+    def __init__(self, priority=1., filled=1., calibration=0., calibration_gap=None):
+        """
+        Parameters
+        ----------
+        priority : float
+            Weight of the priority term, the sum of ``duration / priority`` of
+            the scheduled science blocks (so priority 1 blocks count the most,
+            and a block split in pieces counts as much as the whole block).
+        filled : float
+            Weight of the fraction of the window filled with science blocks.
+        calibration : float
+            Weight of the calibration penalty, the time between calibrations
+            (or the first/last science block) in excess of ``calibration_gap``,
+            as a fraction of the window.
+        calibration_gap : `~astropy.units.Quantity` or None
+            Longest time to observe without a calibration, e.g.
+            ``config['maxtimewithoutcalibration']`` minutes. No penalty if `None`.
+        """
+        self.priority = priority
+        self.filled = filled
+        self.calibration = calibration
+        self.calibration_gap = calibration_gap
+
+    def __repr__(self):
+        return '<ScheduleObjective: priority {0}, filled {1}, calibration {2}>'.format(
+            self.priority, self.filled, self.calibration)
+
+    def __call__(self, schedule, blocks=None):
+        """
+        Score of ``schedule``.
+
+        Parameters
+        ----------
+        schedule : `~astroplan.scheduling.Schedule`
+            A schedule made by any scheduler.
+        blocks : list of `~astroplan.scheduling.ObservingBlock` or None
+            All the blocks that were to be scheduled. If given, the priority
+            term is relative to the total of these blocks, otherwise to the
+            length of the window.
+        """
+        observed = schedule.observing_blocks
+        start = schedule.start_time
+        starts = np.array([(block.start_time - start).to_value(u.second) for block in observed])
+        ends = np.array([(block.end_time - start).to_value(u.second) for block in observed])
+        total = None if blocks is None else sum(block.duration.to_value(u.second) / block.priority
+                                                for block in blocks if not block.calibration)
+        return self.score([block.priority for block in observed], starts, ends,
+                          [block.calibration for block in observed],
+                          (schedule.end_time - start).to_value(u.second), total)
+
+    def score(self, priorities, starts, ends, calibration, window, total_priority=None):
+        """
+        Score of the blocks of a schedule given as arrays.
+
+        Parameters
+        ----------
+        priorities : array-like
+            Priority of every scheduled block.
+        starts, ends : array-like
+            Start and end of every block in seconds since the window start.
+        calibration : array-like of bool
+            Which blocks are calibrations.
+        window : float
+            Length of the window in seconds.
+        total_priority : float or None
+            Sum of ``duration / priority`` (in seconds) of all the science
+            blocks to schedule. Defaults to ``window``.
+
+        Returns
+        -------
+        score : float
+        """
+        priorities = np.asarray(priorities, dtype=float)
+        starts = np.asarray(starts, dtype=float)
+        ends = np.asarray(ends, dtype=float)
+        calibration = np.asarray(calibration, dtype=bool)
+        science = ~calibration
+        value = 0.
+        if self.priority:
+            weight = np.sum((ends[science] - starts[science]) / priorities[science])
+            value += self.priority * weight / (total_priority or window)
+        if self.filled:
+            value += self.filled * np.sum(ends[science] - starts[science]) / window
+        if self.calibration and self.calibration_gap is not None and np.any(science):
+            # time without a calibration, from the start of the first science
+            # block to the first calibration, between calibrations, and from
+            # the last calibration to the end of the last science block
+            order = np.argsort(starts[calibration])
+            lefts = np.concatenate(([np.min(starts[science])], ends[calibration][order]))
+            rights = np.concatenate((starts[calibration][order], [np.max(ends[science])]))
+            excess = rights - lefts - self.calibration_gap.to_value(u.second)
+            value -= self.calibration * np.sum(excess[excess > 0]) / window
+        return value
+
+
+class LocalSearchScheduler(Scheduler):
+    """
+    A scheduler that improves an arrangement of the blocks by local search,
+    with simulated annealing or tabu search, for as long as a time budget
+    allows.
+
+    The constraints are evaluated once into a (blocks x times) score matrix,
+    and slew times are looked up in a `~astroplan.ephemeris.SlewTable`, so
+    trying an arrangement needs no coordinate transformations. An arrangement
+    is an order of the blocks and a delay for each of them: the blocks are
+    placed in that order, each at the first time after the previous one (plus
+    the transition and its delay) at which all of it scores above zero.
+
+    The search starts from the blocks inserted one by one in order of
+    priority, each where it adds the most to the score, then swaps and moves
+    blocks in the order and shifts their delays, keeping the best arrangement
+    found. That is what is scheduled when the budget runs out (or the search
+    is interrupted).
+    """
+
+    _profiled_methods = (('_decode', 'placement'),)
+
+    def __init__(self, *args, **kwargs):
+        """
+        Takes the parameters of `~astroplan.scheduling.Scheduler`, and
+
+        Parameters
+        ----------
+        objective : `~astroplan.scheduling.ScheduleObjective` or None
+            What to maximize, see `ScheduleObjective.score`. Defaults to
+            ``ScheduleObjective()``.
+        method : str
+            ``'anneal'`` (the default) for simulated annealing or ``'tabu'``
+            for tabu search.
+        time_budget : `~astropy.units.Quantity` or None
+            How long to search for, 1 s by default. With `None`, the search
+            runs until ``max_iterations`` or until it is interrupted.
+        max_iterations : int or None
+            Stop after this many moves, even if the budget isn't used up.
+        seed : int or None
+            Seed of the random moves.
+        temperature : float or None
+            Start temperature of the annealing. By default the mean change in
+            score of a few random moves from the first arrangement.
+        tabu_tenure : int
+            Number of moves a moved block stays tabu for.
+        tabu_candidates : int
+            Number of random moves a tabu search step picks the best from.
+        ephemeris : `~astroplan.ephemeris.EphemerisTable` or None
+            A precomputed table to reuse, built over the window otherwise.
+        """
+        self.objective = kwargs.pop('objective', None) or ScheduleObjective()
+        self.method = kwargs.pop('method', 'anneal')
+        if self.method not in ('anneal', 'tabu'):
+            raise ValueError("method should be 'anneal' or 'tabu', not {0!r}".format(self.method))
+        self.time_budget = kwargs.pop('time_budget', 1 * u.second)
+        self.max_iterations = kwargs.pop('max_iterations', None)
+        self.seed = kwargs.pop('seed', None)
+        self.temperature = kwargs.pop('temperature', None)
+        self.tabu_tenure = int(kwargs.pop('tabu_tenure', 10))
+        self.tabu_candidates = int(kwargs.pop('tabu_candidates', 20))
+        self.ephemeris = kwargs.pop('ephemeris', None)
+        super(LocalSearchScheduler, self).__init__(*args, **kwargs)
+        self.score_array = None
+        self.best_score = None
+        self.iterations = 0
+
+    def __call__(self, blocks, schedule, score_array=None):
+        """
+        Schedule ``blocks`` in ``schedule``, see `Scheduler.__call__`.
+
+        ``score_array`` is a precomputed (blocks x times) score matrix on the
+        grid of ``time_resolution`` over the window, e.g. from
+        `~astroplan.scheduling.Scorer.create_score_array` or ``self.score_array``
+        of an earlier run. Times scoring zero are never used. By default the
+        matrix is made from the constraints and the altitude of the targets.
+        """
+        self.score_array = score_array
+        return super(LocalSearchScheduler, self).__call__(blocks, schedule)
+
+    def _prepare_ephemeris(self, targets, times):
+        # reuse the table if it covers the window and targets, like SequentialScheduler
+        table = self.ephemeris
+        if (table is None or table.observer is not self.observer or
+                not table.covers(Time([times[0], self.schedule.end_time])) or
+                table.rows(targets) is None):
+            table = EphemerisTable.from_range(self.observer, targets, self.schedule.start_time,
+                                              self.schedule.end_time,
+                                              time_resolution=self.time_resolution)
+        self.ephemeris = table
+        return table
+
+    def _prepare(self, blocks, times):
+        """
+        Tabulate all that placing the blocks needs: the first start at or
+        after every grid time at which each block fits, and the transition
+        times between blocks.
+        """
+        resolution = self.time_resolution.to_value(u.second)
+        window = (self.schedule.end_time - self.schedule.start_time).to_value(u.second)
+        targets = [block.target for block in blocks]
+        need_ephemeris = self.score_array is None or self.transitioner.slew_rate is not None
+        table = self._prepare_ephemeris(targets, times) if need_ephemeris else None
+
+        if self.score_array is None:
+            with self.stats.phase('constraints'):
+                scores = Scorer(blocks, self.observer, self.schedule,
+                                global_constraints=self.constraints or []).create_score_array(
+                                    self.time_resolution)
+                # make sure we don't schedule below the horizon
+                scores *= table._interpolate(table.alt, table.rows(targets), times.jd) > 0
+            self.score_array = scores
+        scores = np.array(self.score_array, dtype=float)
+        if scores.shape != (len(blocks), len(times)):
+            raise ValueError("score_array should have shape {0}, not {1}".format(
+                (len(blocks), len(times)), scores.shape))
+        # close times that are already filled
+        for block in self.schedule.observing_blocks:
+            scores[:, (block.start_time <= times) & (times < block.end_time)] = 0
+
+        self._steps = [int(np.ceil(float(block.duration / self.time_resolution)))
+                       for block in blocks]
+        grid = np.arange(len(times))
+        self._next_start = []
+        for i, steps in enumerate(self._steps):
+            # starts at which the whole block scores above zero and ends in the window
+            last = int(np.floor(window / resolution + 1e-9)) - steps
+            good = np.zeros(len(times), bool)
+            if steps <= len(times) and last >= 0:
+                good[:len(times) - steps + 1] = window_sums(scores[i], steps, threshold=0.)[1]
+                good[last + 1:] = False
+            starts = np.where(good, grid, -1)
+            # first good start at or after every time, -1 if none
+            starts[~good] = len(times)
+            starts = np.minimum.accumulate(starts[::-1])[::-1]
+            starts[starts == len(times)] = -1
+            self._next_start.append(starts.tolist())
+
+        # slew times between targets, as the larger of the two neighbouring
+        # columns of the slew table, so the slew at any time in between fits
+        self._slews = None
+        if self.transitioner.slew_rate is not None:
+            step = int(round(self.transitioner.slew_resolution.to_value(u.day) / table._step))
+            self._slews = SlewTable(table, step)
+            rate = self.transitioner.slew_rate.to_value(u.deg / u.second)
+            separation = self._slews.separation
+            seconds = np.maximum(separation[..., :-1], separation[..., 1:]) / rate
+            seconds[seconds <= 1] = 0
+            self._slew_seconds = seconds.tolist()
+            self._rows = [table.row(target) for target in targets]
+            lower = np.searchsorted(self._slews.jd, times.jd, side='right') - 1
+            self._slew_column = np.clip(lower, 0, len(self._slews.jd) - 2).tolist()
+        self._reconfig = None
+        if self.transitioner.instrument_reconfig_times is not None:
+            self._reconfig = [[sum(self.transitioner.compute_instrument_transitions(
+                old, new).values(), 0 * u.second).to_value(u.second)
+                for new in blocks] for old in blocks]
+
+    def _transition_steps(self, old, new, time_index):
+        # grid steps needed to get from block ``old`` to ``new`` at a grid time
+        seconds = 0.
+        if self._slews is not None:
+            seconds = self._slew_seconds[self._rows[old]][self._rows[new]][
+                self._slew_column[time_index]]
+        if self._reconfig is not None:
+            seconds += self._reconfig[old][new]
+        if not seconds:
+            return 0
+        return int(np.ceil(seconds / self._resolution))
+
+    def _decode(self, order, delays):
+        """
+        Place the blocks in ``order``, each at the first time it fits after
+        the previous one, its transition and its delay.
+
+        Returns
+        -------
+        placed : list of (block index, start index) tuples
+            The blocks that fit, in time order.
+        """
+        placed = []
+        end = 0
+        last = None
+        n_times = self._n_times
+        for i in order:
+            earliest = end + delays[i]
+            if last is not None and end < n_times:
+                earliest += self._transition_steps(last, i, end)
+            if earliest >= n_times:
+                continue
+            start = self._next_start[i][earliest]
+            if start < 0:
+                continue
+            placed.append((i, start))
+            end = start + self._steps[i]
+            last = i
+        return placed
+
+    def _evaluate(self, placed):
+        indices = [i for i, start in placed]
+        starts = np.array([start for i, start in placed], dtype=float)
+        ends = starts + np.array([self._steps[i] for i in indices], dtype=float)
+        return self.objective.score(self._priorities[indices], starts * self._resolution,
+                                    ends * self._resolution, self._calibration[indices],
+                                    self._window, self._total_priority)
+
+    def _neighbour(self, order, delays, random):
+        """
+        A random swap or move of two blocks in ``order``, or a shift of the
+        delay of one block. Returns the new order and delays, and the moved
+        blocks.
+        """
+        order = list(order)
+        kind = random.randint(3) if len(order) > 1 else 2
+        first, second = random.randint(len(order), size=2)
+        if kind == 0:
+            order[first], order[second] = order[second], order[first]
+            return order, delays, (order[first], order[second])
+        if kind == 1:
+            block = order.pop(first)
+            order.insert(second, block)
+            return order, delays, (block,)
+        block = order[first]
+        delays = list(delays)
+        shift = random.randint(1, max(self._steps[block], 2))
+        delays[block] = max(delays[block] + (shift if random.randint(2) else -shift), 0)
+        return order, delays, (block,)
+
+    def _budget(self):
+        if self.time_budget is None:
+            return np.inf
+        return self.time_budget.to_value(u.second)
+
+    def _insert_blocks(self, blocks_order, delays, started):
+        """
+        The first arrangement: every block in ``blocks_order`` (best priority
+        first) inserted where in the order it adds the most to the score. If
+        the budget runs out, the rest are appended in their order.
+        """
+        order = []
+        for n, i in enumerate(blocks_order):
+            if default_timer() - started >= self._budget():
+                return order + blocks_order[n:]
+            candidates = [order[:position] + [i] + order[position:]
+                          for position in range(len(order) + 1)]
+            scores = [self._evaluate(self._decode(candidate, delays)) for candidate in candidates]
+            order = candidates[int(np.argmax(scores))]
+        return order
+
+    def _search(self, order, delays, random, started):
+        """
+        Improve ``order`` and ``delays`` until the budget runs out, and return
+        the best placement found and its score.
+        """
+        budget = self._budget()
+        best = self._decode(order, delays)
+        best_score = current_score = self._evaluate(best)
+        if not order:
+            return best, best_score
+
+        temperature = self.temperature
+        if temperature is None and self.method == 'anneal':
+            # the smallest change a random move makes, so that the search
+            # starts from the constructed arrangement rather than a random walk
+            changes = [abs(self._evaluate(self._decode(*self._neighbour(order, delays, random)[:2])) -
+                           current_score) for _ in range(50)]
+            changes = [change for change in changes if change > 1e-9]
+            temperature = min(changes) if changes else 1e-3
+        tabu = {}
+
+        iteration = 0
+        try:
+            while True:
+                elapsed = default_timer() - started
+                if elapsed >= budget or (self.max_iterations is not None and
+                                         iteration >= self.max_iterations):
+                    break
+                iteration += 1
+                if self.method == 'anneal':
+                    new_order, new_delays, moved = self._neighbour(order, delays, random)
+                    placed = self._decode(new_order, new_delays)
+                    score = self._evaluate(placed)
+                    # cool geometrically to a thousandth of the start temperature
+                    progress = elapsed / budget
+                    if self.max_iterations:
+                        progress = max(progress, iteration / self.max_iterations)
+                    cooled = temperature * 1e-3 ** progress
+                    if (score >= current_score or
+                            random.random_sample() < np.exp((score - current_score) / cooled)):
+                        order, delays, current_score = new_order, new_delays, score
+                else:
+                    # best of a sample of moves, skipping those of tabu blocks
+                    # unless they beat the best arrangement so far
+                    chosen = None
+                    for _ in range(self.tabu_candidates):
+                        new_order, new_delays, moved = self._neighbour(order, delays, random)
+                        placed = self._decode(new_order, new_delays)
+                        score = self._evaluate(placed)
+                        if (any(tabu.get(block, 0) > iteration for block in moved) and
+                                score <= best_score):
+                            continue
+                        if chosen is None or score > chosen[0]:
+                            chosen = (score, new_order, new_delays, moved, placed)
+                    if chosen is None:
+                        continue
+                    score, order, delays, moved, placed = chosen
+                    current_score = score
+                    for block in moved:
+                        tabu[block] = iteration + self.tabu_tenure
+                if current_score > best_score:
+                    best, best_score = placed, current_score
+        except KeyboardInterrupt:
+            # anytime: an interrupted search still schedules the best so far
+            pass
+        self.iterations = iteration
+        self.stats.count('moves', iteration)
+        return best, best_score
+
+    def _make_schedule(self, blocks):
+        times = time_grid_from_range([self.schedule.start_time, self.schedule.end_time],
+                                     time_resolution=self.time_resolution)
+        for block in blocks:
+            block.observer = self.observer
+        self._resolution = self.time_resolution.to_value(u.second)
+        self._window = (self.schedule.end_time - self.schedule.start_time).to_value(u.second)
+        self._n_times = len(times)
+        self._priorities = np.array([block.priority for block in blocks], dtype=float)
+        self._calibration = np.array([block.calibration for block in blocks], dtype=bool)
+        durations = np.array([block.duration.to_value(u.second) for block in blocks])
+        self._total_priority = np.sum((durations / self._priorities)[~self._calibration])
+        self._prepare(blocks, times)
+
+        # blocks in order of priority; blocks that never fit are left out
+        first = [starts[0] for starts in self._next_start]
+        blocks_order = [i for i in np.lexsort((first, self._priorities)).tolist() if first[i] >= 0]
+        delays = [0] * len(blocks)
+        with self.stats.phase('search'):
+            started = default_timer()
+            order = self._insert_blocks(blocks_order, delays, started)
+            placed, self.best_score = self._search(order, delays, np.random.RandomState(self.seed),
+                                                   started)
+
+        previous = None
+        for i, start in placed:
+            block = blocks[i]
+            if previous is not None:
+                transition = self._transition(previous, block, times[previous.end_idx])
+                if transition is not None:
+                    self.schedule.insert_slot(transition.start_time, transition)
+            block.duration = self._steps[i] * self.time_resolution
+            block.start_idx = start
+            block.end_idx = start + self._steps[i]
+            if block.constraints is None:
+                block.constraints = self.constraints
+            elif self.constraints is not None:
+                block.constraints = block.constraints + self.constraints
+            self.schedule.insert_slot(times[start], block)
+            previous = block
+        return self.schedule
+
+    def _transition(self, oldblock, newblock, start_time):
+        # the transition from the same tables the search used
+        components = {}
+        if self._slews is not None and oldblock.target != newblock.target:
+            separation = self._slews.separations(oldblock.target, [newblock.target], start_time)
+            slew_time = separation[0] * u.deg / self.transitioner.slew_rate
+            if slew_time > 1 * u.second:
+                components['slew_time'] = slew_time
+        if self._reconfig is not None:
+            components.update(self.transitioner.compute_instrument_transitions(oldblock, newblock))
+        if not components:
+            return None
+        transition = TransitionBlock(components, start_time)
+        transition.duration = self.time_resolution * np.ceil(
+            float(transition.duration / self.time_resolution))
+        return transition
+
+
 class Transitioner(object):
     """
     A class that defines how to compute transition times from one block to
@@ -1950,7 +3966,8 @@ class Transitioner(object):
     """
     u.quantity_input(slew_rate=u.deg/u.second)
 
-    def __init__(self, slew_rate=None, instrument_reconfig_times=None):
+    def __init__(self, slew_rate=None, instrument_reconfig_times=None,
+                 precompute_slews=False, slew_resolution=30*u.min):
         """
         Parameters
         ----------
@@ -1962,11 +3979,78 @@ class Transitioner(object):
             time it takes to transition between those states (as an
             `~astropy.units.Quantity`), can also take a 'default' key
             mapped to a default transition time.
+        precompute_slews : bool
+            If True, `~astroplan.scheduling.SequentialScheduler` calls
+            `precompute` before scheduling, and slew times are interpolated
+            from the resulting `~astroplan.ephemeris.SlewTable` instead of
+            being computed on every call.
+        slew_resolution : `~astropy.units.Quantity`
+            Time grid spacing of the precomputed slew table.
         """
         self.slew_rate = slew_rate
         self.instrument_reconfig_times = instrument_reconfig_times
+        self.precompute_slews = precompute_slews
+        self.slew_resolution = slew_resolution
+        self.slew_table = None
+
+    def precompute(self, observer, targets, start_time, end_time, margin=0*u.second,
+                   ephemeris=None):
+        """
+        Tabulate the alt/az separations between all pairs of ``targets``
+        between ``start_time`` and ``end_time`` + ``margin``, so that later
+        calls look up slew times instead of transforming coordinates.
+
+        An existing table that already covers the window and targets is kept.
 
-    def __call__(self, oldblock, newblock, start_time, observer):
+        Parameters
+        ----------
+        observer : `astroplan.Observer`
+            The observer the slews are for
+        targets : list of `~astroplan.FixedTarget`
+            All targets and calibrators that may be transitioned between
+        start_time, end_time : `~astropy.time.Time`
+            The window to cover
+        margin : `~astropy.units.Quantity`
+            Extra time covered after ``end_time``
+        ephemeris : `~astroplan.ephemeris.EphemerisTable` (optional)
+            If it covers the window and targets, the slew table is sampled from
+            it at ``slew_resolution`` rather than computed again.
+
+        Returns
+        -------
+        slew_table : `~astroplan.ephemeris.SlewTable` or None
+            The table now used, `None` if there's no slew rate.
+        """
+        if self.slew_rate is None or not targets:
+            return None
+        window = Time([start_time, end_time + margin])
+
+        def usable(table):
+            return (table is not None and table.observer is observer and
+                    table.covers(window) and
+                    all(table.row(target) is not None for target in targets))
+
+        if usable(self.slew_table):
+            return self.slew_table
+        if usable(ephemeris):
+            step = int(round(self.slew_resolution.to_value(u.day) / ephemeris._step))
+            self.slew_table = SlewTable(ephemeris, step)
+        else:
+            self.slew_table = SlewTable.from_range(observer, targets, start_time, end_time,
+                                                   time_resolution=self.slew_resolution,
+                                                   margin=margin)
+        return self.slew_table
+
+    def _tabulated_slews(self, oldtarget, newtargets, start_time, observer):
+        # slew times in seconds from the slew table, None if it can't answer
+        if self.slew_table is None or self.slew_table.observer is not observer:
+            return None
+        separations = self.slew_table.separations(oldtarget, newtargets, start_time)
+        if separations is None:
+            return None
+        return (separations * u.deg / self.slew_rate).to_value(u.second)
+
+    def __call__(self, oldblock, newblock, start_time, observer, exact=False):
         """
         Determines the amount of time needed to transition from one observing
         block to another.  This uses the parameters defined in
@@ -1982,6 +4066,9 @@ class Transitioner(object):
             The time the transition should start
         observer : `astroplan.Observer`
             The observer at the time
+        exact : bool
+            If True, always compute the slew from the targets' alt/az at
+            ``start_time``, even if a slew table has been precomputed.
 
         Returns
         -------
@@ -1996,12 +4083,17 @@ class Transitioner(object):
             from .constraints import _get_altaz
             from .target import get_skycoord
             if oldblock.target != newblock.target:
-                from .target import get_skycoord
-                targets = get_skycoord([oldblock.target, newblock.target])
-                aaz = _get_altaz(start_time, observer, targets)['altaz']
-                sep = aaz[0].separation(aaz[1])
-                if sep/self.slew_rate > 1 * u.second:
-                    components['slew_time'] = sep / self.slew_rate
+                slews = None if exact else self._tabulated_slews(
+                    oldblock.target, [newblock.target], start_time, observer)
+                if slews is not None:
+                    slew_time = slews[0] * u.second
+                else:
+                    targets = get_skycoord([oldblock.target, newblock.target])
+                    aaz = _get_altaz(start_time, observer, targets)['altaz']
+                    sep = aaz[0].separation(aaz[1])
+                    slew_time = sep / self.slew_rate
+                if slew_time > 1 * u.second:
+                    components['slew_time'] = slew_time
 
         if self.instrument_reconfig_times is not None:
             components.update(self.compute_instrument_transitions(oldblock, newblock))
@@ -2011,6 +4103,53 @@ class Transitioner(object):
         else:
             return None
 
+    def durations(self, oldblock, newblocks, start_time, observer, exact=False):
+        """
+        Transition times from ``oldblock`` to each of ``newblocks``.
+
+        Gives the same durations as calling the transitioner once per block,
+        but transforms all of the targets to alt/az in a single call.
+
+        Parameters
+        ----------
+        oldblock : `~astroplan.scheduling.ObservingBlock` or None
+            The initial configuration/target
+        newblocks : list of `~astroplan.scheduling.ObservingBlock`
+            The candidate configurations/targets to transition to
+        start_time : `~astropy.time.Time`
+            The time the transitions should start
+        observer : `astroplan.Observer`
+            The observer at the time
+        exact : bool
+            If True, ignore any precomputed slew table.
+
+        Returns
+        -------
+        durations : `~numpy.ndarray`
+            Transition time in seconds for each of ``newblocks``, zero where
+            no transition is necessary
+        """
+        durations = np.zeros(len(newblocks))
+        if oldblock is None or len(newblocks) == 0:
+            return durations
+        if self.slew_rate is not None:
+            newtargets = [b.target for b in newblocks]
+            slew = None if exact else self._tabulated_slews(oldblock.target, newtargets,
+                                                            start_time, observer)
+            if slew is None:
+                from .constraints import _get_altaz
+                targets = get_skycoord([oldblock.target] + newtargets)
+                aaz = _get_altaz(start_time, observer, targets)['altaz']
+                slew = (aaz[0].separation(aaz[1:]) / self.slew_rate).to_value(u.second)
+            same_target = np.array([b.target == oldblock.target for b in newblocks])
+            slew[same_target | (slew <= 1)] = 0
+            durations += slew
+        if self.instrument_reconfig_times is not None:
+            for i, b in enumerate(newblocks):
+                for t in self.compute_instrument_transitions(oldblock, b).values():
+                    durations[i] += t.to_value(u.second)
+        return durations
+
     def compute_instrument_transitions(self, oldblock, newblock):
         components = {}
         for conf_name, old_conf in oldblock.configuration.items():
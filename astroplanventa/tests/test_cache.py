@@ -0,0 +1,75 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import numpy as np
+from astropy.time import Time
+import astropy.units as u
+from astropy.coordinates import SkyCoord
+
+from ..observer import Observer
+from ..constraints import AltitudeConstraint, AtNightConstraint
+from ..cache import ObserverCache, get_observer_cache
+
+
+def test_cache_lru_eviction():
+    cache = ObserverCache(max_bytes=3 * 800)
+    for i in range(3):
+        cache.set('altaz', i, np.zeros(100))
+    assert len(cache) == 3
+    assert cache.nbytes == 3 * 800
+    # touch the oldest entry so the second one is evicted next
+    assert cache.get('altaz', 0) is not None
+    cache.set('sun', 'x', np.zeros(100))
+    assert ('altaz', 0) in cache
+    assert ('altaz', 1) not in cache
+    assert cache.get('altaz', 1) is None
+    assert cache.hits == {'altaz': 1}
+    assert cache.misses == {'altaz': 1}
+    assert cache.evictions == {'altaz': 1}
+
+    # values larger than the whole budget are returned but not stored
+    big = np.zeros(1000)
+    assert cache.set('moon', 'big', big) is big
+    assert ('moon', 'big') not in cache
+
+    info = cache.info()
+    assert info['altaz']['entries'] == 2
+    assert info['sun']['nbytes'] == 800
+    cache.clear('altaz')
+    assert len(cache) == 1 and cache.nbytes == 800
+    cache.clear()
+    assert len(cache) == 0 and cache.nbytes == 0
+    assert cache.hits == {'altaz': 1}
+    cache.reset_stats()
+    assert cache.hits == {}
+
+
+def test_cache_get_or_compute():
+    cache = ObserverCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return np.arange(3)
+
+    for i in range(3):
+        assert np.all(cache.get_or_compute('transit', 'key', compute) == np.arange(3))
+    assert len(calls) == 1
+    assert cache.info()['transit']['hits'] == 2
+    assert cache.info()['transit']['misses'] == 1
+
+
+def test_constraints_use_observer_cache():
+    observer = Observer.at_site('lapalma')
+    times = Time([2457884.43350526, 2457884.5029497, 2457884.57239415], format='jd')
+    target = SkyCoord(10.6847929*u.deg, 41.269065*u.deg)
+    constraints = [AltitudeConstraint(u.Unit('30 deg'), u.Unit('90 deg')),
+                   AtNightConstraint()]
+    for i in range(2):
+        for constraint in constraints:
+            constraint(observer, target, times)
+    info = get_observer_cache(observer).info()
+    assert info['altaz']['entries'] == 1 and info['altaz']['hits'] == 1
+    assert info['sun']['entries'] == 1 and info['sun']['hits'] == 1
+    assert get_observer_cache(observer).nbytes > 0
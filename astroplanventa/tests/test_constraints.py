@@ -18,7 +18,7 @@ from ..constraints import (AltitudeConstraint, AirmassConstraint, AtNightConstra
                            TimeConstraint, LocalTimeConstraint, months_observable,
                            max_best_rescale, min_best_rescale, PhaseConstraint,
                            PrimaryEclipseConstraint, SecondaryEclipseConstraint,
-                           is_event_observable)
+                           is_event_observable, _make_cache_key)
 from ..periodic import EclipsingSystem
 
 APY_LT104 = not minversion('astropy', '1.0.4')
@@ -398,6 +398,21 @@ def test_caches_shapes():
     assert ac(observer, targets, times, grid_times_targets=False).shape == (3,)
 
 
+def test_cache_key():
+    times = Time([2457884.43350526, 2457884.5029497, 2457884.57239415], format='jd')
+    targets = SkyCoord([10.6847929, 10.6847929]*u.deg, [41.269065, 60.0752778]*u.deg)
+    key = _make_cache_key(times, targets)
+    assert key == _make_cache_key(Time(times.jd, format='jd'), targets.copy())
+    assert hash(key) == hash(_make_cache_key(times, targets.copy()))
+    # same longitudes, different latitudes
+    assert _make_cache_key(times, targets[0]) != _make_cache_key(times, targets[1])
+    assert key != _make_cache_key(times, targets[:, np.newaxis])
+    assert key != _make_cache_key(times + 1*u.second, targets)
+    assert key != _make_cache_key(times[:2], targets)
+    assert _make_cache_key(times[0], 'sun') == _make_cache_key(times[0], 'sun')
+    assert _make_cache_key(times, 'sun') != _make_cache_key(times, 'moon')
+
+
 def test_eclipses():
     subaru = Observer.at_site("Subaru")
 
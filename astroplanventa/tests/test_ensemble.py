@@ -0,0 +1,86 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import pickle
+
+import numpy as np
+import pytest
+from astropy.time import Time
+import astropy.units as u
+from astropy.coordinates import SkyCoord
+
+from ..observer import Observer
+from ..target import FixedTarget
+from ..constraints import AirmassConstraint
+from ..ephemeris import EphemerisTable, SlewTable
+from ..scheduling import ObservingBlock, Schedule, SequentialScheduler, Transitioner
+from ..ensemble import SchedulerEnsemble, SharedTables, make_variants
+
+vega = FixedTarget(coord=SkyCoord(ra=279.23473479 * u.deg, dec=38.78368896 * u.deg),
+                   name="Vega")
+rigel = FixedTarget(coord=SkyCoord(ra=78.63446707 * u.deg, dec=8.20163837 * u.deg),
+                    name="Rigel")
+polaris = FixedTarget(coord=SkyCoord(ra=37.95456067 * u.deg,
+                                     dec=89.26410897 * u.deg), name="Polaris")
+
+apo = Observer.at_site('apo')
+targets = [vega, polaris, rigel]
+start_time = Time('2016-02-06 03:00:00')
+config = {'maxtimewithoutcalibration': '30', 'calibrationlength': '5',
+          'maxaltitude': '85', 'minaltitude': '10'}
+
+
+def test_make_variants():
+    variants = make_variants(20, seed=100)
+    assert len(variants) == 20
+    # the scheduler as it is comes first
+    assert variants[0] == {}
+    assert len(set(variant['seed'] for variant in variants[1:])) == 19
+    assert set(variant['split_policy'] for variant in variants[1:]) == {'gap', 'equal'}
+    assert set(variant['calibrator_choices'] for variant in variants[1:]) == {1, 2, 3}
+
+
+def test_shared_tables():
+    pytest.importorskip('multiprocessing.shared_memory')
+    ephemeris = EphemerisTable.from_range(apo, targets, start_time, start_time + 2*u.hour,
+                                          time_resolution=5*u.minute)
+    slews = SlewTable(ephemeris, 3)
+    with SharedTables() as shared:
+        # the stand-ins are what is pickled for the workers
+        handle = pickle.loads(pickle.dumps(shared.share(slews)))
+        assert shared.share(slews) is shared.share(slews)
+        attached = handle.attach()
+        assert isinstance(attached, SlewTable)
+        assert isinstance(attached.ephemeris, EphemerisTable)
+        assert np.array_equal(attached.separation, slews.separation)
+        assert not attached.separation.flags.writeable
+        assert np.array_equal(attached.ephemeris.altitude(rigel, ephemeris.jd[:7]),
+                              ephemeris.altitude(rigel, ephemeris.jd[:7]))
+        assert np.array_equal(attached.separations(vega, [rigel, polaris], start_time),
+                              slews.separations(vega, [rigel, polaris], start_time))
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_scheduler_ensemble(workers):
+    blocks = [ObservingBlock(t, 55 * u.minute, i + 1,
+                             constraints=[AirmassConstraint(3, boolean_constraint=False)])
+              for i, t in enumerate(targets)]
+    scheduler = SequentialScheduler(constraints=[], observer=apo, config=config,
+                                    transitioner=Transitioner(slew_rate=1 * u.deg / u.second,
+                                                              precompute_slews=True))
+    ensemble = SchedulerEnsemble(scheduler, variants=4, workers=workers)
+    schedule = Schedule(start_time, start_time + 8*u.hour)
+    assert ensemble(blocks, schedule) is schedule
+    assert len(ensemble.scores) == 4
+    assert ensemble.scores[ensemble.best] == max(ensemble.scores)
+    assert ensemble.objective(schedule, blocks) == pytest.approx(max(ensemble.scores))
+    assert len(schedule.observing_blocks) > 0
+    # the tables were computed once, by the scheduler passed in
+    assert scheduler.ephemeris is not None
+    assert len(ensemble.table()) == 4
+
+    # the plain scheduler is the first variant
+    plain = Schedule(start_time, start_time + 8*u.hour)
+    scheduler(blocks, plain)
+    assert ensemble.objective(plain, blocks) == pytest.approx(ensemble.scores[0])
@@ -0,0 +1,114 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import numpy as np
+import pytest
+from astropy.time import Time
+import astropy.units as u
+from astropy.coordinates import SkyCoord
+
+from ..observer import Observer
+from ..target import FixedTarget, get_skycoord
+from ..constraints import AltitudeConstraint, AirmassConstraint
+from ..ephemeris import EphemerisTable, SlewTable, CalibratorIndex
+
+vega = FixedTarget(coord=SkyCoord(ra=279.23473479 * u.deg, dec=38.78368896 * u.deg),
+                   name="Vega")
+rigel = FixedTarget(coord=SkyCoord(ra=78.63446707 * u.deg, dec=8.20163837 * u.deg),
+                    name="Rigel")
+polaris = FixedTarget(coord=SkyCoord(ra=37.95456067 * u.deg,
+                                     dec=89.26410897 * u.deg), name="Polaris")
+
+apo = Observer.at_site('apo')
+start_time = Time('2016-02-06 03:00:00')
+end_time = start_time + 6*u.hour
+
+
+def test_ephemeris_table_matches_altaz():
+    table = EphemerisTable.from_range(apo, [vega, rigel, polaris], start_time,
+                                      end_time, time_resolution=1*u.minute)
+    assert table.covers(Time([start_time, end_time]))
+    assert not table.covers(end_time + 1*u.hour)
+    # between grid points
+    times = start_time + [7.5, 95.25, 301.1] * u.minute
+    for target in (vega, rigel, polaris):
+        altaz = apo.altaz(times, target)
+        assert np.allclose(table.altitude(target, times), altaz.alt.deg, atol=1e-3)
+        az_diff = (table.azimuth(target, times) - altaz.az.deg + 180) % 360 - 180
+        assert np.all(np.abs(az_diff) < 1e-2)
+
+
+def test_ephemeris_table_rows():
+    table = EphemerisTable.from_range(apo, [vega, rigel], start_time, end_time)
+    # a new object at the same position (e.g. a split block) shares the row
+    split = FixedTarget(coord=vega.coord, name="Vega split")
+    assert table.row(split) == table.row(vega)
+    assert table.row(polaris) is None
+    with pytest.raises(KeyError):
+        table.altitude(polaris, start_time)
+
+
+def test_ephemeris_table_constraints():
+    table = EphemerisTable.from_range(apo, [vega, rigel], start_time, end_time)
+    times = start_time + [0, 30, 60] * u.minute
+    # limits given the same way as the GUI does, e.g. '10' * u.deg
+    constraints = [AltitudeConstraint(u.Unit('10 deg'), u.Unit('85 deg')),
+                   AirmassConstraint(2),
+                   AirmassConstraint(3, boolean_constraint=False)]
+    for constraint in constraints:
+        for target in (vega, rigel):
+            assert np.allclose(table.evaluate(constraint, target, times),
+                               constraint(apo, target, times), atol=1e-3)
+    # untabulated targets fall back to the exact computation
+    assert np.array_equal(table.evaluate(constraints[0], polaris, times),
+                          constraints[0](apo, polaris, times))
+
+
+def test_slew_table():
+    targets = [vega, rigel, polaris]
+    table = SlewTable.from_range(apo, targets, start_time, end_time,
+                                 time_resolution=30*u.minute)
+    assert table.separation.shape == (3, 3, 13)
+    assert np.all(np.diag(table.separation[:, :, 0]) < 1e-6)
+    time = start_time + 47*u.minute
+    aaz = apo.altaz(time, get_skycoord(targets))
+    exact = aaz[0].separation(aaz[1:]).deg
+    assert np.allclose(table.separations(vega, [rigel, polaris], time), exact, atol=1e-3)
+    deneb = FixedTarget(coord=SkyCoord(ra=310.35797975 * u.deg, dec=45.28033881 * u.deg),
+                        name="Deneb")
+    assert table.separations(vega, [deneb], time) is None
+    assert table.separations(vega, [rigel], end_time + 1*u.hour) is None
+
+
+def test_calibrator_index():
+    rng = np.random.RandomState(0)
+    calibrators = [FixedTarget(coord=SkyCoord(ra=ra * u.deg, dec=dec * u.deg), name=str(i))
+                   for i, (ra, dec) in enumerate(zip(rng.uniform(0, 360, 40),
+                                                     rng.uniform(-60, 90, 40)))]
+    index = CalibratorIndex(calibrators, targets=[vega])
+    for target in (vega, rigel):
+        separations = get_skycoord(calibrators).separation(target.coord).deg
+        order, seps = index.nearest(target)
+        assert list(order) == list(np.argsort(separations, kind='mergesort'))
+        assert np.allclose(seps, separations[order], atol=1e-6)
+        order, seps = index.nearest(target, 3)
+        assert len(order) == 3
+
+
+def test_calibrator_index_kdtree():
+    pytest.importorskip('scipy')
+
+    class SmallCatalogIndex(CalibratorIndex):
+        kdtree_threshold = 10
+
+    rng = np.random.RandomState(0)
+    calibrators = [FixedTarget(coord=SkyCoord(ra=ra * u.deg, dec=dec * u.deg), name=str(i))
+                   for i, (ra, dec) in enumerate(zip(rng.uniform(0, 360, 40),
+                                                     rng.uniform(-60, 90, 40)))]
+    index = CalibratorIndex(calibrators)
+    tree_index = SmallCatalogIndex(calibrators, targets=[vega])
+    assert tree_index._tree is not None
+    order, seps = tree_index.nearest(rigel, 5)
+    assert list(order) == list(index.nearest(rigel, 5)[0])
+    assert np.allclose(seps, index.nearest(rigel, 5)[1], atol=1e-6)
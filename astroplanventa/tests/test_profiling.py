@@ -0,0 +1,63 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import pytest
+
+from ..profiling import PhaseStats, NullStats
+
+
+class Counter(object):
+
+    def __init__(self):
+        self.n = 0
+
+    def __call__(self, step=1):
+        self.n += step
+        return self.n
+
+    def double(self):
+        return 2 * self.n
+
+
+def test_null_stats():
+    stats = NullStats()
+    assert not stats.enabled
+    stats.add('constraints', 1.)
+    with stats.phase('total'):
+        pass
+
+
+def test_phase_stats_wrap_restore():
+    stats = PhaseStats()
+    counter = Counter()
+    holder = Counter()
+    holder.counter = counter
+
+    stats.wrap(counter, 'double', 'doubling')
+    stats.wrap(holder, 'counter', 'counting', methods=('double',))
+    assert holder.counter(2) == 2
+    assert holder.counter.n == 2
+    assert holder.counter.double() == 4
+    with stats.phase('total'):
+        stats.count('steps', 3)
+    stats.restore()
+
+    assert holder.counter is counter
+    assert 'double' not in vars(counter)
+    assert stats.calls == {'counting': 2, 'doubling': 1, 'total': 1, 'steps': 3}
+
+    table = stats.table(total='total')
+    assert list(table['phase']) == ['counting', 'doubling', 'steps', 'total']
+    assert table['fraction'][3] == 1
+    assert table['time'].unit == 's'
+
+
+def test_phase_stats_exception():
+    stats = PhaseStats()
+    counter = Counter()
+    stats.wrap(counter, 'double', 'doubling')
+    counter.double = stats.timed(lambda: 1 / 0, 'failing')
+    with pytest.raises(ZeroDivisionError):
+        counter.double()
+    assert stats.calls['failing'] == 1
@@ -3,6 +3,7 @@ from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
 
 import numpy as np
+import pytest
 from astropy.time import Time
 import astropy.units as u
 from astropy.coordinates import SkyCoord
@@ -10,10 +11,12 @@ from astropy.coordinates import SkyCoord
 from ..utils import time_grid_from_range
 from ..observer import Observer
 from ..target import FixedTarget, get_skycoord
-from ..constraints import (AirmassConstraint, AtNightConstraint, _get_altaz,
+from ..constraints import (AirmassConstraint, AltitudeConstraint, AtNightConstraint, _get_altaz,
                            MoonIlluminationConstraint)
-from ..scheduling import (ObservingBlock, PriorityScheduler, SequentialScheduler,
-                          Transitioner, TransitionBlock, Schedule, Slot, Scorer)
+from ..scheduling import (ObservingBlock, ObservingBlockSet, PriorityScheduler, SequentialScheduler,
+                          SlotIndex, Transitioner, TransitionBlock, Schedule, Slot, Scorer,
+                          LocalSearchScheduler, ScheduleObjective, BeamSearchScheduler)
+from ..trace import DecisionTrace
 
 vega = FixedTarget(coord=SkyCoord(ra=279.23473479 * u.deg, dec=38.78368896 * u.deg),
                    name="Vega")
@@ -42,6 +45,34 @@ def test_observing_block():
                (times_per_exposure[index] + readout_time))
 
 
+def test_observing_block_set():
+    rows = [(vega, 1, 10), (rigel, 2, 4), (vega, 3, 6)]
+    block_set = ObservingBlockSet.from_table(rows, 1*u.minute, 0.5*u.minute)
+    assert len(block_set) == 3
+    assert block_set.targets == [vega, rigel]
+    assert list(block_set.target_index) == [0, 1, 0]
+    for block, (target, priority, number) in zip(block_set, rows):
+        single = ObservingBlock.from_exposures(target, priority, 1*u.minute, number, 0.5*u.minute)
+        assert isinstance(block, ObservingBlock)
+        assert block.target is target
+        assert block.priority == priority
+        assert np.abs(block.duration - single.duration) < 1*u.microsecond
+        assert block.number_exposures == number
+    # views are made once, and write through to the arrays
+    assert block_set[-1] is block_set[2]
+    block_set[1].duration = 30*u.minute
+    assert block_set.durations[1] == 1800
+    assert np.allclose(block_set.offsets[1], [0, 180, 360])
+    # with no constraints, blocks are kept above the horizon
+    all_constraints = block_set.prepare([])
+    assert [type(c) for c in all_constraints] == [AltitudeConstraint]
+    assert [type(c) for c in block_set[0].constraints] == [AltitudeConstraint]
+    assert np.allclose(block_set.offsets[1], [0, 900, 1800])
+    copied = block_set.copy()
+    copied[1].duration = 1*u.minute
+    assert block_set[1].duration == 30*u.minute
+
+
 def test_slot():
     start_time = Time('2016-02-06 03:00:00')
     end_time = start_time + 24 * u.hour
@@ -88,6 +119,82 @@ def test_schedule_insert_slot():
     assert schedule.slots[0].start == start
 
 
+def test_slot_index():
+    start = Time('2016-02-06 03:00:00')
+    schedule = Schedule(start, start + 5*u.hour)
+    for hours in (3, 1, 2):
+        block = TransitionBlock.from_duration(30*u.minute)
+        schedule.insert_slot(start + hours*u.hour, block)
+    starts = [slot.start for slot in schedule.slots]
+    assert all(early < late for early, late in zip(starts[:-1], starts[1:]))
+    assert all(np.abs(early.end - late.start) < 1*u.second
+               for early, late in zip(schedule.slots[:-1], schedule.slots[1:]))
+    assert len(schedule.scheduled_blocks) == 3
+    assert len(schedule.open_slots) == 4
+
+    index = SlotIndex(schedule.slots)
+    assert index.find(start - 1*u.minute) is None
+    assert index.find(start + 5*u.hour + 1*u.minute) is None
+    for i, slot in enumerate(schedule.slots):
+        assert index.find(slot.start + 1*u.second) == i
+        assert index.find(slot.end - 1*u.second) == i
+
+    with pytest.raises(ValueError):
+        schedule.insert_slot(start + 6*u.hour, TransitionBlock.from_duration(1*u.minute))
+
+    # a view is occupied by its block, not by the flag
+    open_slot = schedule.open_slots[0]
+    with pytest.raises(ValueError):
+        open_slot.occupied = True
+    assert not open_slot.occupied
+    schedule.slots[1].occupied = True
+    assert schedule.slots[1].occupied
+
+    # a copy keeps the slots it was made with, with its blocks replaced by id
+    first = schedule.scheduled_blocks[0]
+    replacement = TransitionBlock.from_duration(30*u.minute)
+    copied = schedule._index.copy({id(first): replacement})
+    starts = schedule._index.starts.copy()
+    schedule.insert_slot(start + 4*u.hour, TransitionBlock.from_duration(10*u.minute))
+    assert len(copied) == 7
+    assert len(schedule.slots) == 9
+    assert np.all(copied.starts == starts)
+    assert copied.block_at(1) is replacement
+    assert schedule._index.block_at(1) is first
+
+
+def test_schedule_arrays():
+    start = Time('2016-02-06 03:00:00')
+    schedule = Schedule(start, start + 5*u.hour)
+    assert schedule.last_observing_block is None
+    blocks = [ObservingBlock(vega, 30*u.minute, 0), ObservingBlock(rigel, 30*u.minute, 0)]
+    schedule.insert_slot(start + 1*u.hour, blocks[0])
+    schedule.insert_slot(start + 1.5*u.hour, TransitionBlock.from_duration(10*u.minute))
+    schedule.insert_slot(start + 3*u.hour, blocks[1])
+    assert schedule.last_observing_block is blocks[1]
+    assert schedule.observing_blocks == blocks
+    assert len(schedule.scheduled_blocks) == 3
+
+    index = schedule._index
+    assert len(index) == len(schedule.slots) == 6
+    assert list(index.kind) == [0, 1, 2, 0, 1, 0]
+    assert [index.targets[row].name for row in index.target if row >= 0] == ['Vega', 'Rigel']
+    assert all(isinstance(slot, Slot) for slot in schedule.slots)
+    assert schedule.slots[1].block is blocks[0]
+    assert schedule.slots[-1].end == start + 5*u.hour
+    assert schedule.slots[1].start.format == start.format
+
+    # views write through to the arrays
+    schedule.slots[0].end = start + 30*u.minute
+    assert np.abs(index.end(0) - (start + 30*u.minute)) < 1*u.microsecond
+    assert index.find(start + 45*u.minute) is None
+
+    table = schedule.to_table(show_unused=True)
+    assert list(table['target']) == ['Unused Time', 'Vega', 'TransitionBlock', 'Unused Time',
+                                     'Rigel', 'Unused Time']
+    assert np.allclose(table['duration (minutes)'][1:5], [30, 10, 80, 30])
+
+
 def test_schedule_change_slot_block():
     start = Time('2016-02-06 03:00:00')
     schedule = Schedule(start, start + 5 * u.hour)
@@ -130,6 +237,45 @@ def test_transitioner():
     assert transition1.components is not None
 
 
+def test_transitioner_durations():
+    blocks = [ObservingBlock(vega, 10*u.minute, 0, configuration={'filter': 'v'}),
+              ObservingBlock(vega, 10*u.minute, 0, configuration={'filter': 'i'}),
+              ObservingBlock(rigel, 10*u.minute, 0, configuration={'filter': 'i'}),
+              ObservingBlock(polaris, 10*u.minute, 0, configuration={'filter': 'v'})]
+    trans = Transitioner(1 * u.deg / u.second,
+                         instrument_reconfig_times={'filter': {('v', 'i'): 2*u.minute,
+                                                               'default': 5*u.minute}})
+    start_time = Time('2016-02-06 03:00:00')
+    durations = trans.durations(blocks[0], blocks[1:], start_time, apo)
+    for duration, block in zip(durations, blocks[1:]):
+        transition = trans(blocks[0], block, start_time, apo)
+        expected = 0 if transition is None else transition.duration.to_value(u.second)
+        assert np.abs(duration - expected) < 1e-6
+    assert np.all(trans.durations(None, blocks, start_time, apo) == 0)
+
+
+def test_transitioner_slew_table():
+    blocks = [ObservingBlock(t, 10*u.minute, 0) for t in (vega, rigel, polaris)]
+    start_time = Time('2016-02-06 03:00:00')
+    trans = Transitioner(1 * u.deg / u.second, precompute_slews=True)
+    table = trans.precompute(apo, [b.target for b in blocks], start_time, start_time + 6*u.hour)
+    assert trans.slew_table is table
+    # already covered, so kept
+    assert trans.precompute(apo, [vega], start_time, start_time + 1*u.hour) is table
+    time = start_time + 95*u.minute
+    exact = trans(blocks[0], blocks[1], time, apo, exact=True)
+    tabulated = trans(blocks[0], blocks[1], time, apo)
+    assert np.abs(exact.duration - tabulated.duration) < 0.1*u.second
+    durations = trans.durations(blocks[0], blocks, time, apo)
+    exact_durations = trans.durations(blocks[0], blocks, time, apo, exact=True)
+    assert durations[0] == 0
+    assert np.allclose(durations, exact_durations, atol=0.1)
+    # outside the table, the exact path is used
+    late = start_time + 8*u.hour
+    assert (trans(blocks[0], blocks[2], late, apo).duration ==
+            trans(blocks[0], blocks[2], late, apo, exact=True).duration)
+
+
 default_transitioner = Transitioner(slew_rate=1 * u.deg / u.second)
 
 
@@ -158,6 +304,84 @@ def test_priority_scheduler():
     scheduler(blocks, schedule)
 
 
+def test_priority_scheduler_open_times():
+    start_time = Time('2016-02-06 03:00:00')
+    schedule = Schedule(start_time, start_time + 6*u.hour)
+    scheduler = PriorityScheduler(transitioner=default_transitioner, constraints=[],
+                                  observer=apo, time_resolution=2*u.minute)
+    scheduler.schedule = schedule
+    times = time_grid_from_range([schedule.start_time, schedule.end_time],
+                                 time_resolution=2*u.minute)
+    scheduler._times = times
+    scheduler._times_jd = times.jd
+    scheduler._open_times = scheduler._get_filled_indices(times)
+    for i, (minutes, duration) in enumerate([(60, 55), (200, 31), (0, 20), (301, 59)]):
+        block = ObservingBlock(targets[i % 3], duration*u.minute, 0)
+        schedule.insert_slot(start_time + minutes*u.minute, block)
+        scheduler._close_times(block)
+        # the mask kept up to date is the same as one built from scratch
+        assert np.array_equal(scheduler._open_times, scheduler._get_filled_indices(times))
+    assert not scheduler._open_times.all()
+
+
+def test_priority_scheduler_candidate_starts():
+    sum_scores = np.array([0, 3, 5, 0, 1, 8, 2, 0, 4, 6, 7])
+    positive = [i for i in np.argsort(sum_scores)[::-1] if sum_scores[i] > 0]
+    scheduler = PriorityScheduler(transitioner=default_transitioner, constraints=[],
+                                  observer=apo, time_resolution=2*u.minute)
+    assert list(scheduler._candidate_starts(sum_scores)) == positive
+    # the coarse search starts with the best start of every cell of 4
+    scheduler = PriorityScheduler(transitioner=default_transitioner, constraints=[],
+                                  observer=apo, time_resolution=2*u.minute, search_step=4)
+    starts = list(scheduler._candidate_starts(sum_scores))
+    assert starts[:3] == [5, 10, 2]
+    assert sorted(starts) == sorted(positive)
+
+
+def test_schedule_objective():
+    objective = ScheduleObjective(priority=1, filled=2, calibration=3,
+                                  calibration_gap=10*u.second)
+    # science blocks at 0-20 s (priority 1) and 60-80 s (priority 2), a
+    # calibration at 30-40 s: 20 s and 30 s over the gap before and after it
+    score = objective.score([1, 2, 1], [0, 60, 30], [20, 80, 40], [False, False, True], 100.)
+    assert score == pytest.approx((20 + 20 / 2) / 100 + 2 * 0.4 - 3 * 0.5)
+    assert objective.score([1, 2, 1], [0, 60, 30], [20, 80, 40], [False, False, True], 100.,
+                           total_priority=60.) == pytest.approx(0.5 + 2 * 0.4 - 3 * 0.5)
+    assert objective.score([], [], [], [], 100.) == 0
+
+
+@pytest.mark.parametrize('method', ['anneal', 'tabu'])
+def test_local_search_scheduler(method):
+    constraints = [AirmassConstraint(3, boolean_constraint=False)]
+    blocks = [ObservingBlock(t, 55*u.minute, i + 1) for i, t in enumerate(targets)]
+    start_time = Time('2016-02-06 03:00:00')
+    end_time = start_time + 18*u.hour
+    scheduler = LocalSearchScheduler(transitioner=default_transitioner,
+                                     constraints=constraints, observer=apo,
+                                     time_resolution=2*u.minute, method=method,
+                                     time_budget=None, max_iterations=50, seed=1)
+    schedule = Schedule(start_time, end_time)
+    scheduler(blocks, schedule)
+    assert len(schedule.observing_blocks) == 3
+    assert scheduler.iterations == 50
+    assert scheduler.best_score == pytest.approx(scheduler.objective(schedule, blocks))
+    assert all(np.abs(block.end_time - block.start_time - block.duration) <
+               1*u.second for block in schedule.scheduled_blocks)
+    slots = [slot for slot in schedule.slots if slot.block is not None]
+    assert all(before.end <= after.start + 1*u.second
+               for before, after in zip(slots[:-1], slots[1:]))
+    # every block is at a time at which it scores above zero
+    for block in schedule.observing_blocks:
+        row = [i for i, b in enumerate(blocks) if b.target == block.target][0]
+        assert np.all(scheduler.score_array[row, block.start_idx:block.end_idx] > 0)
+
+    # the same score matrix can be given again, and the same seed gives the same schedule
+    again = Schedule(start_time, end_time)
+    scheduler(blocks, again, score_array=scheduler.score_array)
+    assert ([block.start_time for block in again.observing_blocks] ==
+            [block.start_time for block in schedule.observing_blocks])
+
+
 def test_sequential_scheduler():
     constraints = [AirmassConstraint(2.5, boolean_constraint=False)]
     blocks = [ObservingBlock(t, 55 * u.minute, i) for i, t in enumerate(targets)]
@@ -182,6 +406,294 @@ def test_sequential_scheduler():
     scheduler(blocks, schedule)
 
 
+def test_sequential_scheduler_window_seconds():
+    config = {'maxtimewithoutcalibration': '30', 'calibrationlength': '5',
+              'maxaltitude': '85', 'minaltitude': '10'}
+    scheduler = SequentialScheduler(constraints=[], observer=apo,
+                                    transitioner=default_transitioner, config=config)
+    start_time = Time('2016-02-06 03:00:00')
+    scheduler._window_start = start_time
+    scheduler._window_start_jd = start_time.jd
+    seconds = np.array([0, 1.5, 3600, 86400 * 2 + 0.25])
+    times = scheduler._time(seconds)
+    assert times.format == start_time.format
+    assert np.all(np.abs((times - (start_time + seconds * u.second)).sec) < 1e-6)
+    assert np.allclose(scheduler._seconds(times), seconds, rtol=0, atol=1e-6)
+    assert np.allclose(scheduler._jd(seconds), times.jd, rtol=0, atol=1e-9)
+
+
+
+def test_sequential_scheduler_variant_choices():
+    scheduler = SequentialScheduler(constraints=[], observer=apo, config={
+        'maxtimewithoutcalibration': '30', 'calibrationlength': '5',
+        'maxaltitude': '85', 'minaltitude': '10'},
+        transitioner=default_transitioner)
+    results = [0.5, 0.9, 0.2, 0.9, 0.89]
+    assert scheduler._best_block(results) == 1
+    assert scheduler._split_length(70*u.minute) == 30*u.minute
+    # random picks among the blocks within 2 % of the best
+    scheduler.tie_tolerance = 0.02
+    assert set(scheduler._best_block(results) for _ in range(50)) == {1, 3, 4}
+    assert scheduler._best_block([0, 0, 0]) == 0
+    # 70 minutes in three equal pieces instead of 30 + 30 + 10
+    scheduler.split_policy = 'equal'
+    assert scheduler._split_length(70*u.minute) == 1400*u.second
+    with pytest.raises(ValueError):
+        SequentialScheduler(constraints=[], observer=apo, config=scheduler.config,
+                            transitioner=default_transitioner, split_policy='halves')
+
+
+def test_beam_search_scheduler():
+    config = {'maxtimewithoutcalibration': '30', 'calibrationlength': '5',
+              'maxaltitude': '85', 'minaltitude': '10'}
+    constraints = [AltitudeConstraint(u.Unit('10 deg'), u.Unit('90 deg'))]
+    start_time = Time('2016-02-06 03:00:00')
+    end_time = start_time + 12 * u.hour
+
+    def run(scheduler):
+        schedule = Schedule(start_time, end_time)
+        blocks = [ObservingBlock(t, 55 * u.minute, i) for i, t in enumerate(targets)]
+        scheduler(blocks, schedule)
+        return schedule
+
+    greedy = run(SequentialScheduler(constraints=constraints, observer=apo, config=config,
+                                     transitioner=default_transitioner, gap_time=15*u.minute))
+    # a beam of one is the greedy scheduler
+    scheduler = BeamSearchScheduler(beam_width=1, constraints=constraints, observer=apo,
+                                    config=config, transitioner=default_transitioner,
+                                    gap_time=15*u.minute)
+    schedule = run(scheduler)
+    assert ([(b.target.name, b.start_time.jd) for b in schedule.observing_blocks] ==
+            [(b.target.name, b.start_time.jd) for b in greedy.observing_blocks])
+
+    scheduler.beam_width = scheduler.branching = 3
+    schedule = run(scheduler)
+    assert not scheduler.fell_back
+    assert len(schedule.observing_blocks) >= len(greedy.observing_blocks)
+    slots = [slot for slot in schedule.slots if slot.block is not None]
+    for slot, following in zip(slots[:-1], slots[1:]):
+        assert slot.end <= following.start + 1 * u.ms
+    for block in schedule.observing_blocks:
+        assert block.constraints_value > 0
+
+    # without time for the search it finishes greedily
+    scheduler.time_budget = 0 * u.second
+    run(scheduler)
+    assert scheduler.fell_back
+
+    with pytest.raises(ValueError):
+        BeamSearchScheduler(constraints=constraints, observer=apo, config=config,
+                            transitioner=default_transitioner, incremental=True)
+
+
+def test_beam_search_scheduler_calibrators():
+    config = {'maxtimewithoutcalibration': '30', 'calibrationlength': '5',
+              'maxaltitude': '85', 'minaltitude': '10'}
+    constraints = [AltitudeConstraint(u.Unit('10 deg'), u.Unit('90 deg'))]
+    start_time = Time('2016-02-06 03:00:00')
+    end_time = start_time + 8 * u.hour
+    rng = np.random.RandomState(5)
+    sky = [FixedTarget(coord=SkyCoord(ra=ra * u.deg, dec=dec * u.deg), name='t{0}'.format(i))
+           for i, (ra, dec) in enumerate(zip(rng.uniform(0, 360, 12), rng.uniform(0, 80, 12)))]
+    calibrators = [FixedTarget(coord=SkyCoord(ra=ra * u.deg, dec=40 * u.deg), name='c{0}'.format(i))
+                   for i, ra in enumerate(range(0, 360, 60))]
+    durations = [20, 10, 45, 15] * 3
+    scheduler = BeamSearchScheduler(beam_width=3, constraints=constraints, observer=apo,
+                                    transitioner=default_transitioner, config=config,
+                                    calibrators=calibrators)
+    schedule = Schedule(start_time, end_time)
+    scheduler([ObservingBlock(t, d * u.minute, 1 + i % 3) for i, (t, d) in enumerate(zip(sky, durations))],
+              schedule)
+
+    slots = [slot for slot in schedule.slots if slot.block is not None]
+    for slot, following in zip(slots[:-1], slots[1:]):
+        assert slot.end <= following.start + 1 * u.ms
+    observing = schedule.observing_blocks
+    assert observing[0].calibration
+    observed = {}
+    calibrated = None
+    for block in observing:
+        if block.calibration:
+            calibrated = block.end_time
+            continue
+        # no piece is longer than the gap, and none starts long after a calibration
+        assert block.duration <= 30 * u.minute
+        assert block.start_time - calibrated < 35 * u.minute
+        assert block.constraints_value > 0
+        name = block.target.name.replace(' split', '')
+        observed[name] = observed.get(name, 0 * u.minute) + block.duration
+    assert len(observed) > 6
+    # long blocks are observed whole, in pieces
+    for name, duration in observed.items():
+        assert abs(duration - durations[int(name[1:])] * u.minute) < 1 * u.second
+
+
+def test_sequential_scheduler_trace():
+    config = {'maxtimewithoutcalibration': '30', 'calibrationlength': '5',
+              'maxaltitude': '85', 'minaltitude': '10'}
+    constraints = [AltitudeConstraint(u.Unit('10 deg'), u.Unit('90 deg'))]
+    start_time = Time('2016-02-06 03:00:00')
+    end_time = start_time + 12 * u.hour
+    scheduler = SequentialScheduler(constraints=constraints, observer=apo,
+                                    transitioner=default_transitioner, config=config,
+                                    gap_time=15*u.minute)
+    assert not scheduler.trace.enabled
+
+    schedule = Schedule(start_time, end_time)
+    blocks = [ObservingBlock(t, 55 * u.minute, i) for i, t in enumerate(targets)]
+    scheduler(blocks, schedule)
+
+    trace = DecisionTrace()
+    traced = Schedule(start_time, end_time)
+    blocks = [ObservingBlock(t, 55 * u.minute, i) for i, t in enumerate(targets)]
+    scheduler(blocks, traced, trace=trace)
+    # the trace is only used for that run, and doesn't change the schedule
+    assert not scheduler.trace.enabled
+    assert ([(b.target.name, b.start_time.jd) for b in traced.observing_blocks] ==
+            [(b.target.name, b.start_time.jd) for b in schedule.observing_blocks])
+
+    assert trace.records[0]['event'] == 'run_start'
+    assert trace.records[-1]['event'] == 'run_end'
+    scheduled = trace.events('scheduled')
+    assert [r['target'] for r in scheduled] == [b.target.name for b in traced.observing_blocks]
+    for record in trace.events('constraint'):
+        assert len(record['altitudes']) == 3
+
+
+def test_sequential_scheduler_block_set():
+    config = {'maxtimewithoutcalibration': '30', 'calibrationlength': '5',
+              'maxaltitude': '85', 'minaltitude': '10'}
+    constraints = [AltitudeConstraint(u.Unit('10 deg'), u.Unit('90 deg'))]
+    start_time = Time('2016-02-06 03:00:00')
+    end_time = start_time + 12 * u.hour
+    scheduler = SequentialScheduler(constraints=constraints, observer=apo,
+                                    transitioner=default_transitioner, config=config,
+                                    gap_time=15*u.minute)
+    rows = [(t, i, 50) for i, t in enumerate(targets)]
+    schedule = Schedule(start_time, end_time)
+    scheduler([ObservingBlock.from_exposures(t, p, 1*u.minute, n, 6*u.second)
+               for t, p, n in rows], schedule)
+    block_set = ObservingBlockSet.from_table(rows, 1*u.minute, 6*u.second)
+    from_set = Schedule(start_time, end_time)
+    scheduler(block_set, from_set)
+    assert len(from_set.observing_blocks) > 0
+    assert ([(b.target.name, b.start_time.jd) for b in from_set.observing_blocks] ==
+            [(b.target.name, b.start_time.jd) for b in schedule.observing_blocks])
+    # the blocks passed in are not modified
+    assert all(block.start_time is None for block in block_set)
+
+
+def test_sequential_scheduler_profile():
+    config = {'maxtimewithoutcalibration': '30', 'calibrationlength': '5',
+              'maxaltitude': '85', 'minaltitude': '10'}
+    constraints = [AltitudeConstraint(u.Unit('10 deg'), u.Unit('90 deg'))]
+    start_time = Time('2016-02-06 03:00:00')
+    end_time = start_time + 12 * u.hour
+    blocks = [ObservingBlock(t, 55 * u.minute, i) for i, t in enumerate(targets)]
+
+    scheduler = SequentialScheduler(constraints=constraints, observer=apo,
+                                    transitioner=default_transitioner, config=config,
+                                    gap_time=15*u.minute)
+    schedule = Schedule(start_time, end_time)
+    scheduler(blocks, schedule)
+    assert schedule.stats is None
+
+    scheduler.profile = True
+    profiled = Schedule(start_time, end_time)
+    scheduler(blocks, profiled)
+    assert ([(b.target.name, b.start_time.jd) for b in profiled.observing_blocks] ==
+            [(b.target.name, b.start_time.jd) for b in schedule.observing_blocks])
+    stats = dict(zip(profiled.stats['phase'], profiled.stats['calls']))
+    assert stats['total'] == 1
+    assert stats['insert_slot'] >= len(profiled.observing_blocks)
+    assert stats['constraints'] > 0
+    # the timers are removed after the run
+    assert isinstance(scheduler.transitioner, Transitioner)
+    assert 'insert_slot' not in vars(profiled)
+    assert 'evaluate_constraint' not in vars(scheduler)
+
+
+def test_sequential_scheduler_reschedule():
+    config = {'maxtimewithoutcalibration': '30', 'calibrationlength': '5',
+              'maxaltitude': '85', 'minaltitude': '10'}
+    constraints = [AltitudeConstraint(u.Unit('10 deg'), u.Unit('90 deg'))]
+    start_time = Time('2016-02-06 03:00:00')
+    end_time = start_time + 12 * u.hour
+
+    def scheduled(schedule):
+        return [(b.target.name, b.start_time.jd) for b in schedule.observing_blocks]
+
+    scheduler = SequentialScheduler(constraints=constraints, observer=apo,
+                                    transitioner=default_transitioner, config=config,
+                                    gap_time=15*u.minute, incremental=True)
+    blocks = [ObservingBlock(t, 55 * u.minute, i) for i, t in enumerate(targets)]
+    scheduler(blocks, Schedule(start_time, end_time))
+
+    edits = [[ObservingBlock(t, d * u.minute, i) for i, (t, d) in enumerate(zip(targets, [55, 55, 20]))],
+             [ObservingBlock(t, 55 * u.minute, i) for i, t in enumerate(targets[:2])],
+             [ObservingBlock(t, 55 * u.minute, i) for i, t in enumerate(targets)]]
+    for blocks in edits:
+        trace = DecisionTrace()
+        rescheduled = Schedule(start_time, end_time)
+        scheduler.reschedule(blocks, rescheduled, trace=trace)
+        assert len(trace.events('resume')) == 1
+
+        full = Schedule(start_time, end_time)
+        SequentialScheduler(constraints=constraints, observer=apo,
+                            transitioner=default_transitioner, config=config,
+                            gap_time=15*u.minute)(blocks, full)
+        assert scheduled(rescheduled) == scheduled(full)
+
+    # nothing changed: the whole run is kept
+    scheduler.reschedule(blocks, Schedule(start_time, end_time), trace=trace)
+    resume = trace.events('resume')[-1]
+    assert resume['step'] == resume['steps'] - 1
+
+
+def test_sequential_scheduler_reschedule_calibrators():
+    config = {'maxtimewithoutcalibration': '30', 'calibrationlength': '5',
+              'maxaltitude': '85', 'minaltitude': '10'}
+    constraints = [AltitudeConstraint(u.Unit('10 deg'), u.Unit('90 deg'))]
+    start_time = Time('2016-02-06 03:00:00')
+    end_time = start_time + 12 * u.hour
+    rng = np.random.RandomState(7)
+    sky = [FixedTarget(coord=SkyCoord(ra=ra * u.deg, dec=dec * u.deg), name='t{0}'.format(i))
+           for i, (ra, dec) in enumerate(zip(rng.uniform(0, 360, 12), rng.uniform(0, 80, 12)))]
+    calibrators = [FixedTarget(coord=SkyCoord(ra=ra * u.deg, dec=40 * u.deg), name='c{0}'.format(i))
+                   for i, ra in enumerate(range(0, 360, 60))]
+    kwargs = dict(constraints=constraints, observer=apo, transitioner=default_transitioner,
+                  config=config, calibrators=calibrators)
+
+    def slots(schedule):
+        return [(getattr(getattr(slot.block, 'target', None), 'name', None), slot.start.jd)
+                for slot in schedule.slots]
+
+    durations = [20, 10, 25, 15] * 3
+    priorities = [1, 2, 3] * 4
+    scheduler = SequentialScheduler(incremental=True, **kwargs)
+    scheduler([ObservingBlock(t, d * u.minute, p) for t, d, p in zip(sky, durations, priorities)],
+              Schedule(start_time, end_time))
+
+    # a block resized past the calibration gap, a changed priority, a removed block
+    edits = [(7, 60, None), (4, None, 3), (9, 0, None), (1, 45, None)]
+    for i, duration, priority in edits:
+        if duration is not None:
+            durations[i] = duration
+        if priority is not None:
+            priorities[i] = priority
+        blocks = [ObservingBlock(t, d * u.minute, p)
+                  for t, d, p in zip(sky, durations, priorities) if d > 0]
+        trace = DecisionTrace()
+        rescheduled = Schedule(start_time, end_time)
+        scheduler.reschedule(blocks, rescheduled, trace=trace)
+        assert len(trace.events('resume')) == 1
+
+        full = Schedule(start_time, end_time)
+        SequentialScheduler(**kwargs)(blocks, full)
+        # calibrators and transitions included
+        assert slots(rescheduled) == slots(full)
+
+
 def test_scheduling_target_down():
     lco = Observer.at_site('lco')
     block = [ObservingBlock(FixedTarget.from_name('polaris'), 1 * u.min, 0)]
@@ -266,3 +778,22 @@ def test_scorer():
     scores = scorer.create_score_array(time_resolution=20 * u.minute)
     # the ``global_constraint``: constraint2 should have applied to the blocks
     assert np.array_equal(c2, scores)
+
+
+def test_scorer_grouped_constraints():
+    times = time_grid_from_range(Time(['2016-02-06 00:00', '2016-02-06 08:00']),
+                                 time_resolution=20*u.minute)
+    blocks = [ObservingBlock(t, 1*u.hour, 0, constraints=[AirmassConstraint(max=3)])
+              for t in targets]
+    blocks.append(ObservingBlock(vega, 1*u.hour, 0,
+                                 constraints=[AirmassConstraint(max=2, boolean_constraint=False)]))
+    scorer = Scorer.from_start_end(blocks, apo, Time('2016-02-06 00:00'),
+                                   Time('2016-02-06 08:00'), [AtNightConstraint()])
+    scores = scorer.create_score_array(time_resolution=20*u.minute)
+    night = AtNightConstraint()(apo, vega, times)
+    for block, row in zip(blocks, scores):
+        expected = night * block.constraints[0](apo, block.target, times)
+        assert np.array_equal(expected, row)
+    # chunks of the time axis give the same scores
+    assert np.array_equal(scores, scorer.create_score_array(time_resolution=20*u.minute,
+                                                            chunk_size=7))
@@ -0,0 +1,45 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import os
+
+import numpy as np
+import astropy.units as u
+from astropy.time import Time
+
+from ..trace import DecisionTrace, NullTrace, make_trace
+
+
+def test_make_trace():
+    assert not make_trace(None).enabled
+    assert not make_trace(False)
+    assert isinstance(make_trace(True), DecisionTrace)
+    trace = DecisionTrace()
+    assert make_trace(trace) is trace
+    assert make_trace('trace.jsonl').path == 'trace.jsonl'
+
+    null = NullTrace()
+    null.record('scheduled', target='Vega')
+    assert len(null) == 0
+
+
+def test_trace_dump_load(tmpdir):
+    path = str(tmpdir.join('trace.jsonl'))
+    trace = DecisionTrace(path=path)
+    trace.start_run(start=Time('2016-02-06 03:00:00'), blocks=2)
+    trace.record('constraint', target='Vega', t=np.float64(60.), values=np.array([True, False]),
+                 altitudes=np.array([10.5, 11.]) * u.deg)
+    trace.record('scheduled', target='Vega', start=60., end=3360.)
+    trace.finish_run(scheduled=1)
+    assert os.path.exists(path)
+    assert trace.counts() == {'run_start': 1, 'constraint': 1, 'scheduled': 1, 'run_end': 1}
+
+    loaded = DecisionTrace.load(path)
+    assert len(loaded) == 4
+    assert loaded.run == 1
+    assert loaded.records[0]['start'] == '2016-02-06T03:00:00.000'
+    constraint, = loaded.events('constraint')
+    assert constraint['values'] == [True, False]
+    assert constraint['altitudes'] == [10.5, 11.]
+    assert loaded.events('scheduled')[0]['run'] == 1
@@ -13,7 +13,8 @@ from astropy.utils import iers
 
 from ..utils import (download_IERS_A, IERS_A_in_cache,
                      get_IERS_A_or_workaround, BACKUP_Time_get_delta_ut1_utc,
-                     stride_array, time_grid_from_range)
+                     stride_array, window_sums, time_grid_from_range, IERS_A_in_store,
+                     update_IERS_A_store, load_IERS_A_store, save_IERS_A_store)
 
 from ..exceptions import OldEarthOrientationDataWarning
 
@@ -43,6 +44,54 @@ def test_iers_download(monkeypatch, recwarn):
     nowplusoneyear.ut1
 
 
+def test_iers_store(monkeypatch, tmpdir, recwarn):
+    import os
+    if not os.path.exists(getattr(iers, 'IERS_A_FILE', '')):
+        pytest.skip("no local IERS A file")
+    monkeypatch.setattr(iers.IERS, 'iers_table', None)
+    monkeypatch.setattr(Time, '_get_delta_ut1_utc', BACKUP_Time_get_delta_ut1_utc)
+
+    path = str(tmpdir.join('iers_a.npz'))
+    assert not IERS_A_in_store(path)
+    parsed = update_IERS_A_store(source=iers.IERS_A_FILE, path=path)
+    assert IERS_A_in_store(path)
+    assert iers.IERS.iers_table is parsed
+
+    table = load_IERS_A_store(path, on_stale='ignore')
+    assert isinstance(table, iers.IERS_A)
+    assert table.colnames == parsed.colnames
+    flags = ''.join(parsed['PolPMFlag_A'])
+    assert table.meta['last_observation_mjd'] == parsed['MJD'][flags.index('IP')].value
+    time = Time(table.meta['last_observation_mjd'] - 30, format='mjd')
+    assert table.ut1_utc(time) == parsed.ut1_utc(time)
+    assert np.all(u.Quantity(table.pm_xy(time)) == u.Quantity(parsed.pm_xy(time)))
+
+    recwarn.clear()
+    load_IERS_A_store(path, max_age=0*u.day)
+    recwarn.pop(OldEarthOrientationDataWarning)
+    with pytest.raises(OSError):
+        load_IERS_A_store(path, max_age=0*u.day, on_stale='error')
+    with pytest.raises(ValueError):
+        load_IERS_A_store(path, on_stale='maybe')
+
+
+def test_iers_store_masked_units(tmpdir):
+    # masked columns with units need astropy.utils.masked, new in astropy 4.3
+    Masked = pytest.importorskip('astropy.utils.masked').Masked
+    mjd = np.arange(50000., 50004.)
+    table = iers.IERS_A([u.Quantity(mjd, u.day), ['I', 'I', 'P', 'P'],
+                         Masked(u.Quantity([0.1, 0.2, 0.3, 0.4], u.arcsec),
+                                mask=[False, False, True, True])],
+                        names=['MJD', 'PolPMFlag_A', 'PM_X_B'])
+    path = save_IERS_A_store(table, str(tmpdir.join('iers_a.npz')))
+
+    loaded = load_IERS_A_store(path, on_stale='ignore')
+    assert loaded['PM_X_B'].unit == u.arcsec
+    assert np.all(loaded['PM_X_B'].mask == [False, False, True, True])
+    assert np.all(loaded['PM_X_B'].unmasked == table['PM_X_B'].unmasked)
+    assert loaded.meta['last_observation_mjd'] == 50001.
+
+
 arr10 = np.arange(10)
 
 
@@ -56,6 +105,17 @@ def test_stride_floats():
     stride10by3 = stride_array(arr_float, 3)
 
 
+def test_window_sums():
+    arr = np.array([0.5, 1, 1, 0, 1, 0.25, 1, 1, 1, 0.5])
+    for width in (1, 3, 4, 10):
+        sums, good = window_sums(arr, width)
+        strided = stride_array(arr, width)
+        assert np.array_equal(good, np.all(strided > 0, axis=1))
+        assert np.allclose(sums, np.where(good, strided.sum(axis=1), 0))
+    sums, good = window_sums(arr, 11)
+    assert len(sums) == len(good) == 0
+
+
 def test_time_grid_from_range():
     times2 = ['2010-01-01 00:00:00', '2010-01-01 01:00:10']
     times3 = ['2010-01-01 00:00:00', '2010-01-01 01:00:00',
@@ -0,0 +1,168 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Structured trace of the decisions a scheduler makes.
+
+A scheduler holds a trace and reports each decision to it with
+``trace.record(event, **fields)``: the candidates it looked at, the
+constraint values, why a block was rejected and which one was chosen. The
+default `NullTrace` is disabled, and callers check ``trace.enabled``
+before computing anything only the trace needs, so a run without a trace
+does no extra work. A `DecisionTrace` keeps the records and writes them
+as JSON lines for replay and analysis.
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+# Standard library
+import io
+import json
+from collections import Counter
+
+# Third-party
+import numpy as np
+
+__all__ = ["DecisionTrace", "NullTrace", "make_trace"]
+
+
+def _jsonable(value):
+    """
+    ``json.dump`` fallback for numpy scalars and arrays, quantities and
+    `~astropy.time.Time`.
+    """
+    if hasattr(value, 'isot') and hasattr(value, 'jd1'):
+        return value.isot
+    if hasattr(value, 'unit') and hasattr(value, 'value'):
+        return _jsonable(value.value)
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+class NullTrace(object):
+    """
+    A disabled trace: records nothing.
+    """
+    enabled = False
+
+    def __bool__(self):
+        return False
+
+    __nonzero__ = __bool__
+
+    def __len__(self):
+        return 0
+
+    def record(self, event, **fields):
+        pass
+
+    def start_run(self, **fields):
+        pass
+
+    def finish_run(self, **fields):
+        pass
+
+
+class DecisionTrace(NullTrace):
+    """
+    A trace that keeps every record as a dict with an ``event`` key.
+
+    Records are kept in memory, and written to ``path`` as JSON lines at the
+    end of every run if a path is given.
+    """
+    enabled = True
+
+    def __init__(self, path=None, echo=False):
+        """
+        Parameters
+        ----------
+        path : str or None
+            JSON lines file the records are written to when a run finishes.
+        echo : bool
+            Also print every record as it is made, like the scheduler's old
+            ``print`` output.
+        """
+        self.path = path
+        self.echo = echo
+        self.records = []
+        self.run = 0
+
+    def __bool__(self):
+        return True
+
+    __nonzero__ = __bool__
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __repr__(self):
+        return '<DecisionTrace: {0} records in {1} runs>'.format(len(self.records), self.run)
+
+    def record(self, event, **fields):
+        """
+        Add a record of ``event`` (e.g. ``'scheduled'``) with ``fields``.
+        """
+        fields['event'] = event
+        fields['run'] = self.run
+        self.records.append(fields)
+        if self.echo:
+            print(event, ' '.join('{0}={1}'.format(key, value) for key, value in
+                                  sorted(fields.items()) if key not in ('event', 'run')))
+
+    def start_run(self, **fields):
+        """Start a new run, numbering its records separately."""
+        self.run += 1
+        self.record('run_start', **fields)
+
+    def finish_run(self, **fields):
+        """End the current run, writing the records to ``path`` if set."""
+        self.record('run_end', **fields)
+        if self.path is not None:
+            self.dump(self.path)
+
+    def events(self, event):
+        """The records of one kind of ``event``."""
+        return [record for record in self.records if record['event'] == event]
+
+    def counts(self):
+        """Number of records of every event."""
+        return dict(Counter(record['event'] for record in self.records))
+
+    def dump(self, path):
+        """
+        Write all records to ``path``, one JSON object per line.
+        """
+        with io.open(path, 'w', encoding='utf-8') as outfile:
+            for record in self.records:
+                outfile.write(json.dumps(record, default=_jsonable, sort_keys=True))
+                outfile.write('\n')
+
+    @classmethod
+    def load(cls, path):
+        """
+        A trace with the records read from a JSON lines file.
+        """
+        trace = cls()
+        with io.open(path, encoding='utf-8') as infile:
+            trace.records = [json.loads(line) for line in infile if line.strip()]
+        trace.run = max([record.get('run', 0) for record in trace.records] + [0])
+        return trace
+
+
+def make_trace(trace):
+    """
+    A trace from the ``trace`` argument of a scheduler: `None` or `False`
+    disables it, `True` keeps records in memory, a string is the path of a
+    JSON lines file, and a trace object is used as it is.
+    """
+    if trace is None or trace is False:
+        return NullTrace()
+    if trace is True:
+        return DecisionTrace()
+    if isinstance(trace, NullTrace):
+        return trace
+    return DecisionTrace(path=trace)
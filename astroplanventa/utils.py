@@ -3,6 +3,8 @@ from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
 
 # Standard library
+import os
+import json
 import warnings
 
 # Third-party
@@ -13,13 +15,16 @@ from astropy.time import Time
 import astropy.units as u
 from astropy.utils.data import _get_download_cache_locs, CacheMissingWarning
 from astropy.coordinates import EarthLocation
+from astropy.utils.exceptions import AstropyWarning
 
 # Package
 from .exceptions import OldEarthOrientationDataWarning
 
 __all__ = ["get_IERS_A_or_workaround", "download_IERS_A",
+           "IERS_A_in_store", "IERS_A_store_path", "save_IERS_A_store",
+           "load_IERS_A_store", "update_IERS_A_store",
            "time_grid_from_range", "_set_mpl_style_sheet",
-           "stride_array"]
+           "stride_array", "window_sums"]
 
 IERS_A_WARNING = ("For best precision (on the order of arcseconds), you must "
                   "download an up-to-date IERS Bulletin A table. To do so, run:"
@@ -48,13 +53,16 @@ def _low_precision_utc_to_ut1(self, jd1, jd2):
 
 def get_IERS_A_or_workaround():
     """
-    Get the cached IERS Bulletin A table if one exists. If one does not exist,
-    monkey patch `~astropy.time.Time._get_delta_ut1_utc` so that
-    `~astropy.time.Time` objects don't raise errors by computing UT1-UTC off
-    the end of the IERS table.
+    Get the preparsed or cached IERS Bulletin A table if one exists. If one
+    does not exist, monkey patch `~astropy.time.Time._get_delta_ut1_utc` so
+    that `~astropy.time.Time` objects don't raise errors by computing UT1-UTC
+    off the end of the IERS table.
+
+    The preparsed store (see `update_IERS_A_store`) is tried first, it loads
+    in milliseconds and never touches the network.
     """
-    if IERS_A_in_cache():
-        iers.IERS.iers_table = _get_IERS_A_table()
+    if IERS_A_in_store() or IERS_A_in_cache():
+        _install_IERS_A(_get_IERS_A_table())
     else:
         Time._get_delta_ut1_utc = _low_precision_utc_to_ut1
 
@@ -80,39 +88,81 @@ def IERS_A_in_cache():
     return False
 
 
+def _last_observation_mjd(table):
+    """
+    MJD of the last observed (rather than predicted) polar motion in an IERS
+    Bulletin A ``table``.
+    """
+    # Use polar motion flag to identify last observation before predictions
+    flags = np.asarray(table['PolPMFlag_A'])
+    index_of_last_observation = np.flatnonzero((flags[:-1] == 'I') &
+                                               (flags[1:] == 'P'))[0]
+    return float(u.Quantity(table['MJD'][index_of_last_observation], u.day).value)
+
+
+def _check_IERS_A_age(last_observation_mjd, max_age=14*u.day, on_stale='warn'):
+    """
+    Apply the staleness policy ``on_stale`` (``'warn'``, ``'error'`` or
+    ``'ignore'``) if the last observation is more than ``max_age`` old.
+    """
+    if on_stale not in ('warn', 'error', 'ignore'):
+        raise ValueError("on_stale must be 'warn', 'error' or 'ignore', "
+                         "got {0!r}".format(on_stale))
+    time_since_last_update = Time.now() - Time(last_observation_mjd, format='mjd')
+
+    # If the IERS bulletin is more than `max_age` days old, warn user
+    if on_stale != 'ignore' and max_age < time_since_last_update:
+        msg = ("Your version of the IERS Bulletin A is {:.1f} days "
+               "old. ".format(time_since_last_update.to(u.day).value) +
+               IERS_A_WARNING)
+        if on_stale == 'error':
+            raise OSError(msg)
+        warnings.warn(msg, OldEarthOrientationDataWarning)
+
+
 def _get_IERS_A_table(warn_update=14*u.day):
     """
-    Grab the locally cached copy of the IERS Bulletin A table. Check to see
+    Grab the locally stored copy of the IERS Bulletin A table. Check to see
     if it's up to date, and warn the user if it is not.
 
+    The preparsed store is used if there is one. Otherwise the table is
+    parsed from the astropy download cache and saved to the store, so that
+    the next call doesn't parse it again.
+
     This will fail and raise OSError if the file is not in the cache.
     """
+    if IERS_A_in_store():
+        return load_IERS_A_store(max_age=warn_update)
     if IERS_A_in_cache():
         table = iers.IERS_Auto.open()
-        # Use polar motion flag to identify last observation before predictions
-        index_of_last_observation = ''.join(table['PolPMFlag_A']).index('IP')
-        time_of_last_observation = Time(table['MJD'][index_of_last_observation],
-                                        format='mjd')
-        time_since_last_update = Time.now() - time_of_last_observation
-
-        # If the IERS bulletin is more than `warn_update` days old, warn user
-        if warn_update < time_since_last_update:
-            warnmsg = ("Your version of the IERS Bulletin A is {:.1f} days "
-                       "old. ".format(time_since_last_update.to(u.day).value) +
-                       IERS_A_WARNING)
-            warnings.warn(warnmsg, OldEarthOrientationDataWarning)
+        last_observation_mjd = _last_observation_mjd(table)
+        try:
+            save_IERS_A_store(table)
+        except (IOError, OSError) as e:
+            warnings.warn("Could not save the IERS A store: {0}".format(e),
+                          AstropyWarning)
+        _check_IERS_A_age(last_observation_mjd, warn_update)
         return table
     else:
         raise OSError("No IERS A table has been downloaded.")
 
 
+def _install_IERS_A(table):
+    """
+    Make ``table`` the IERS table used by `~astropy.time.Time`, undoing the
+    monkey patch set up by `~astroplan.get_IERS_A_or_workaround`.
+    """
+    iers.IERS.iers_table = table
+    Time._get_delta_ut1_utc = BACKUP_Time_get_delta_ut1_utc
+
+
 def download_IERS_A(show_progress=True):
     """
     Download and cache the IERS Bulletin A table.
 
     If one is already cached, download a new one and overwrite the old. Store
-    table in the astropy cache, and undo the monkey patching done by
-    `~astroplan.get_IERS_A_or_workaround`.
+    table in the astropy cache and in the preparsed IERS A store, and undo
+    the monkey patching done by `~astroplan.get_IERS_A_or_workaround`.
 
     Parameters
     ----------
@@ -124,9 +174,172 @@ def download_IERS_A(show_progress=True):
 
     local_iers_a_path = download_file(iers.IERS_A_URL, cache=True,
                                       show_progress=show_progress)
-    # Undo monkey patch set up by get_IERS_A_or_workaround
-    iers.IERS.iers_table = iers.IERS_A.open(local_iers_a_path)
-    Time._get_delta_ut1_utc = BACKUP_Time_get_delta_ut1_utc
+    table = iers.IERS_A.open(local_iers_a_path)
+    _install_IERS_A(table)
+    save_IERS_A_store(table)
+
+
+def IERS_A_store_path():
+    """
+    Path of the preparsed IERS Bulletin A store.
+
+    ``iers_a.npz`` in the ``astroplan`` subdirectory of the astropy cache
+    directory, unless the ``ASTROPLAN_IERS_A_STORE`` environment variable
+    gives another path.
+    """
+    path = os.environ.get('ASTROPLAN_IERS_A_STORE')
+    if path:
+        return path
+    from astropy.config.paths import get_cache_dir
+    return os.path.join(get_cache_dir(), 'astroplan', 'iers_a.npz')
+
+
+def IERS_A_in_store(path=None):
+    """
+    Check if a preparsed IERS Bulletin A store exists.
+    """
+    return os.path.exists(IERS_A_store_path() if path is None else path)
+
+
+def save_IERS_A_store(table, path=None):
+    """
+    Save a parsed IERS Bulletin A ``table`` as a binary ``.npz`` store.
+
+    Every column is saved as a plain array, with its unit and mask kept in a
+    small JSON header along with the time of the last observation, so
+    loading the store needs no text parsing.
+
+    Parameters
+    ----------
+    table : `~astropy.utils.iers.IERS_A`
+        The table, e.g. from `~astropy.utils.iers.IERS_A.open`.
+    path : str or None
+        Where to save it, defaults to `IERS_A_store_path`.
+
+    Returns
+    -------
+    path : str
+    """
+    path = IERS_A_store_path() if path is None else path
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    arrays = {}
+    units = {}
+    for name in table.colnames:
+        column = table[name]
+        mask = getattr(column, 'mask', None)
+        if mask is not None and np.any(mask):
+            arrays['mask:' + name] = np.asarray(mask)
+        if getattr(column, 'unit', None) is not None:
+            units[name] = column.unit.to_string()
+        arrays['col:' + name] = np.asarray(getattr(column, 'value', column))
+    header = dict(names=list(table.colnames), units=units,
+                  last_observation_mjd=_last_observation_mjd(table),
+                  saved_mjd=Time.now().mjd,
+                  source=str(table.meta.get('data_path', '')))
+    arrays['header'] = np.array(json.dumps(header))
+
+    # write next to the store and rename, so readers never see half a file
+    tmp_path = path + '.tmp.npz'
+    np.savez(tmp_path, **arrays)
+    try:
+        os.replace(tmp_path, path)
+    except AttributeError:  # Python 2
+        if os.path.exists(path):
+            os.remove(path)
+        os.rename(tmp_path, path)
+    return path
+
+
+def _masked_quantity(quantity, mask):
+    """
+    ``quantity`` with ``mask``, as a column of an `~astropy.table.QTable`
+    that keeps both.
+    """
+    try:
+        from astropy.utils.masked import Masked
+    except ImportError:  # astropy < 5
+        from astropy.table import MaskedColumn
+        return MaskedColumn(quantity.value, unit=quantity.unit, mask=mask)
+    return Masked(quantity, mask=mask)
+
+
+def load_IERS_A_store(path=None, max_age=14*u.day, on_stale='warn'):
+    """
+    Load the preparsed IERS Bulletin A store.
+
+    Parameters
+    ----------
+    path : str or None
+        The store, defaults to `IERS_A_store_path`.
+    max_age : `~astropy.units.Quantity`
+        Age of the last observation in the bulletin above which it is
+        considered stale.
+    on_stale : {'warn', 'error', 'ignore'}
+        What to do with a stale bulletin: warn with
+        `~astroplan.OldEarthOrientationDataWarning`, raise `OSError`, or
+        nothing.
+
+    Returns
+    -------
+    table : `~astropy.utils.iers.IERS_A`
+        With ``last_observation_mjd`` and ``saved_mjd`` in its ``meta``.
+    """
+    from astropy.table import MaskedColumn
+
+    path = IERS_A_store_path() if path is None else path
+    with np.load(path, allow_pickle=False) as data:
+        header = json.loads(str(data['header']))
+        columns = []
+        for name in header['names']:
+            value = data['col:' + name]
+            mask = data['mask:' + name] if 'mask:' + name in data else None
+            if name in header['units']:
+                value = u.Quantity(value, header['units'][name], copy=False)
+                if mask is not None:
+                    value = _masked_quantity(value, mask)
+                columns.append(value)
+            elif mask is not None:
+                columns.append(MaskedColumn(value, mask=mask))
+            else:
+                columns.append(value)
+    table = iers.IERS_A(columns, names=header['names'])
+    table.meta.update(last_observation_mjd=header['last_observation_mjd'],
+                      saved_mjd=header['saved_mjd'], data_path=header['source'])
+    _check_IERS_A_age(header['last_observation_mjd'], max_age, on_stale)
+    return table
+
+
+def update_IERS_A_store(source=None, path=None, show_progress=True):
+    """
+    Rewrite the preparsed IERS Bulletin A store and start using it.
+
+    Parameters
+    ----------
+    source : str or None
+        A local copy of the bulletin (``finals2000A.all``), for sites
+        without internet access. If `None` it is downloaded, see
+        `download_IERS_A`.
+    path : str or None
+        The store, defaults to `IERS_A_store_path`.
+    show_progress : bool
+        `True` shows a progress bar during the download.
+
+    Returns
+    -------
+    table : `~astropy.utils.iers.IERS_A`
+    """
+    if source is None:
+        if IERS_A_in_cache():
+            clear_download_cache(iers.IERS_A_URL)
+        source = download_file(iers.IERS_A_URL, cache=True,
+                               show_progress=show_progress)
+    table = iers.IERS_A.open(source)
+    _install_IERS_A(table)
+    save_IERS_A_store(table, path)
+    return table
 
 
 @u.quantity_input(time_resolution=u.hour)
@@ -241,6 +454,46 @@ def stride_array(arr, window_width):
     return strided_arr
 
 
+def window_sums(arr, window_width, threshold=0.):
+    """
+    Sums of all sequential subarrays of arr with length = window_width, and
+    whether all elements of each are above ``threshold``.
+
+    The same windows as `stride_array`, but from cumulative sums, so it takes
+    O(n) instead of O(n * window_width).
+
+    Parameters
+    ----------
+    arr : array-like (length = n)
+        Values to sum
+
+    window_width : int
+        Number of elements in each window
+
+    threshold : float
+        Value that all elements of a window have to be greater than
+
+    Returns
+    -------
+    sums : array (length = n-window_width+1)
+        Sum of each window, zero for windows that aren't all above ``threshold``
+
+    good : array of bool (length = n-window_width+1)
+        Whether all elements of each window are above ``threshold``
+    """
+    arr = np.asarray(arr, dtype=float)
+    n_windows = max(len(arr) - window_width + 1, 0)
+    if n_windows == 0:
+        return np.zeros(0), np.zeros(0, dtype=bool)
+    bad = np.concatenate(([0], np.cumsum(~(arr > threshold))))
+    good = (bad[window_width:] - bad[:n_windows]) == 0
+    # only sum the good elements, so that the windows can't pick up
+    # rounding errors from large values elsewhere
+    total = np.concatenate(([0.], np.cumsum(np.where(arr > threshold, arr, 0.))))
+    sums = np.where(good, total[window_width:] - total[:n_windows], 0.)
+    return sums, good
+
+
 class EarthLocation_mock(EarthLocation):
     """
     Mock the EarthLocation class if no remote data for locations commonly
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark of the constraint cache keys.
+
+Compares the time it takes to build and hash the key made by
+``astroplanventa.constraints._make_cache_key`` with the previous key, which
+held every time and target longitude as a Python float.
+
+    python benchmarks/bench_cache_keys.py
+"""
+from __future__ import print_function
+
+import sys, os
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+import timeit
+
+import numpy as np
+import astropy.units as u
+from astropy.time import Time
+from astropy.coordinates import SkyCoord
+
+from astroplanventa.constraints import _make_cache_key
+
+
+def tuple_cache_key(times, targets):
+    """The previous key: a tuple of all time and longitude values."""
+    try:
+        timekey = tuple(times.jd) + times.shape
+    except BaseException:        # must be scalar
+        timekey = (times.jd,)
+    try:
+        if hasattr(targets, 'frame'):
+            targkey = tuple(targets.frame.data.lon.value.ravel()) + targets.shape
+        else:
+            targkey = (targets,)
+    except BaseException:
+        targkey = (targets.frame.data.lon,)
+    return timekey + targkey
+
+
+def make_case(n_times, n_targets, step=1*u.min):
+    times = Time('2018-03-01 00:00') + np.arange(n_times) * step
+    rng = np.random.RandomState(0)
+    targets = SkyCoord(rng.uniform(0, 360, n_targets) * u.deg,
+                       rng.uniform(-30, 90, n_targets) * u.deg)
+    if n_targets > 1:
+        targets = targets[:, np.newaxis]
+    return times, targets
+
+
+CASES = [
+    ("scheduler lookup, 3 times x 1 target", 3, 1),
+    ("one night, 1 min grid x 100 targets", 12 * 60, 100),
+    ("one week, 1 min grid x 100 targets", 7 * 24 * 60, 100),
+]
+
+
+def main(repeat=5):
+    print("{0:<42} {1:>12} {2:>12} {3:>8}".format("case", "tuple [ms]", "digest [ms]", "speedup"))
+    for name, n_times, n_targets in CASES:
+        times, targets = make_case(n_times, n_targets)
+        number = max(1, 20000 // (n_times + n_targets))
+        results = []
+        for make_key in (tuple_cache_key, _make_cache_key):
+            timer = timeit.Timer(lambda: hash(make_key(times, targets)))
+            results.append(min(timer.repeat(repeat, number)) / number * 1e3)
+        print("{0:<42} {1:>12.4f} {2:>12.4f} {3:>7.1f}x".format(
+            name, results[0], results[1], results[0] / results[1]))
+
+
+if __name__ == '__main__':
+    main()
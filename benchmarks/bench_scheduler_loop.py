@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the SequentialScheduler main loop on a 24 h, 50 target plan.
+
+The ephemeris table is built (and the IERS tables loaded) before timing, so
+the reported times cover only the scheduling loop. The first table compares
+the per-step time arithmetic the loop used to do on `~astropy.time.Time` and
+`~astropy.units.Quantity` objects with the float seconds it does now.
+
+    python benchmarks/bench_scheduler_loop.py [--calibration]
+"""
+from __future__ import print_function
+
+import sys, os
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+import io
+import timeit
+import argparse
+import contextlib
+
+import numpy as np
+import astropy.units as u
+from astropy.time import Time
+from astropy.coordinates import SkyCoord, EarthLocation
+
+from astroplanventa import Observer, FixedTarget, ObservingBlock
+from astroplanventa.constraints import AltitudeConstraint
+from astroplanventa.scheduling import Transitioner, Schedule, SequentialScheduler
+
+START = Time('2019-09-15 12:00:00')
+HOURS = 24
+N_TARGETS = 50
+
+
+def time_kernels(number=2000):
+    start = START
+    end = START + HOURS * u.hour
+    gap = 5 * u.min
+    duration = 20 * u.min
+    current = start + 1 * u.hour
+
+    def quantity_step():
+        t = current + gap
+        (t + duration < end)
+        (t - start).to_datetime().seconds / 60
+
+    start_s, end_s, gap_s, duration_s, current_s = 0., HOURS * 3600., 300., 1200., 3600.
+
+    def float_step():
+        t = current_s + gap_s
+        (t + duration_s < end_s)
+        int(t - start_s) / 60
+
+    print("{0:<30} {1:>12}".format("one loop step", "time [us]"))
+    for name, step in (("Time/Quantity", quantity_step), ("float seconds", float_step)):
+        print("{0:<30} {1:>12.2f}".format(
+            name, min(timeit.repeat(step, number=number, repeat=3)) / number * 1e6))
+
+
+def make_plan(calibration):
+    location = EarthLocation(lat=57.5535171694 * u.deg, lon=21.8545525000 * u.deg,
+                             height=87.30 * u.m)
+    observer = Observer(location=location, name="Irbene", timezone="Europe/Riga")
+    rng = np.random.RandomState(1)
+    targets = [FixedTarget(SkyCoord(ra=rng.uniform(0, 360) * u.deg,
+                                    dec=rng.uniform(-10, 80) * u.deg), name='t%d' % i)
+               for i in range(N_TARGETS)]
+    blocks = [ObservingBlock.from_exposures(t, 1 + i % 3, 60 * u.s, 5 + 7 * (i % 4), 1 * u.s)
+              for i, t in enumerate(targets)]
+    calibrators = None
+    if calibration:
+        calibrators = [FixedTarget(SkyCoord(ra=ra * u.deg, dec=dec * u.deg), name='c%d' % i)
+                       for i, (ra, dec) in enumerate(zip(np.linspace(0, 330, 12),
+                                                         np.linspace(10, 70, 12)))]
+    config = {'maxtimewithoutcalibration': '30', 'calibrationlength': '5',
+              'maxaltitude': '85', 'minaltitude': '10'}
+    scheduler = SequentialScheduler(constraints=[AltitudeConstraint('10' * u.deg, '85' * u.deg)],
+                                    observer=observer,
+                                    transitioner=Transitioner(2 * u.deg / u.second),
+                                    calibrators=calibrators, config=config)
+    return scheduler, blocks
+
+
+def time_loop(calibration, repeat=3):
+    best = None
+    for i in range(repeat):
+        scheduler, blocks = make_plan(calibration)
+        schedule = Schedule(START, START + HOURS * u.hour)
+        scheduler.schedule = schedule
+        scheduler.prepare_ephemeris(blocks)
+        t0 = timeit.default_timer()
+        with contextlib.redirect_stdout(io.StringIO()):
+            scheduler(blocks, schedule)
+        elapsed = timeit.default_timer() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    print("{0} h, {1} targets{2}: {3:.2f} s, {4} blocks scheduled".format(
+        HOURS, N_TARGETS, " with calibrators" if calibration else "", best,
+        len(schedule.observing_blocks)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--calibration', action='store_true',
+                        help='insert calibrators between observations')
+    args = parser.parse_args()
+    time_kernels()
+    time_loop(args.calibration)
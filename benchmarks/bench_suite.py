@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark suite of the schedulers over a matrix of synthetic plans.
+
+Every case schedules a synthetic catalog of targets spread over the sky
+visible from Irbene, with the scans per observation the maser programme
+uses, and records the wall time, the peak memory and the hit rates of the
+observer cache. The matrix covers catalog size, number of calibrators (none
+means calibration off), window length and scheduler. Each case runs in a
+fresh process, so memory and caches don't carry over from the one before.
+
+Runs are offline: the site and target lookups are mocked and the IERS
+table comes from the local store or cache, or the low precision workaround
+(see `astroplanventa.utils`).
+
+Results are saved as JSON, and compared case by case with a saved baseline:
+
+    python benchmarks/bench_suite.py                         # quick matrix
+    python benchmarks/bench_suite.py --preset full --output benchmarks/baseline.json
+    python benchmarks/bench_suite.py --targets 100 500 --hours 24 --baseline benchmarks/baseline.json
+    python benchmarks/bench_suite.py --compare old.json new.json
+"""
+from __future__ import print_function
+
+import sys, os
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+import json
+import timeit
+import argparse
+import datetime
+import platform
+import itertools
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:     # Windows
+    resource = None
+
+import numpy as np
+import astropy
+import astropy.units as u
+from astropy.time import Time
+from astropy.utils import iers
+from astropy.coordinates import SkyCoord, EarthLocation
+
+from astroplanventa import Observer, FixedTarget, ObservingBlock
+from astroplanventa.cache import get_observer_cache
+from astroplanventa.constraints import AltitudeConstraint
+from astroplanventa.scheduling import (Transitioner, Schedule, SequentialScheduler,
+                                       PriorityScheduler)
+from astroplanventa.utils import _mock_remote_data, get_IERS_A_or_workaround
+
+START = Time('2019-09-15 16:00:00')
+
+# as in code/weekplanner.py
+READ_OUT = 1 * u.second
+TARGET_EXP = 60 * u.second
+SLEW_RATE = 2 * u.deg / u.second
+CONFIG = {'maxtimewithoutcalibration': '30', 'calibrationlength': '5',
+          'maxaltitude': '85', 'minaltitude': '10'}
+
+# scans per observation and how often they occur in the maser catalog
+SCANS_PER_OBS = [5, 10, 15, 20, 30, 40]
+SCANS_WEIGHTS = [0.35, 0.25, 0.15, 0.1, 0.1, 0.05]
+# the lowest declination that rises above minaltitude at Irbene
+MIN_DEC = -20
+
+SCHEDULERS = {'sequential': SequentialScheduler, 'priority': PriorityScheduler}
+
+PRESETS = {
+    'quick': dict(targets=[10, 50], calibrators=[0, 10], hours=[1, 12],
+                  schedulers=['sequential', 'priority']),
+    'full': dict(targets=[10, 50, 200, 1000, 5000], calibrators=[0, 10, 30],
+                 hours=[1, 12, 24, 72, 168], schedulers=['sequential', 'priority']),
+}
+
+
+def offline():
+    """Mock the site and name lookups and keep astropy from downloading IERS tables."""
+    iers.conf.auto_download = False
+    _mock_remote_data()
+    get_IERS_A_or_workaround()
+
+
+def irbene():
+    location = EarthLocation(lat=57.5535171694 * u.deg, lon=21.8545525000 * u.deg,
+                             height=87.30 * u.m)
+    return Observer(location=location, name="Irbene", timezone="Europe/Riga")
+
+
+def make_catalog(n_targets, seed=0):
+    """
+    ``n_targets`` observing blocks of targets uniform on the sky above
+    `MIN_DEC`, with priorities 1-5 and scans per observation drawn from
+    `SCANS_PER_OBS`.
+    """
+    rng = np.random.RandomState(seed)
+    ra = rng.uniform(0, 360, n_targets)
+    dec = np.degrees(np.arcsin(rng.uniform(np.sin(np.radians(MIN_DEC)), 1, n_targets)))
+    scans = rng.choice(SCANS_PER_OBS, n_targets, p=SCANS_WEIGHTS)
+    priorities = rng.randint(1, 6, n_targets)
+    coords = SkyCoord(ra=ra * u.deg, dec=dec * u.deg)
+    return [ObservingBlock.from_exposures(FixedTarget(coords[i], name='t%d' % i), int(priorities[i]),
+                                          TARGET_EXP, int(scans[i]), READ_OUT)
+            for i in range(n_targets)]
+
+
+def make_calibrators(n_calibrators):
+    """``n_calibrators`` calibrators spread evenly in RA at declinations 10-70 deg."""
+    ra = np.linspace(0, 360, n_calibrators, endpoint=False)
+    dec = 10 + 60 * ((np.arange(n_calibrators) * 0.618) % 1)
+    return [FixedTarget(SkyCoord(ra=ra[i] * u.deg, dec=dec[i] * u.deg), name='c%d' % i)
+            for i in range(n_calibrators)]
+
+
+def make_cases(targets, calibrators, hours, schedulers):
+    """
+    Every combination of the parameters. `PriorityScheduler` doesn't
+    calibrate, so it only gets the cases without calibrators.
+    """
+    cases = []
+    for scheduler, n_targets, n_calibrators, n_hours in itertools.product(
+            schedulers, targets, calibrators, hours):
+        if scheduler != 'sequential' and n_calibrators:
+            continue
+        cases.append(dict(scheduler=scheduler, targets=n_targets,
+                          calibrators=n_calibrators, hours=n_hours))
+    return cases
+
+
+def case_id(case):
+    return '{scheduler}-t{targets}-c{calibrators}-w{hours:g}h'.format(**case)
+
+
+def _max_rss_mb():
+    """Peak resident memory of this process in MB."""
+    if resource is None:
+        return float('nan')
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss / 2.**20 if sys.platform == 'darwin' else rss / 1024.
+
+
+def cache_stats(cache):
+    """Hits, misses and hit rate of every namespace of an `ObserverCache`, and in total."""
+    stats = {}
+    hits = misses = 0
+    for namespace, info in cache.info().items():
+        lookups = info['hits'] + info['misses']
+        stats[namespace] = dict(hits=info['hits'], misses=info['misses'],
+                                hit_rate=info['hits'] / lookups if lookups else None)
+        hits += info['hits']
+        misses += info['misses']
+    stats['total'] = dict(hits=hits, misses=misses,
+                          hit_rate=hits / (hits + misses) if hits + misses else None)
+    return stats
+
+
+def run_case(case):
+    """
+    Schedule one case of the matrix and measure it.
+
+    Returns
+    -------
+    result : dict
+        The case, with ``wall_s``, ``peak_rss_mb``, ``rss_growth_mb``,
+        ``scheduled`` and ``cache``, and ``error`` if the scheduler raised.
+    """
+    offline()
+    observer = irbene()
+    blocks = make_catalog(case['targets'])
+    constraints = [AltitudeConstraint(CONFIG['minaltitude'] * u.deg, CONFIG['maxaltitude'] * u.deg)]
+    transitioner = Transitioner(SLEW_RATE, {'filter': {'default': 5 * u.second}})
+    if case['scheduler'] == 'sequential':
+        scheduler = SequentialScheduler(constraints=constraints, observer=observer,
+                                        transitioner=transitioner, config=CONFIG,
+                                        calibrators=make_calibrators(case['calibrators']) or None)
+    else:
+        scheduler = SCHEDULERS[case['scheduler']](constraints=constraints, observer=observer,
+                                                  transitioner=transitioner,
+                                                  time_resolution=1 * u.min)
+    schedule = Schedule(START, START + case['hours'] * u.hour)
+    cache = get_observer_cache(observer)
+    cache.reset_stats()
+
+    result = dict(case, id=case_id(case), calibration=bool(case['calibrators']), error=None)
+    rss_before = _max_rss_mb()
+    t0 = timeit.default_timer()
+    try:
+        scheduler(blocks, schedule)
+    except Exception as e:
+        result['error'] = '{0}: {1}'.format(type(e).__name__, e)
+    result['wall_s'] = timeit.default_timer() - t0
+    result['peak_rss_mb'] = _max_rss_mb()
+    result['rss_growth_mb'] = max(0., result['peak_rss_mb'] - rss_before)
+    result['scheduled'] = len(schedule.observing_blocks)
+    result['cache'] = cache_stats(cache)
+    return result
+
+
+def _run_isolated(case):
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        return executor.submit(run_case, case).result()
+
+
+def run_suite(cases, repeat=1, isolate=True):
+    """
+    Run every case ``repeat`` times, keeping the fastest run of each.
+    """
+    results = []
+    print("{0:<36} {1:>9} {2:>10} {3:>9} {4:>9}".format(
+        "case", "wall [s]", "peak [MB]", "hit rate", "scheduled"))
+    for case in cases:
+        runs = [_run_isolated(case) if isolate else run_case(case) for i in range(repeat)]
+        result = min(runs, key=lambda run: run['wall_s'])
+        results.append(result)
+        hit_rate = result['cache']['total']['hit_rate']
+        print("{0:<36} {1:>9.3f} {2:>10.1f} {3:>9} {4:>9}{5}".format(
+            result['id'], result['wall_s'], result['peak_rss_mb'],
+            '-' if hit_rate is None else '{0:.1%}'.format(hit_rate), result['scheduled'],
+            '' if result['error'] is None else '  ' + result['error']))
+        sys.stdout.flush()
+    return results
+
+
+def metadata():
+    """Versions, machine and commit the results were measured on."""
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                         cwd=os.path.dirname(os.path.abspath(__file__)),
+                                         stderr=subprocess.STDOUT).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return dict(date=datetime.datetime.now().isoformat(), commit=commit,
+                python=platform.python_version(), numpy=np.__version__,
+                astropy=astropy.__version__, platform=platform.platform(),
+                cpus=os.cpu_count())
+
+
+def save(results, path, **meta):
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+    with open(path, 'w') as outfile:
+        json.dump(dict(meta=dict(metadata(), **meta), results=results), outfile, indent=1)
+
+
+def load(path):
+    with open(path) as infile:
+        return json.load(infile)
+
+
+def compare(baseline, current, tolerance=0.2):
+    """
+    Print the wall time and peak memory of the cases in both ``baseline``
+    and ``current`` (saved results), marking wall times that changed by more
+    than ``tolerance``.
+
+    Returns
+    -------
+    regressions : list of str
+        Ids of the cases that got slower, or that fail now and didn't before.
+    """
+    before = dict((result['id'], result) for result in baseline['results'])
+    print("baseline {0} ({1}), now {2} ({3})".format(
+        baseline['meta'].get('commit'), baseline['meta'].get('date'),
+        current['meta'].get('commit'), current['meta'].get('date')))
+    print("{0:<36} {1:>9} {2:>9} {3:>7} {4:>9} {5:>9}".format(
+        "case", "base [s]", "now [s]", "ratio", "base [MB]", "now [MB]"))
+    regressions = []
+    for result in current['results']:
+        base = before.get(result['id'])
+        if base is None:
+            continue
+        ratio = result['wall_s'] / base['wall_s'] if base['wall_s'] else float('inf')
+        if result['error'] and not base['error']:
+            status = '  now fails: ' + result['error']
+            regressions.append(result['id'])
+        elif ratio > 1 + tolerance:
+            status = '  slower'
+            regressions.append(result['id'])
+        elif ratio < 1 / (1 + tolerance):
+            status = '  faster'
+        else:
+            status = ''
+        print("{0:<36} {1:>9.3f} {2:>9.3f} {3:>6.2f}x {4:>9.1f} {5:>9.1f}{6}".format(
+            result['id'], base['wall_s'], result['wall_s'], ratio,
+            base['peak_rss_mb'], result['peak_rss_mb'], status))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='quick',
+                        help='matrix to run (default: %(default)s)')
+    parser.add_argument('--targets', type=int, nargs='+', help='catalog sizes')
+    parser.add_argument('--calibrators', type=int, nargs='+',
+                        help='numbers of calibrators, 0 is calibration off')
+    parser.add_argument('--hours', type=float, nargs='+', help='window lengths in hours')
+    parser.add_argument('--schedulers', nargs='+', choices=sorted(SCHEDULERS))
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='runs of every case, the fastest is kept (default: %(default)s)')
+    parser.add_argument('--in-process', action='store_true',
+                        help="don't start a fresh process for every case")
+    parser.add_argument('--output', help='save the results to this JSON file')
+    parser.add_argument('--baseline', help='compare the results with this JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='relative wall time change reported as a regression (default: %(default)s)')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'RESULTS'),
+                        help='compare two saved results without running anything')
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        return 1 if compare(load(args.compare[0]), load(args.compare[1]), args.tolerance) else 0
+
+    matrix = dict(PRESETS[args.preset])
+    for key in matrix:
+        if getattr(args, key) is not None:
+            matrix[key] = getattr(args, key)
+    results = run_suite(make_cases(**matrix), repeat=args.repeat, isolate=not args.in_process)
+    current = dict(meta=dict(metadata(), matrix=matrix), results=results)
+    if args.output:
+        save(results, args.output, matrix=matrix)
+        print("Saved", args.output)
+    if args.baseline:
+        print()
+        return 1 if compare(load(args.baseline), current, args.tolerance) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""
+
+batch.py planotaja palaisana bez GUI, piemeram no cron
+
+    python code/batch.py test.json --session "2019-09-15 16:00" "2019-09-16 04:00"
+    python code/batch.py test.json --sessions sessions.json --plots plots
+    python code/batch.py test.json --calendar --match maser
+
+Importe tikai to, kas vajadzigs planosanai; grafiki (matplotlib) un
+google calendar tiek importeti tikai ar --plots un --calendar.
+
+"""
+import os
+import sys
+import json
+import argparse
+import datetime
+from collections import OrderedDict
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+def day_summary(summary, dayStart, dayEnd):
+    """Name of a session the way the GUI date list shows it."""
+    return summary + " " + str(dayStart.date()) + " " + str(dayStart.time()) + "-" + str(dayEnd.time())
+
+
+def parse_time(text):
+    """datetime from an ISO string, falling back to dateutil for other formats."""
+    try:
+        return datetime.datetime.fromisoformat(text)
+    except ValueError:
+        from dateutil.parser import parse
+        return parse(text)
+
+
+def make_week(sessions):
+    """
+    ``{daySummary: [start datetime, end datetime]}`` from a list of
+    ``(summary, start, end)``, where start and end are datetimes or strings.
+    """
+    week = OrderedDict()
+    for summary, start, end in sessions:
+        dayStart = start if isinstance(start, datetime.datetime) else parse_time(start)
+        dayEnd = end if isinstance(end, datetime.datetime) else parse_time(end)
+        week[day_summary(summary, dayStart, dayEnd)] = [dayStart, dayEnd]
+    return week
+
+
+def load_sessions(path):
+    """
+    Sessions from a JSON file, a list of ``{"summary", "start", "end"}``.
+    """
+    with open(path) as json_file:
+        sessions = json.load(json_file)
+    return [(session.get("summary", "session"), session["start"], session["end"]) for session in sessions]
+
+
+def calendar_sessions(match="maser"):
+    """Next week's calendar events whose summary contains ``match``."""
+    from googlecalendar import get_next_week_events
+
+    startArray, endArray, summaryArray = get_next_week_events()
+    return [(summary, start, end) for start, end, summary in zip(startArray, endArray, summaryArray)
+            if match in summary]
+
+
+def save_plots(results, directory="plots"):
+    """Save sky and altitude plots of every scheduled day as PNG files."""
+    import matplotlib
+    matplotlib.use("Agg")
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from astroplanventa.plots import plot_schedule_altitude, plot_schedule_sky
+
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    filenames = []
+    for daySummary, day, schedule, observations in results:
+        name = day[0].strftime("%Y-%m-%d-%H-%M")
+        for kind, plot in (("sky", plot_schedule_sky), ("altitude", plot_schedule_altitude)):
+            fig = Figure(figsize=(6 if kind == "altitude" else 5, 4), dpi=100)
+            FigureCanvasAgg(fig)
+            if plot(schedule, fig=fig) is False:
+                continue
+            filename = os.path.join(directory, name + "-" + kind + ".png")
+            fig.savefig(filename, bbox_inches="tight")
+            filenames.append(filename)
+    return filenames
+
+
+def run(observations_file, sessions, config_dir="config", output_dir="observations",
+        workers=None, plots=None, profile=None):
+    """
+    Schedule ``sessions`` for the observations in ``observations_file`` and
+    write ``<output_dir>/<session start>.json`` for every session.
+
+    Parameters
+    ----------
+    observations_file : str
+        Observation JSON saved by the GUI, e.g. ``test.json``.
+    sessions : list of (summary, start, end)
+        Session windows; start and end are datetimes or strings.
+    config_dir : str
+        Directory with ``config.csv``, ``calibrators.csv`` and ``config.ini``.
+    output_dir : str
+        Where the schedules are written.
+    workers : int or None
+        Worker processes, see `weekplanner.plan_week`.
+    plots : str or None
+        If given, sky and altitude plots are saved to this directory.
+    profile : bool or None
+        Time the scheduling phases of every session and print them;
+        defaults to ``profile`` in ``config.ini``.
+
+    Returns
+    -------
+    results : list of (daySummary, day, schedule, observations)
+    targets : list of PlannedObs
+        With ``obs_per_week`` decremented by what was scheduled.
+    """
+    from catalog import get_irbene, load_targets, load_calibrators, load_config, load_observations
+    from weekplanner import plan_week, save_observations, log_stats
+
+    config = load_config(os.path.join(config_dir, "config.ini"))
+    targets, targetsDict = load_targets(os.path.join(config_dir, "config.csv"))
+    calibrators, calibratorsDict = load_calibrators(os.path.join(config_dir, "calibrators.csv"))
+    observations, skipped = load_observations(observations_file, targetsDict)
+    for key in skipped:
+        print(key + " not in targets, skipping it")
+
+    results = plan_week(observations, make_week(sessions), config, get_irbene(),
+                        calibrators=calibrators, workers=workers, profile=profile)
+    log_stats(results)
+    for daySummary, day, schedule, scheduled in results:
+        print("Saved", save_observations(day, scheduled, output_dir))
+    if plots is not None:
+        save_plots(results, plots)
+    return results, observations
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Plan observations without the GUI.")
+    parser.add_argument("observations", help="observation JSON saved by the GUI, e.g. test.json")
+    parser.add_argument("--session", nargs=2, action="append", default=[], metavar=("START", "END"),
+                        help="session window, can be given several times")
+    parser.add_argument("--sessions", help="JSON file with a list of {summary, start, end}")
+    parser.add_argument("--calendar", action="store_true", help="take sessions from google calendar")
+    parser.add_argument("--match", default="maser", help="calendar events to use (default: %(default)s)")
+    parser.add_argument("--config", default="config", help="config directory (default: %(default)s)")
+    parser.add_argument("--output", default="observations", help="output directory (default: %(default)s)")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per session)")
+    parser.add_argument("--plots", help="save plots to this directory")
+    parser.add_argument("--profile", action="store_true", default=None,
+                        help="print how long each scheduling phase took")
+    args = parser.parse_args(argv)
+
+    sessions = [("session", start, end) for start, end in args.session]
+    if args.sessions:
+        sessions += load_sessions(args.sessions)
+    if args.calendar:
+        sessions += calendar_sessions(args.match)
+    if not sessions:
+        parser.error("no sessions given, use --session, --sessions or --calendar")
+
+    results, targets = run(args.observations, sessions, config_dir=args.config, output_dir=args.output,
+                           workers=args.workers, plots=args.plots, profile=args.profile)
+    timeLeft = 0
+    for target in targets:
+        timeLeft += target.obs_per_week * target.scans_per_obs
+        print(target.name, ' observations left ', target.obs_per_week, ' scan size ', target.scans_per_obs, ' priority ', target.priority)
+    print('Total time left to observe ', timeLeft)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+"""
+
+catalog.py nolasa targets, calibratorus, config un noverojumu failus, bez GUI
+
+"""
+import os
+import sys
+import csv
+import json
+import configparser
+
+import astropy.units as u
+from astropy.coordinates import SkyCoord, EarthLocation, Angle
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from astroplanventa import Observer, FixedTarget
+
+from plannedObs import PlannedObs
+
+
+def insert (source_str, insert_str, pos):
+    return source_str[:pos]+insert_str+source_str[pos:]
+
+
+def get_irbene():
+    """The `~astroplanventa.Observer` at Irbene."""
+    irbeneLocation = EarthLocation(lat=57.5535171694 * u.deg, lon=21.8545525000 * u.deg, height=87.30 * u.m)
+    return Observer(location=irbeneLocation, name="Irbene", timezone="Europe/Riga")
+
+
+def load_targets(path="config/config.csv"):
+    """
+    Targets from ``config/config.csv``.
+
+    Returns
+    -------
+    targets : list of PlannedObs
+        Sorted by priority.
+    targetsDict : dict
+        ``{name: {"ra": Angle, "dec": Angle}}``
+    """
+    targets = []
+    targetsDict = {}
+    with open(path, "r") as csvfile:
+        next(csvfile)
+        reader = csv.reader(csvfile, delimiter=",", quotechar="|")
+        for row in reader:
+            sourceName = row[0]
+
+            raText = row[1]
+            raText = insert(raText, 'h', 2)     #Nolasa targets no faila un ievieto targetsDict un targets
+            raText = insert(raText, 'm', 5)
+            raText = insert(raText, 's', len(raText))
+
+            decText = row[2]
+            if (decText[0] != "-"):
+                decText = insert(decText, 'd', 2)
+                decText = insert(decText, 'm', 5)
+                decText = insert(decText, 's', len(decText))
+            else:
+                decText = insert(decText, 'd', 3)
+                decText = insert(decText, 'm', 6)
+                decText = insert(decText, 's', len(decText))
+
+            ra = Angle(raText)
+            dec = Angle(decText)
+
+            targetCoord = SkyCoord(frame='icrs', ra=ra, dec=dec, obstime="J2000")
+            target = FixedTarget(coord=targetCoord, name=sourceName)
+            plannedObs = PlannedObs(target, int(row[4]), int(row[3]), int(row[5]))
+            targets.append(plannedObs)  # target / obs per_week / priority / scans per obs
+            coords = {"ra": ra, "dec": dec}
+            targetsDict[sourceName] = coords
+
+    targets = sorted(targets, key=lambda x: x.priority)  # sort targets by priority
+    return targets, targetsDict
+
+
+def load_calibrators(path="config/calibrators.csv"):
+    """
+    Calibrators from ``config/calibrators.csv``.
+
+    Returns
+    -------
+    calibrators : list of `~astroplanventa.FixedTarget`
+    calibratorsDict : dict
+        ``{name: {"ra": Angle, "dec": Angle}}``
+    """
+    calibrators = []
+    calibratorsDict = {}
+    with open(path, "r") as csvfile:
+        next(csvfile)
+        reader = csv.reader(csvfile, delimiter=";", quotechar="|")
+        for row in reader:
+            sourceName = row[0]
+
+            raText = str(row[1]).replace(" ", "")
+            raText = insert(raText, 'h', 2)
+            raText = insert(raText, 'm', 5)
+            raText = insert(raText, 's', len(raText))
+
+            decText = str(row[2]).replace(" ", "")
+            if (decText[0] != "-"):
+                decText = insert(decText, 'd', 3)
+                decText = insert(decText, 'm', 6)
+                decText = insert(decText, 's', len(decText))
+            else:
+                decText = insert(decText, 'd', 3)
+                decText = insert(decText, 'm', 6)
+                decText = insert(decText, 's', len(decText))            #Nolasa no faila calibratorus un ievieto calibratorsDict un calibrators
+
+            ra = Angle(raText)
+            dec = Angle(decText)
+
+            coords = {"ra": ra, "dec": dec}
+            calibratorsDict[sourceName] = coords
+            calibratorCoord = SkyCoord(frame='icrs', ra=ra, dec=dec, obstime="J2000")
+            calibrator = FixedTarget(coord=calibratorCoord, name=sourceName)
+            calibrators.append(calibrator)
+    return calibrators, calibratorsDict
+
+
+def load_config(path="config/config.ini"):
+    """The ``[Default]`` section of ``config/config.ini`` as a dict."""
+    config = configparser.ConfigParser()
+    config.read(path)
+    settings = config._sections['Default']
+    settings['calibration'] = config['Default'].getboolean('calibration')  #Nolasa config failu
+    settings['profile'] = config['Default'].getboolean('profile', fallback=False)  #Planosanas fazu laiki
+    return settings
+
+
+def load_observations(path, targetsDict):
+    """
+    Planned observations from a JSON file saved by the GUI, e.g. ``test.json``.
+
+    Returns
+    -------
+    observations : list of PlannedObs
+    skipped : list of str
+        Names in the file that aren't in ``targetsDict``.
+    """
+    with open(path) as json_file:
+        obs_dict = json.load(json_file)
+    observations = []
+    skipped = []
+    for key in obs_dict:
+        if key in targetsDict:
+            ra = targetsDict[key]["ra"]
+            dec = targetsDict[key]["dec"]
+            coord = SkyCoord(frame='icrs', ra=ra, dec=dec, obstime="J2000")
+            target = FixedTarget(coord=coord, name=key)
+            observations.append(PlannedObs(target, int(obs_dict[key]['priority']), int(obs_dict[key]['obs_per_week']),
+                                           int(obs_dict[key]['scans_per_obs']), obs_dict[key]['times'],
+                                           obs_dict[key]['global_time']))
+        else:
+            skipped.append(key)
+    return observations, skipped
@@ -2,80 +2,312 @@
 
 Googlecalendar.py iegust dates no google calendar
 
-"""
-
+Notikumi tiek glabati diska (CACHE_FILE) un atjaunoti inkrementali ar google
+sync token, tapec katrs izsaukums lejupielade tikai izmainitos notikumus. Bez
+interneta vai testiem google API var aizstat ar lokalu JSON vai ICS failu
+(IRBENE_CALENDAR vide vai FileCalendarBackend).
 
+"""
 
-### this file is quickstart.py from google's examples modified by Ali Nuri SEKER
+### this file started as quickstart.py from google's examples modified by Ali Nuri SEKER
 ### the original could be found at https://developers.google.com/calendar/quickstart/python
 ### comments made by me will be marked with triple hash(#)
 ### this method of access can be used in any other type of google api's also
 
 
 from __future__ import print_function
-import httplib2
 import os
-
-from apiclient import discovery
-from oauth2client import client
-from oauth2client import tools
-from oauth2client.file import Storage
-### this import is for service account. install api page -> https://developers.google.com/api-client-library/python/apis/calendar/v3
-### $ pip install --upgrade google-api-python-client
-from google.oauth2 import service_account
-
+import json
 import datetime
-from dateutil.parser import parse
-
-
-try:
-    import argparse
-    flags = argparse.ArgumentParser(parents=[tools.argparser]).parse_args()
-except ImportError:
-    flags = None
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # If modifying these scopes, delete your previously saved credentials
 # at ~/.credentials/calendar-python-quickstart.json
 SCOPES = 'https://www.googleapis.com/auth/calendar.readonly'
 ### this is the path to the JSON file you provided -> https://console.developers.google.com/iam-admin/serviceaccounts/
 SERVICE_ACCOUNT_FILE = 'config/service.json'
+CALENDAR_ID = '2k1tq4bc5nnqsoso02c7tkv7gc@group.calendar.google.com'
+#Lokala notikumu kese
+CACHE_FILE = 'config/calendar_cache.json'
+#Ja vide ir uzstadits cels uz JSON vai ICS failu, tad google API neizmanto
+CALENDAR_FILE_ENV = 'IRBENE_CALENDAR'
+
 
 ### this function is used for service account credentials
 def get_service_credentials():
+    ### $ pip install --upgrade google-api-python-client
+    from google.oauth2 import service_account
     credentials = service_account.Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=[SCOPES])
     return credentials
 
-def get_all_events():
-    credentials = get_service_credentials()
-    service = discovery.build('calendar', 'v3', credentials=credentials)
-    now = datetime.datetime.utcnow().isoformat() + 'Z'  # 'Z' indicates UTC time
-    eventsResult = service.events().list(calendarId='2k1tq4bc5nnqsoso02c7tkv7gc@group.calendar.google.com', timeMin=now,
-                                         singleEvents=True, orderBy='startTime').execute()
-    events = eventsResult.get('items', [])
-    if not events:
-        print('No upcoming events found, returning empty arrays')
-        return [], [], []
-    startArray = []
-    endArray = []
-    summaryArray = []
-    for event in events:
-        start = event['start'].get('dateTime', event['start'].get('date'))
-        end = event['end'].get('dateTime', event['end'].get('date'))
 
-        startArray.append(start)
-        endArray.append(end)
-        summaryArray.append(event['summary'])
-    return startArray, endArray, summaryArray
+def to_datetime(value):
+    """
+    Timezone aware datetime of an event ``start`` or ``end`` value. All-day
+    dates are taken as midnight UTC.
+    """
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    if len(value) == 8 and value.isdigit():     # ICS date, YYYYMMDD
+        value = value[:4] + '-' + value[4:6] + '-' + value[6:]
+    moment = datetime.datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=datetime.timezone.utc)
+    return moment
 
-def get_next_week_events():
-    credentials = get_service_credentials()
-    service = discovery.build('calendar', 'v3', credentials=credentials)
-    now = datetime.datetime.utcnow().isoformat() + 'Z'  # 'Z' indicates UTC time
-    nextWeek = datetime.datetime.utcnow() + datetime.timedelta(days=7)
-    nextWeek = nextWeek.isoformat() + 'Z'
-    eventsResult = service.events().list(calendarId='2k1tq4bc5nnqsoso02c7tkv7gc@group.calendar.google.com', timeMin=now,
-                                         timeMax=nextWeek, singleEvents=True, orderBy='startTime').execute()
-    events = eventsResult.get('items', [])
+
+def event_time(event, key):
+    """The ``'start'`` or ``'end'`` string of a google calendar event."""
+    return event[key].get('dateTime', event[key].get('date'))
+
+
+class GoogleCalendarBackend:
+    """
+    Events from the google calendar API.
+
+    The service is built once per backend, and `changes` uses sync tokens,
+    so after the first full sync only changed and cancelled events are
+    downloaded.
+    """
+
+    def __init__(self, calendar_id=CALENDAR_ID, service_account_file=SERVICE_ACCOUNT_FILE):
+        self.calendar_id = calendar_id
+        self.service_account_file = service_account_file
+        self._service = None
+
+    @property
+    def service(self):
+        if self._service is None:
+            from google.oauth2 import service_account
+            from googleapiclient import discovery
+
+            credentials = service_account.Credentials.from_service_account_file(self.service_account_file,
+                                                                                 scopes=[SCOPES])
+            self._service = discovery.build('calendar', 'v3', credentials=credentials, cache_discovery=False)
+        return self._service
+
+    def changes(self, sync_token=None):
+        """
+        Events changed since ``sync_token``, or all of them if it is `None`
+        or has expired.
+
+        Returns
+        -------
+        events : list of dict
+            Google calendar events; cancelled ones have ``status`` ``'cancelled'``.
+        sync_token : str
+            Token for the next call.
+        full : bool
+            True if ``events`` is the whole calendar rather than changes.
+        """
+        from googleapiclient.errors import HttpError
+
+        try:
+            events, token = self._list(syncToken=sync_token) if sync_token else self._list()
+            return events, token, sync_token is None
+        except HttpError as e:
+            if sync_token is None or getattr(e.resp, 'status', None) != 410:
+                raise
+            ### 410 GONE - the sync token has expired, start over with a full sync
+            events, token = self._list()
+            return events, token, True
+
+    def _list(self, **kwargs):
+        events = []
+        page_token = None
+        while True:
+            eventsResult = self.service.events().list(calendarId=self.calendar_id, singleEvents=True,
+                                                      pageToken=page_token, **kwargs).execute()
+            events.extend(eventsResult.get('items', []))
+            page_token = eventsResult.get('nextPageToken')
+            if page_token is None:
+                return events, eventsResult.get('nextSyncToken')
+
+
+class FileCalendarBackend:
+    """
+    Events from a local JSON or ICS file, in place of the google API.
+
+    A JSON file holds a list of google calendar events (``id``, ``summary``,
+    ``start``, ``end``), an ICS file ``VEVENT`` entries. ICS times in UTC
+    (``Z``) or with a ``TZID`` become aware times, floating ones are taken
+    as UTC. The file's modification time is the sync token, so an unchanged
+    file gives no changes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def changes(self, sync_token=None):
+        token = str(os.path.getmtime(self.path))
+        if token == sync_token:
+            return [], token, False
+        if self.path.lower().endswith('.ics'):
+            events = self._read_ics()
+        else:
+            with open(self.path) as json_file:
+                events = json.load(json_file)
+            if isinstance(events, dict):
+                events = events.get('items', [])
+        for i, event in enumerate(events):
+            event.setdefault('id', '%s-%d' % (event.get('summary', 'event'), i))
+        return events, token, True
+
+    def _read_ics(self):
+        events = []
+        event = None
+        with open(self.path) as ics_file:
+            lines = ics_file.read().replace('\r\n ', '').replace('\n ', '').splitlines()
+        for line in lines:
+            if line == 'BEGIN:VEVENT':
+                event = {}
+            elif line == 'END:VEVENT' and event is not None:
+                events.append(event)
+                event = None
+            elif event is not None and ':' in line:
+                name, value = line.split(':', 1)
+                name, *parameters = name.split(';')
+                parameters = dict(parameter.split('=', 1) for parameter in parameters if '=' in parameter)
+                if name == 'UID':
+                    event['id'] = value
+                elif name == 'SUMMARY':
+                    event['summary'] = value
+                elif name in ('DTSTART', 'DTEND'):
+                    key = 'start' if name == 'DTSTART' else 'end'
+                    if 'T' in value:
+                        moment = datetime.datetime.strptime(value.rstrip('Z'), '%Y%m%dT%H%M%S')
+                        if value.endswith('Z'):
+                            moment = moment.replace(tzinfo=datetime.timezone.utc)
+                        elif 'TZID' in parameters:
+                            moment = moment.replace(tzinfo=self._zone(parameters['TZID']))
+                        event[key] = {'dateTime': moment.isoformat()}
+                    else:
+                        event[key] = {'date': value}
+                elif name == 'STATUS' and value == 'CANCELLED':
+                    event['status'] = 'cancelled'
+        return events
+
+    def _zone(self, tzid):
+        from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+        try:
+            return ZoneInfo(tzid.strip('"'))
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValueError('Unknown time zone %r in %s' % (tzid, self.path))
+
+
+class Calendar:
+    """
+    Calendar events kept in an on-disk cache and brought up to date with
+    the ``changes`` of a backend.
+    """
+
+    _executor = ThreadPoolExecutor(max_workers=1)
+
+    def __init__(self, backend, cache_file=CACHE_FILE):
+        self.backend = backend
+        self.cache_file = cache_file
+        self._lock = threading.Lock()
+        self.sync_token = None
+        self._events = {}
+        self._load()
+
+    def _load(self):
+        if self.cache_file and os.path.exists(self.cache_file):
+            try:
+                with open(self.cache_file) as json_file:
+                    cache = json.load(json_file)
+                self.sync_token = cache.get('sync_token')
+                self._events = cache.get('events', {})
+            except (ValueError, OSError) as e:
+                print('Calendar cache unreadable, doing a full sync:', e)
+
+    def _save(self):
+        if not self.cache_file:
+            return
+        directory = os.path.dirname(self.cache_file)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        tmp_file = self.cache_file + '.tmp'
+        with open(tmp_file, 'w') as outfile:
+            json.dump({'sync_token': self.sync_token, 'events': self._events}, outfile)
+        os.replace(tmp_file, self.cache_file)
+
+    def sync(self):
+        """
+        Pull the changes since the last sync into the cache.
+
+        Returns
+        -------
+        changed : int
+            Number of events added, changed or removed.
+        """
+        with self._lock:
+            events, token, full = self.backend.changes(self.sync_token)
+            if full:
+                self._events = {}
+            for event in events:
+                if event.get('status') == 'cancelled':
+                    self._events.pop(event['id'], None)
+                else:
+                    self._events[event['id']] = event
+            self.sync_token = token
+            self._save()
+            return len(events)
+
+    def sync_async(self):
+        """`sync` in a background thread, returns a `~concurrent.futures.Future`."""
+        return self._executor.submit(self.sync)
+
+    def events(self, time_min=None, time_max=None):
+        """
+        Cached events ending after ``time_min`` and starting before
+        ``time_max`` (aware datetimes), sorted by start time.
+        """
+        with self._lock:
+            events = list(self._events.values())
+        selected = []
+        for event in events:
+            if 'start' not in event or 'end' not in event:
+                continue
+            if time_min is not None and to_datetime(event_time(event, 'end')) <= time_min:
+                continue
+            if time_max is not None and to_datetime(event_time(event, 'start')) >= time_max:
+                continue
+            selected.append(event)
+        return sorted(selected, key=lambda event: to_datetime(event_time(event, 'start')))
+
+
+_calendar = None
+
+
+def get_calendar():
+    """
+    The shared `Calendar`: a local file if ``IRBENE_CALENDAR`` is set,
+    google calendar otherwise.
+    """
+    global _calendar
+    if _calendar is None:
+        path = os.environ.get(CALENDAR_FILE_ENV)
+        backend = FileCalendarBackend(path) if path else GoogleCalendarBackend()
+        _calendar = Calendar(backend)
+    return _calendar
+
+
+def get_events(days=None):
+    """
+    Start, end and summary arrays of the events from now on, or of the next
+    ``days`` days. Falls back to the cached events if the sync fails.
+    """
+    calendar = get_calendar()
+    try:
+        calendar.sync()
+    except Exception as e:
+        print('Calendar sync failed, using cached events:', e)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    time_max = None if days is None else now + datetime.timedelta(days=days)
+    events = calendar.events(now, time_max)
     if not events:
         print('No upcoming events found, returning empty arrays')
         return [], [], []
@@ -83,11 +315,15 @@ def get_next_week_events():
     endArray = []
     summaryArray = []
     for event in events:
-        start = event['start'].get('dateTime', event['start'].get('date'))
-        end = event['end'].get('dateTime', event['end'].get('date'))
-        startArray.append(start)
-        endArray.append(end)
-        summaryArray.append(event['summary'])
+        startArray.append(event_time(event, 'start'))
+        endArray.append(event_time(event, 'end'))
+        summaryArray.append(event.get('summary', ''))
     return startArray, endArray, summaryArray
 
 
+def get_all_events():
+    return get_events()
+
+
+def get_next_week_events():
+    return get_events(days=7)
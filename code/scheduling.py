@@ -3,33 +3,29 @@
 Galvenais fails, kurš sastāv no grafiskajiem elementiem, failu nolasīšanas un veidošanas
 un plānotāja palaišanas.
 """
-import matplotlib.pyplot as plt
-from astropy.visualization import astropy_mpl_style
+import time
+STARTED = time.time()
+
 import astropy.units as u
-from astropy.coordinates import SkyCoord, EarthLocation, Angle
+from astropy.coordinates import SkyCoord, Angle
 from astropy.time import Time
-from astropy.utils import iers
-from urllib.request import urlopen
-from urllib.error import HTTPError, URLError
 from dateutil.parser import parse
 from collections import OrderedDict
 from PyQt5.QtWidgets import QApplication, QWidget, QFormLayout, QGridLayout, QGroupBox, QLineEdit, QFileDialog, QLabel, QPushButton, QComboBox, QMessageBox, QListWidget, QListWidgetItem, QCheckBox, QVBoxLayout, QHBoxLayout, QRadioButton
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
 import numpy as np
-from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
 
 
-from observation import Observation
 from plannedObs import PlannedObs
-from googlecalendar import get_next_week_events, get_all_events
-from plot_qt5 import Plot
+from weekplanner import plan_week, save_observations, log_stats
+from catalog import get_irbene, load_observations
+from startup import Startup, StartupTimer
 
 import re
 import os
 import json
 import configparser
 import datetime
-import csv
 import faulthandler
 faulthandler.enable(all_threads=True)
 
@@ -37,116 +33,68 @@ faulthandler.enable(all_threads=True)
 import sys, os
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 
-from astroplanventa.constraints import AltitudeConstraint
-from astroplanventa import Observer, FixedTarget, ObservingBlock
-from astroplanventa.scheduling import Transitioner, Schedule, SequentialScheduler
-from astroplanventa.plots import  plot_schedule_altitude, plot_altitude, plot_schedule_sky, plot_sky
+from astroplanventa import Observer, FixedTarget
 from astroplanventa import is_always_observable, download_IERS_A
 
 
 
 def main():
+    timer = StartupTimer(STARTED)
+    timer.mark("imports done")
     app = QApplication([])
-    gui = GUI()
+    gui = GUI(timer)
     gui.show()
+    timer.mark("window shown")
     app.exec_()
 
 
 
-def insert (source_str, insert_str, pos):
-    return source_str[:pos]+insert_str+source_str[pos:]
-
 class GUI(QWidget):
-    def __init__(self):
+    def __init__(self, timer=None):
         super().__init__()
 
-        try:
-            urlopen('http://maia.usno.navy.mil/ser7/finals2000A.all')
-        except HTTPError as e:
-            print("Main IERS link not working, using mirror")
-            iers.conf.iers_auto_url = 'http://toshi.nofs.navy.mil/ser7/finals2000A.all'
-        except URLError as e:
-            print("Main IERS link not working, using mirror")
-            iers.conf.iers_auto_url = 'http://toshi.nofs.navy.mil/ser7/finals2000A.all'
+        #IERS parbaude, google calendar un failu nolasisana notiek fona
+        self.startup = Startup(timer)
 
-        #download_IERS_A()
-
-        plt.style.use(astropy_mpl_style)
-
-        irbeneLocation = EarthLocation(lat=57.5535171694 * u.deg, lon=21.8545525000 * u.deg, height=87.30 * u.m)
-        self.irbene = Observer(location=irbeneLocation, name="Irbene", timezone="Europe/Riga")
+        self.irbene = get_irbene()
+        #Iepriekseja planosanas planotaji pa dienam, lai pec izmainam parplanotu tikai ietekmeto dalu
+        self.schedulers = {}
 
         observe_time = Time(['2019-02-05 15:30:00'])
 
-        self.targets = []
-        self.targetsDict = {}
-        with open("config/config.csv", "r") as csvfile:
-            next(csvfile)
-            reader = csv.reader(csvfile, delimiter=",", quotechar="|")
-            for row in reader:
-                sourceName = row[0]
-
-                raText = row[1]
-                raText = insert(raText, 'h', 2)     #Nolasa targets no faila un ievieto targetsDict un targets
-                raText = insert(raText, 'm', 5)
-                raText = insert(raText, 's', len(raText))
-
-                decText = row[2]
-                if (decText[0] != "-"):
-                    decText = insert(decText, 'd', 2)
-                    decText = insert(decText, 'm', 5)
-                    decText = insert(decText, 's', len(decText))
-                else:
-                    decText = insert(decText, 'd', 3)
-                    decText = insert(decText, 'm', 6)
-                    decText = insert(decText, 's', len(decText))
-
-                ra = Angle(raText)
-                dec = Angle(decText)
-
-                targetCoord = SkyCoord(frame='icrs', ra=ra, dec=dec, obstime="J2000")
-                target = FixedTarget(coord=targetCoord, name=sourceName)
-                plannedObs = PlannedObs(target, int(row[4]), int(row[3]), int(row[5]))
-                self.targets.append(plannedObs)  # target / obs per_week / priority / scans per obs
-                coords = {"ra": ra, "dec": dec}
-                self.targetsDict[sourceName] = coords
-
-        self.targets = sorted(self.targets, key=lambda x: x.priority)  # sort targets by priority
-        self.calibrators = []
-        self.calibratorsDict = {}
-        with open("config/calibrators.csv", "r") as csvfile:
-            next(csvfile)
-            reader = csv.reader(csvfile, delimiter=";", quotechar="|")
-            for row in reader:
-                sourceName = row[0]
-
-                raText = str(row[1]).replace(" ", "")
-                raText = insert(raText, 'h', 2)
-                raText = insert(raText, 'm', 5)
-                raText = insert(raText, 's', len(raText))
-
-                decText = str(row[2]).replace(" ", "")
-                if (decText[0] != "-"):
-                    decText = insert(decText, 'd', 3)
-                    decText = insert(decText, 'm', 6)
-                    decText = insert(decText, 's', len(decText))
-                else:
-                    decText = insert(decText, 'd', 3)
-                    decText = insert(decText, 'm', 6)
-                    decText = insert(decText, 's', len(decText))            #Nolasa no faila calibratorus un ievieto calibratorsDict un calibrators
+        self.dateList = QListWidget()
+        with self.startup.timer.phase("wait for catalog"):
+            (self.targets, self.targetsDict, self.calibrators, self.calibratorsDict,
+             self.config) = self.startup.catalog.result()
+
+        self.layout = QGridLayout()
+        self.layout.setSpacing(0)
+        self.layout.setContentsMargins(0,0,0,0)
+        self.setLayout(self.layout)
+        self.resize(1000, 600)
 
-                ra = Angle(raText)
-                dec = Angle(decText)
 
-                coords = {"ra": ra, "dec": dec}
-                self.calibratorsDict[sourceName] = coords
-                calibratorCoord = SkyCoord(frame='icrs', ra=ra, dec=dec, obstime="J2000")
-                calibrator = FixedTarget(coord=calibratorCoord, name=sourceName)
-                self.calibrators.append(calibrator)
 
-        startArray, endArray, summaryArray = get_all_events()       #No google calendar sanem noverosanas datumus un laikus
-        self.dateList = QListWidget()
+        self.dateBoxList = []
+        self.targetTimesCount = 0
+        self.load_ui()
 
+        self.hasDates = False
+        self.startupTimer = QTimer(self)
+        self.startupTimer.timeout.connect(self.check_startup)
+        self.startupTimer.start(100)
+
+    def check_startup(self): #Kad google calendar atbildejis ievieto datumus, kad viss pabeigts izdruka laikus
+        if not self.hasDates and self.startup.calendar.done():
+            self.hasDates = True
+            self.add_dates(*self.startup.calendar.result())
+        if self.startup.done():
+            self.startupTimer.stop()
+            if self.startup.iers.exception() is not None:
+                print("IERS check failed:", self.startup.iers.exception())
+            print(self.startup.timer.report())
+
+    def add_dates(self, startArray, endArray, summaryArray): #No google calendar sanem noverosanas datumus un laikus
         tempCheck = True
         for i in range(len(startArray)):
             dayStart = parse(startArray[i])
@@ -162,24 +110,6 @@ class GUI(QWidget):
                 tempCheck = False
             self.dateList.addItem(item)
 
-        config = configparser.ConfigParser()
-        config.read('config/config.ini')
-        self.config = config._sections['Default']
-        self.config['calibration'] = config['Default'].getboolean('calibration')  #Nolasa config failu
-
-
-        self.layout = QGridLayout()
-        self.layout.setSpacing(0)
-        self.layout.setContentsMargins(0,0,0,0)
-        self.setLayout(self.layout)
-        self.resize(1000, 600)
-
-
-
-        self.dateBoxList = []
-        self.targetTimesCount = 0
-        self.load_ui()
-
     def load_ui(self):   #Funkcija kas ielade galveno skatu
         self.observationList = QListWidget()
         self.plannedTargets = []
@@ -740,6 +670,11 @@ class GUI(QWidget):
             self.start_schedule()
 
     def start_schedule(self): #Sak planosanu
+        import matplotlib.pyplot as plt #Grafiku bibliotekas ielade tikai tad, kad tas vajadzigas
+        from astropy.visualization import astropy_mpl_style
+        from plot_qt5 import Plot
+        plt.style.use(astropy_mpl_style)
+
         items = (self.layout.itemAt(i).widget() for i in range(self.layout.count()))
         self.targets = []
 
@@ -774,81 +709,13 @@ class GUI(QWidget):
                 week[self.dateList.item(index).text()]=[self.dateList.item(index).data(Qt.UserRole)[0], self.dateList.item(index).data(Qt.UserRole)[1]]
 
 
-        for daySummary, day in week.items():
-
-            dayStart = Time(day[0])  # convert from datetime to astropy.time
-            dayEnd = Time(day[1])
-
-            timeDict = {}
-
-            for target in self.targets:
-                if daySummary in target.times:
-                    timeDict[target.name] = target.times[daySummary] #Pievieno specifiskos laikus dict timeDict
-                elif target.global_time != "":
-                    timeDict[target.name] = target.global_time
-
-            minalt = self.config['minaltitude']
-            maxalt = self.config['maxaltitude']
-
-            constraints = [AltitudeConstraint(minalt * u.deg, maxalt * u.deg)]
-
-            read_out = 1 * u.second
-            target_exp = 60 * u.second
-            blocks = []
-
-            for target in self.targets:
-                n = target.scans_per_obs
-                priority = target.priority
-                if (target.obs_per_week != 0): #Ja observation vel ir janovero tad izveido ObservingBlock
-                    b = ObservingBlock.from_exposures(target.target, priority, target_exp, n, read_out)
-                    blocks.append(b)
+        results = plan_week(self.targets, week, self.config, self.irbene, calibrators=self.calibrators,
+                            targColor=targ_to_color, calibColor=calib_to_color, schedulers=self.schedulers)
+        log_stats(results)
 
+        for daySummary, day, priority_schedule, observations in results:
 
-            slew_rate = 2 * u.deg / u.second
-            transitioner = Transitioner(slew_rate, {'filter': {'default': 5 * u.second}})
-
-            if (self.config['calibration']): #Padod mainigos planotajam
-                prior_scheduler = SequentialScheduler(constraints=constraints, observer=self.irbene, transitioner=transitioner,
-                                                      calibrators=self.calibrators, config=self.config, timeDict=timeDict)
-
-                priority_schedule = Schedule(dayStart, dayEnd, targColor=targ_to_color, calibColor=calib_to_color, minalt=minalt, maxalt=maxalt)
-            else:
-                prior_scheduler = SequentialScheduler(constraints=constraints, observer=self.irbene,
-                                                      transitioner=transitioner,
-                                                      config=self.config, timeDict=timeDict)
-
-                priority_schedule = Schedule(dayStart, dayEnd, targColor=targ_to_color, minalt=minalt, maxalt=maxalt)
-
-            prior_scheduler(blocks, priority_schedule)
-
-            observations = []
-            for block in priority_schedule.scheduled_blocks:
-                if hasattr(block, 'target'):
-                    observation = Observation(block.target.name, block.start_time.datetime,
-                                              (block.start_time + block.duration).datetime)
-                    observations.append(observation)
-
-            dict_array = []
-            for observation in observations: #Saplanotos block nolasa un ieraksta faila
-                for target in self.targets:
-                    if target.name == observation.name:
-                        print(target.name, " has been observed once")
-                        target.obs_per_week -= 1
-                dict_array.append({
-                    "obs_name": observation.name,
-                    "start_time": observation.start_time.strftime("%Y-%m-%d %H:%M:%S"),
-                    "end_time": observation.end_time.strftime("%Y-%m-%d %H:%M:%S"),
-                })
-
-            json_dict = dict()
-            json_dict["observations"] = dict_array
-            if not os.path.isdir("observations"):
-                os.mkdir("observations")
-            if not os.path.isdir("observations/"):
-                os.mkdir("observations")
-            with open("observations/" + day[0].strftime("%Y-%m-%d-%H-%M") + ".json", 'w') as outfile:
-                json.dump(json_dict, outfile, indent=4)
-
+            save_observations(day, observations, "observations") #Saplanotos block ieraksta faila
 
             sky = Plot() #Izveido grafikus
             skyCheck = sky.plot_sky_schedule(priority_schedule)
@@ -873,6 +740,8 @@ class GUI(QWidget):
         self.show_schedule()
 
     def show_schedule(self): #Atver grafiku skatu
+        from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
+
         self.clear_window()
 
         sky, alt = self.plots[self.plots_idx]
@@ -985,30 +854,15 @@ class GUI(QWidget):
         load.setOption(QFileDialog.DontUseNativeDialog)
         if load.exec_() == QFileDialog.Accepted:
             filename = load.selectedFiles()[0]
-            with open(filename) as json_file:
-                obs_dict = json.load(json_file)
-                self.observationList.clear()
-                for key in obs_dict:
-                    if key in self.targetsDict:
-                        targetName = key
-                        ra = self.targetsDict[targetName]["ra"]
-                        dec = self.targetsDict[targetName]["dec"]
-                        coord = SkyCoord(frame='icrs', ra=ra, dec=dec, obstime="J2000")
-                        target = FixedTarget(coord=coord, name=targetName)
-                        for date in obs_dict[key]['times']:
-                            print(date)
-
-                            # TODO Te pielikt date parbaudes, vai atkekset ja ir vai iznemt ja nav
-
-                        data = PlannedObs(target, int(obs_dict[key]['priority']), int(obs_dict[key]['obs_per_week']),
-                                          int(obs_dict[key]['scans_per_obs']), obs_dict[key]['times'],
-                                          obs_dict[key]['global_time'])
-                        item = QListWidgetItem(str(data), self.observationList)
-                        item.setData(Qt.UserRole, data)
-                        self.observationList.addItem(item)
-                        self.plannedTargets.append(target.name)
-                    else:
-                        self.show_error("Target error", key + " not in targets, skipping it")
+            observations, skipped = load_observations(filename, self.targetsDict)
+            self.observationList.clear()
+            for data in observations:
+                item = QListWidgetItem(str(data), self.observationList)
+                item.setData(Qt.UserRole, data)
+                self.observationList.addItem(item)
+                self.plannedTargets.append(data.name)
+            for key in skipped:
+                self.show_error("Target error", key + " not in targets, skipping it")
         else:
             print("Something went wrong")
 
@@ -0,0 +1,149 @@
+"""
+
+startup.py palaiz GUI startam vajadzigos darbus fona un mera, cik ilgi tie aiznem
+
+"""
+import os
+import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+IERS_URL = 'http://maia.usno.navy.mil/ser7/finals2000A.all'
+IERS_MIRROR_URL = 'http://toshi.nofs.navy.mil/ser7/finals2000A.all'
+
+
+class StartupTimer:
+    """
+    Wall-clock time of the startup phases, measured from when the timer is
+    created (or ``start``, e.g. the process start time).
+
+    Phases may run in different threads at the same time.
+    """
+
+    def __init__(self, start=None):
+        self.start = time.time() if start is None else start
+        self.phases = []
+        self._lock = threading.Lock()
+
+    def phase(self, name):
+        """Context manager that records how long its body takes as ``name``."""
+        return _Phase(self, name)
+
+    def mark(self, name):
+        """Record ``name`` as a point in time, e.g. when the window is shown."""
+        self._add(name, time.time(), 0.)
+
+    def _add(self, name, begin, duration):
+        with self._lock:
+            self.phases.append((name, begin - self.start, duration))
+
+    def report(self):
+        """One line per phase: name, start and duration in seconds."""
+        with self._lock:
+            phases = sorted(self.phases, key=lambda phase: phase[1])
+        lines = ["{0:<20} {1:>9} {2:>9}".format("startup phase", "start [s]", "took [s]")]
+        for name, begin, duration in phases:
+            lines.append("{0:<20} {1:>9.3f} {2:>9.3f}".format(name, begin, duration))
+        return "\n".join(lines)
+
+
+class _Phase:
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.begin = time.time()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer._add(self.name, self.begin, time.time() - self.begin)
+        return False
+
+
+def check_iers(timeout=5):
+    """
+    Use the IERS-A table from the preparsed store or the local astropy cache
+    if there is one, otherwise point astropy at whichever IERS server
+    answers.
+
+    Meant to run in the background: the network is only touched when there
+    is no local table, and then with a ``timeout``.
+
+    Returns
+    -------
+    source : str
+        ``'cache'``, or the URL astropy will download the table from.
+    """
+    from astropy.utils import iers
+    from astroplanventa.utils import (IERS_A_in_store, IERS_A_in_cache, _get_IERS_A_table,
+                                      _install_IERS_A)
+
+    if IERS_A_in_store() or IERS_A_in_cache():
+        _install_IERS_A(_get_IERS_A_table())
+        return 'cache'
+
+    from urllib.request import urlopen
+    from urllib.error import URLError
+
+    try:
+        urlopen(IERS_URL, timeout=timeout).close()
+    except (URLError, OSError):
+        print("Main IERS link not working, using mirror")
+        iers.conf.iers_auto_url = IERS_MIRROR_URL
+    return iers.conf.iers_auto_url
+
+
+def fetch_calendar():
+    """
+    `googlecalendar.get_all_events`, importing the Google client only here.
+    Returns empty arrays if the calendar can't be reached.
+    """
+    try:
+        from googlecalendar import get_all_events
+        return get_all_events()
+    except Exception as e:
+        print("Could not get events from google calendar:", e)
+        return [], [], []
+
+
+def load_catalog(config_dir="config"):
+    """Targets, calibrators and settings from ``config_dir``."""
+    from catalog import load_targets, load_calibrators, load_config
+
+    targets, targetsDict = load_targets(os.path.join(config_dir, "config.csv"))
+    calibrators, calibratorsDict = load_calibrators(os.path.join(config_dir, "calibrators.csv"))
+    config = load_config(os.path.join(config_dir, "config.ini"))
+    return targets, targetsDict, calibrators, calibratorsDict, config
+
+
+class Startup:
+    """
+    Runs the IERS check, the calendar fetch and the catalog load in
+    background threads, each timed as a phase of ``timer``.
+
+    ``iers``, ``calendar`` and ``catalog`` are futures with the results of
+    `check_iers`, `fetch_calendar` and `load_catalog`.
+    """
+
+    def __init__(self, timer=None, config_dir="config"):
+        self.timer = StartupTimer() if timer is None else timer
+        self._executor = ThreadPoolExecutor(max_workers=3)
+        self.iers = self._submit("iers check", check_iers)
+        self.calendar = self._submit("calendar", fetch_calendar)
+        self.catalog = self._submit("catalog", load_catalog, config_dir)
+        self._executor.shutdown(wait=False)
+
+    def _submit(self, name, function, *args):
+        def timed():
+            with self.timer.phase(name):
+                return function(*args)
+        return self._executor.submit(timed)
+
+    def done(self):
+        """True when every background phase has finished."""
+        return self.iers.done() and self.calendar.done() and self.catalog.done()
@@ -0,0 +1,116 @@
+import os
+import sys
+import json
+import datetime
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from googlecalendar import FileCalendarBackend, Calendar, to_datetime, event_time
+
+UTC = datetime.timezone.utc
+
+ICS = """BEGIN:VCALENDAR
+BEGIN:VEVENT
+UID:riga
+SUMMARY:Riga session
+DTSTART;TZID=Europe/Riga:20301015T180000
+DTEND;TZID=Europe/Riga:20301016T060000
+END:VEVENT
+BEGIN:VEVENT
+UID:utc
+SUMMARY:UTC
+  session
+DTSTART:20301017T160000Z
+DTEND:20301018T040000Z
+END:VEVENT
+BEGIN:VEVENT
+UID:allday
+SUMMARY:All day
+DTSTART;VALUE=DATE:20301020
+DTEND;VALUE=DATE:20301021
+END:VEVENT
+BEGIN:VEVENT
+UID:cancelled
+SUMMARY:Cancelled
+DTSTART:20301019T160000Z
+DTEND:20301019T200000Z
+STATUS:CANCELLED
+END:VEVENT
+END:VCALENDAR
+"""
+
+
+def write(path, text, mtime):
+    with open(path, 'w') as f:
+        f.write(text)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def event(uid, start, end, **kwargs):
+    event = {'id': uid, 'summary': uid, 'start': {'dateTime': start}, 'end': {'dateTime': end}}
+    event.update(kwargs)
+    return event
+
+
+def test_file_backend_json(tmpdir):
+    events = [event('a', '2030-10-15T16:00:00Z', '2030-10-16T04:00:00Z'),
+              {'summary': 'b', 'start': {'date': '2030-10-20'}, 'end': {'date': '2030-10-21'}}]
+    path = write(str(tmpdir.join('calendar.json')), json.dumps({'items': events}), 1000)
+    backend = FileCalendarBackend(path)
+    changed, token, full = backend.changes()
+    assert full
+    assert [e['id'] for e in changed] == ['a', 'b-1']
+    assert to_datetime(event_time(changed[1], 'start')) == datetime.datetime(2030, 10, 20, tzinfo=UTC)
+
+    # an unchanged file gives no changes
+    assert backend.changes(token) == ([], token, False)
+
+
+def test_file_backend_ics(tmpdir):
+    backend = FileCalendarBackend(write(str(tmpdir.join('calendar.ics')), ICS, 1000))
+    events, token, full = backend.changes()
+    events = {e['id']: e for e in events}
+    assert full
+    # Riga is three hours ahead of UTC in October
+    assert (to_datetime(event_time(events['riga'], 'start')) ==
+            datetime.datetime(2030, 10, 15, 15, tzinfo=UTC))
+    assert (to_datetime(event_time(events['utc'], 'end')) ==
+            datetime.datetime(2030, 10, 18, 4, tzinfo=UTC))
+    assert events['utc']['summary'] == 'UTC session'
+    assert events['allday']['start'] == {'date': '20301020'}
+    assert events['cancelled']['status'] == 'cancelled'
+
+    write(backend.path, ICS.replace('Europe/Riga', 'Nowhere/Atlantis'), 2000)
+    with pytest.raises(ValueError):
+        backend.changes(token)
+
+
+def test_calendar_sync_and_cache(tmpdir):
+    path = str(tmpdir.join('calendar.json'))
+    cache_file = str(tmpdir.join('cache', 'calendar_cache.json'))
+    write(path, json.dumps([event('b', '2030-10-17T16:00:00Z', '2030-10-18T04:00:00Z'),
+                            event('a', '2030-10-15T16:00:00Z', '2030-10-16T04:00:00Z')]), 1000)
+    calendar = Calendar(FileCalendarBackend(path), cache_file=cache_file)
+    assert calendar.sync() == 2
+    assert [e['id'] for e in calendar.events()] == ['a', 'b']
+    start = datetime.datetime(2030, 10, 16, 12, tzinfo=UTC)
+    assert [e['id'] for e in calendar.events(time_min=start)] == ['b']
+    assert [e['id'] for e in calendar.events(time_max=start)] == ['a']
+
+    # the cache is read back, and an unchanged file changes nothing
+    cached = Calendar(FileCalendarBackend(path), cache_file=cache_file)
+    assert cached.sync_token == calendar.sync_token
+    assert [e['id'] for e in cached.events()] == ['a', 'b']
+    assert cached.sync() == 0
+    assert [e['id'] for e in cached.events()] == ['a', 'b']
+
+    # a cancelled event is dropped from the cache
+    write(path, json.dumps([event('a', '2030-10-15T16:00:00Z', '2030-10-16T04:00:00Z'),
+                            event('b', '2030-10-17T16:00:00Z', '2030-10-18T04:00:00Z',
+                                  status='cancelled')]), 2000)
+    assert cached.sync() == 2
+    assert [e['id'] for e in cached.events()] == ['a']
+    assert [e['id'] for e in Calendar(FileCalendarBackend(path), cache_file=cache_file).events()] == ['a']
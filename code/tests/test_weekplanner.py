@@ -0,0 +1,50 @@
+import os
+import sys
+import datetime
+from collections import OrderedDict
+
+import numpy as np
+import astropy.units as u
+from astropy.coordinates import SkyCoord
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from astroplanventa import FixedTarget
+from catalog import get_irbene
+from plannedObs import PlannedObs
+from weekplanner import plan_week
+
+
+def make_targets():
+    rng = np.random.RandomState(3)
+    return [PlannedObs(FixedTarget(SkyCoord(ra=ra * u.deg, dec=dec * u.deg), name='t{0}'.format(i)),
+                       1 + i % 3, 1, 10)
+            for i, (ra, dec) in enumerate(zip(rng.uniform(0, 360, 10), rng.uniform(0, 80, 10)))]
+
+
+def test_plan_week_config_change():
+    observer = get_irbene()
+    start = datetime.datetime(2019, 9, 15, 16)
+    week = OrderedDict([('day', [start, start + datetime.timedelta(hours=8)])])
+    config = {'maxtimewithoutcalibration': '30', 'calibrationlength': '5', 'maxaltitude': '85',
+              'minaltitude': '10', 'calibration': False}
+
+    def slots(results):
+        return [(getattr(getattr(slot.block, 'target', None), 'name', None), slot.start.jd)
+                for daySummary, day, schedule, observations in results for slot in schedule.slots]
+
+    schedulers = {}
+    first = plan_week(make_targets(), week, config, observer, workers=1, schedulers=schedulers)
+    scheduler = schedulers['day']
+
+    # the GUI edits its config in place between runs
+    config['minaltitude'] = '50'
+    again = plan_week(make_targets(), week, config, observer, workers=1, schedulers=schedulers)
+    fresh = plan_week(make_targets(), week, config, observer, workers=1)
+    assert schedulers['day'] is not scheduler
+    assert schedulers['day'].minAlt == 50
+    assert slots(again) == slots(fresh)
+    assert slots(again) != slots(first)
+    for daySummary, day, schedule, observations in again:
+        for block in schedule.observing_blocks:
+            assert observer.altaz(block.start_time, block.target).alt > 49 * u.deg
@@ -0,0 +1,320 @@
+"""
+
+weekplanner.py sadala nedelas noverojumus pa dienam un ieplano dienas paraleli
+
+"""
+import os
+import sys
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import astropy.units as u
+from astropy.time import Time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from astroplanventa.constraints import AltitudeConstraint
+from astroplanventa import ObservingBlockSet
+from astroplanventa.cache import get_observer_cache
+from astroplanventa.ephemeris import EphemerisTable
+from astroplanventa.scheduling import Transitioner, Schedule, SequentialScheduler, BeamSearchScheduler
+
+from observation import Observation
+
+READ_OUT = 1 * u.second
+TARGET_EXP = 60 * u.second
+SLEW_RATE = 2 * u.deg / u.second
+
+#Solis, ar kadu noverte, cik ilgi target ir redzams katra diena
+VISIBILITY_RESOLUTION = 10 * u.min
+
+
+def block_hours(target):
+    """Length of one observation of ``target`` (a PlannedObs) in hours."""
+    return (target.scans_per_obs * (TARGET_EXP + READ_OUT)).to(u.hour).value
+
+
+def day_time_dict(targets, daySummary):
+    """Specific start times of ``targets`` on the day ``daySummary``."""
+    timeDict = {}
+    for target in targets:
+        if daySummary in target.times:
+            timeDict[target.name] = target.times[daySummary] #Pievieno specifiskos laikus dict timeDict
+        elif target.global_time != "":
+            timeDict[target.name] = target.global_time
+    return timeDict
+
+
+def visible_hours(observer, targets, week, minalt, maxalt):
+    """
+    Cheap estimate of how many hours every target spends between ``minalt``
+    and ``maxalt`` during every day window.
+
+    Parameters
+    ----------
+    observer : `~astroplanventa.Observer`
+    targets : list of PlannedObs
+    week : OrderedDict
+        ``{daySummary: [start datetime, end datetime]}``
+    minalt, maxalt : float or str
+        Altitude limits in degrees.
+
+    Returns
+    -------
+    hours : `~numpy.ndarray`
+        (len(targets), len(week)) array.
+    """
+    hours = np.zeros((len(targets), len(week)))
+    if not targets:
+        return hours
+    coords = [target.target for target in targets]
+    step = VISIBILITY_RESOLUTION.to(u.hour).value
+    for j, day in enumerate(week.values()):
+        table = EphemerisTable.from_range(observer, coords, Time(day[0]), Time(day[1]),
+                                          time_resolution=VISIBILITY_RESOLUTION)
+        alt = table.alt[table.rows(coords)[:, 0], :-1]
+        hours[:, j] = np.sum((alt >= float(minalt)) & (alt <= float(maxalt)), axis=1) * step
+    return hours
+
+
+def assign_days(targets, week, hours):
+    """
+    Phase one: spread what is left of every target's ``obs_per_week`` over
+    the days of ``week``.
+
+    Days the target has a specific time on come first. The rest of the quota
+    goes to the least loaded days on which the target is visible for at least
+    one observation, preferring days where it is visible longer. Targets are
+    handled in list order, i.e. by priority.
+
+    Returns
+    -------
+    assigned : list of list of int
+        Indices into ``targets`` for every day, in ``week`` order.
+    """
+    days = list(week)
+    day_hours = np.array([(day[1] - day[0]).total_seconds() / 3600. for day in week.values()])
+    load = np.zeros(len(days))
+    assigned = [[] for _ in days]
+    for i, target in enumerate(targets):
+        duration = block_hours(target)
+        quota = target.obs_per_week
+        chosen = [j for j, daySummary in enumerate(days) if daySummary in target.times][:max(quota, 0)]
+        candidates = [j for j in range(len(days)) if j not in chosen and hours[i, j] >= duration]
+        candidates.sort(key=lambda j: (load[j] / day_hours[j], -hours[i, j], j))
+        chosen += candidates[:max(quota - len(chosen), 0)]
+        for j in sorted(chosen):
+            assigned[j].append(i)
+            load[j] += duration
+    return assigned
+
+
+def make_day_job(targets, daySummary, day, indices, config, observer, calibrators=None,
+                 targColor=None, calibColor=None, profile=False, incremental=False, previous=None):
+    """
+    Picklable inputs of `schedule_day` for one day. ``previous`` is the
+    incremental scheduler of an earlier run of the day, if there is one.
+    ``config`` is copied, as the GUI edits its config in place.
+    """
+    return {
+        'daySummary': daySummary,
+        'day': day,
+        'targets': [(targets[i].target, targets[i].priority, targets[i].scans_per_obs) for i in indices],
+        'timeDict': day_time_dict([targets[i] for i in indices], daySummary),
+        'config': dict(config),
+        'observer': observer,
+        'calibrators': calibrators if config['calibration'] else None,
+        'targColor': targColor,
+        'calibColor': calibColor,
+        'profile': profile,
+        'incremental': incremental or previous is not None,
+        'previous': previous,
+    }
+
+
+def schedule_day(job):
+    """
+    Phase two: run the `SequentialScheduler` on one day.
+
+    Runs in a worker process, so everything it needs comes in ``job`` (see
+    `make_day_job`). If the job has the scheduler of an earlier run of the
+    day with the same config, only the part of the day an edit of the
+    targets affects is scheduled again (see `SequentialScheduler.reschedule`).
+
+    With ``beamWidth`` above 1 in the config, the day is scheduled by a
+    `BeamSearchScheduler` of that width instead, with or without calibrators.
+    It can't reschedule incrementally, so every run of the day is a full one.
+
+    Returns
+    -------
+    schedule : `~astroplanventa.scheduling.Schedule`
+    observations : list of `Observation`
+    scheduler : `~astroplanventa.scheduling.SequentialScheduler` or None
+        The scheduler, to pass on as ``previous`` for the next run of the day,
+        if the job is incremental.
+    """
+    dayStart = Time(job['day'][0])  # convert from datetime to astropy.time
+    dayEnd = Time(job['day'][1])
+    config = dict(job['config'])  # the scheduler keeps this copy to compare the next run's with
+    minalt = config['minaltitude']
+    maxalt = config['maxaltitude']
+
+    constraints = [AltitudeConstraint(minalt * u.deg, maxalt * u.deg)]
+
+    blocks = ObservingBlockSet.from_table(job['targets'], TARGET_EXP, READ_OUT)
+
+    transitioner = Transitioner(SLEW_RATE, {'filter': {'default': 5 * u.second}}, precompute_slews=True)
+
+    beam_width = int(config.get('beamwidth') or 1)
+    previous = job.get('previous')
+    if previous is not None and previous.config == config: #Turpina ieprieksejo planosanu, tabulas jau ir aprekinatas
+        prior_scheduler = previous
+        prior_scheduler.calibrators = job['calibrators']
+        prior_scheduler.timeDict = job['timeDict']
+        prior_scheduler.profile = job['profile']
+        prior_scheduler.observer = job['observer']
+    elif beam_width > 1: #Planosana ar beam search, ari ar kalibratoriem
+        prior_scheduler = BeamSearchScheduler(beam_width=beam_width, constraints=constraints,
+                                              observer=job['observer'], transitioner=transitioner,
+                                              calibrators=job['calibrators'], config=config,
+                                              timeDict=job['timeDict'], profile=job['profile'])
+    elif job['calibrators'] is not None: #Padod mainigos planotajam
+        prior_scheduler = SequentialScheduler(constraints=constraints, observer=job['observer'], transitioner=transitioner,
+                                              calibrators=job['calibrators'], config=config, timeDict=job['timeDict'],
+                                              profile=job['profile'], incremental=job['incremental'])
+    else:
+        prior_scheduler = SequentialScheduler(constraints=constraints, observer=job['observer'],
+                                              transitioner=transitioner,
+                                              config=config, timeDict=job['timeDict'], profile=job['profile'],
+                                              incremental=job['incremental'])
+
+    if job['calibrators'] is not None:
+        priority_schedule = Schedule(dayStart, dayEnd, targColor=job['targColor'], calibColor=job['calibColor'],
+                                     minalt=minalt, maxalt=maxalt)
+    else:
+        priority_schedule = Schedule(dayStart, dayEnd, targColor=job['targColor'], minalt=minalt, maxalt=maxalt)
+
+    if prior_scheduler is previous and prior_scheduler.incremental:
+        prior_scheduler.reschedule(blocks, priority_schedule)
+    else:
+        prior_scheduler(blocks, priority_schedule)
+    #Kesu nesutam atpakal uz galveno procesu
+    get_observer_cache(priority_schedule.observer).clear()
+
+    observations = []
+    for block in priority_schedule.scheduled_blocks:
+        if hasattr(block, 'target'):
+            observation = Observation(block.target.name, block.start_time.datetime,
+                                      (block.start_time + block.duration).datetime)
+            observations.append(observation)
+    return priority_schedule, observations, prior_scheduler if job['incremental'] else None
+
+
+def plan_week(targets, week, config, observer, calibrators=None, targColor=None, calibColor=None,
+              workers=None, profile=None, schedulers=None):
+    """
+    Schedule every day of ``week``, the days in parallel.
+
+    Phase one (`assign_days`) decides which targets are offered on which
+    day, phase two (`schedule_day`) schedules the days in a process pool.
+    Results are merged back in ``week`` order, decrementing ``obs_per_week``
+    of ``targets`` for every scheduled observation, so the outcome doesn't
+    depend on which worker finishes first.
+
+    Parameters
+    ----------
+    targets : list of PlannedObs
+    week : OrderedDict
+        ``{daySummary: [start datetime, end datetime]}`` in schedule order.
+    config : dict
+        The ``[Default]`` section of ``config/config.ini``.
+    observer : `~astroplanventa.Observer`
+    calibrators : list of `~astroplanventa.FixedTarget`
+    targColor, calibColor : dict
+        Plot colours, passed on to the schedules.
+    workers : int or None
+        Number of worker processes; defaults to ``config['workers']`` or
+        one per day, at most the number of CPUs. With one worker the days
+        are scheduled in this process.
+    profile : bool or None
+        Time the phases of every day's scheduling run into ``schedule.stats``
+        (see `log_stats`); defaults to ``config['profile']``.
+    schedulers : dict or None
+        Schedule the days incrementally: ``{daySummary: scheduler}`` of the
+        last call, updated in place with this call's schedulers. A day
+        scheduled before with the same config only has the steps from the
+        first one an edit of the targets affects scheduled again, so after
+        a small edit (one target's priority or scans, or a removed
+        observation) this is much quicker than a full run. Days scheduled
+        by a `BeamSearchScheduler` (see `schedule_day`) run in full.
+
+    Returns
+    -------
+    results : list of (daySummary, day, schedule, observations)
+    """
+    hours = visible_hours(observer, targets, week, config['minaltitude'], config['maxaltitude'])
+    assigned = assign_days(targets, week, hours)
+    if profile is None:
+        profile = bool(config.get('profile'))
+    incremental = schedulers is not None
+    jobs = [make_day_job(targets, daySummary, day, indices, config, observer, calibrators,
+                         targColor, calibColor, profile, incremental,
+                         schedulers.get(daySummary) if incremental else None)
+            for (daySummary, day), indices in zip(week.items(), assigned)]
+
+    if workers is None:
+        workers = int(config.get('workers') or 0) or min(len(jobs), os.cpu_count() or 1)
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            scheduled = list(executor.map(schedule_day, jobs))
+    else:
+        scheduled = [schedule_day(job) for job in jobs]
+
+    results = []
+    for (daySummary, day), (schedule, observations, scheduler) in zip(week.items(), scheduled):
+        schedule.observer = observer
+        if incremental:
+            scheduler.observer = observer
+            schedulers[daySummary] = scheduler
+        for observation in observations:
+            for target in targets:
+                if target.name == observation.name:
+                    print(target.name, " has been observed once")
+                    target.obs_per_week -= 1
+        results.append((daySummary, day, schedule, observations))
+    return results
+
+
+def log_stats(results):
+    """Print the per-phase stats of every profiled day in ``results`` of `plan_week`."""
+    for daySummary, day, schedule, observations in results:
+        if schedule.stats is not None:
+            print("Scheduling phases of", daySummary)
+            schedule.stats.pprint(max_lines=-1, max_width=-1)
+
+
+def save_observations(day, observations, directory="observations"):
+    """
+    Write the observations of one day to ``<directory>/<day start>.json``.
+
+    Returns
+    -------
+    filename : str
+    """
+    dict_array = []
+    for observation in observations:
+        dict_array.append({
+            "obs_name": observation.name,
+            "start_time": observation.start_time.strftime("%Y-%m-%d %H:%M:%S"),
+            "end_time": observation.end_time.strftime("%Y-%m-%d %H:%M:%S"),
+        })
+
+    json_dict = dict()
+    json_dict["observations"] = dict_array
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    filename = os.path.join(directory, day[0].strftime("%Y-%m-%d-%H-%M") + ".json")
+    with open(filename, 'w') as outfile:
+        json.dump(json_dict, outfile, indent=4)
+    return filename